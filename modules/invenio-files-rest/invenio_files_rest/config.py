@@ -131,6 +131,41 @@ FILES_REST_DEFAULT_PDF_SAVE_PATH = tempfile.gettempdir()
 FILES_REST_DEFAULT_PDF_TTL = 1 * 60 * 60  # 1 hour
 """convert pdf ttl"""
 
+FILES_REST_PDF_CACHE_MAX_SIZE = 5 * 1024 * 1024 * 1024  # 5 GiB
+"""Maximum size of the converted pdf files, None for no limit."""
+
+FILES_REST_PDF_CONVERT_WORKERS = 2
+"""Maximum number of pdf conversions running at once on a host."""
+
+FILES_REST_PDF_CONVERT_RETRY_INTERVAL = 10
+"""Seconds before retrying a conversion waiting for a free worker."""
+
+FILES_REST_PDF_CONVERT_PENDING_TTL = 10 * 60
+"""Seconds a queued or failed conversion is not queued again."""
+
+FILES_REST_PDF_CONVERT_CHUNK_SIZE = 1024 * 1024
+"""Chunk size used to copy the files on S3 before their conversion."""
+
+FILES_REST_PDF_PREPARING_RETRY_AFTER = 5
+"""Seconds after which the preview of a file being converted is requested
+again."""
+
+FILES_REST_XSENDFILE_ENABLED = False
+"""Send the files of the local locations with the web server.
+
+The application only checks the access and sends the
+``FILES_REST_XSENDFILE_HEADER`` header, the web server reads the file and
+handles the byte ranges.
+"""
+
+FILES_REST_XSENDFILE_HEADER = 'X-Accel-Redirect'
+"""Header of the files sent by the web server, ``X-Accel-Redirect`` for
+nginx or ``X-Sendfile`` for Apache."""
+
+FILES_REST_XSENDFILE_LOCATIONS = {'/var/tmp/': '/_files/'}
+"""Directories of the files sent by the web server, mapped to the internal
+location of the web server (to the directory itself for ``X-Sendfile``)."""
+
 FILES_REST_FILE_TAGS_HEADER = 'X-Invenio-File-Tags'
 """Header for updating file tags."""
 
@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015-2019 CERN.
+#
+# Invenio is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Conversion of the office files to PDF for their preview.
+
+The files are converted by :func:`.tasks.convert_preview_pdf_task` in the
+background, the web requests only serve the converted files. The files of
+the cache are named ``<path>/pdf_dir/<file id>/data.pdf``, ``<path>`` being
+the path of the ``convert_pdf_settings``.
+"""
+
+from __future__ import absolute_import, print_function
+
+import fcntl
+import os
+import shutil
+import time
+from contextlib import contextmanager
+
+from flask import current_app, make_response
+from flask_babelex import gettext as _
+from invenio_previewer.api import convert_to
+from weko_admin.models import AdminSettings
+
+from .storage.pyfs import remove_dir_with_file
+
+PREVIEW_PDF_READY = 'ready'
+"""The PDF file is converted."""
+
+PREVIEW_PDF_PREPARING = 'preparing'
+"""The PDF file is queued or being converted."""
+
+PREVIEW_PDF_FAILED = 'failed'
+"""The last conversion of the file failed."""
+
+
+class PreviewPDFBusyError(Exception):
+    """Exception raised when every conversion worker is busy."""
+
+
+def is_convertible_to_pdf(mimetype):
+    """Check if a file is previewed as PDF.
+
+    :param mimetype: the mimetype of the file.
+    :returns: True for the Microsoft Office files.
+    """
+    return bool(mimetype) and ('msword' in mimetype
+                               or 'vnd.ms' in mimetype
+                               or 'vnd.openxmlformats' in mimetype)
+
+
+def get_pdf_save_path():
+    """Get the directory of the converted files."""
+    settings = AdminSettings.get('convert_pdf_settings')
+    if settings:
+        return settings.path
+    return current_app.config['FILES_REST_DEFAULT_PDF_SAVE_PATH']
+
+
+def get_preview_pdf_path(file_id, path=None):
+    """Get the path of the converted file of a file instance.
+
+    :param file_id: the FileInstance id.
+    :param path: the directory of the converted files.
+    :returns: the path of the PDF file.
+    """
+    return os.path.join(path or get_pdf_save_path(), 'pdf_dir',
+                        str(file_id), 'data.pdf')
+
+
+def _state_path(path, file_id, state):
+    """Get the path of the queued or failed marker of a file."""
+    return os.path.join(path, 'pdf_locks', '{}.{}'.format(file_id, state))
+
+
+def _is_recent(marker):
+    """Check if a marker is younger than the pending TTL."""
+    try:
+        return time.time() - os.path.getmtime(marker) < \
+            current_app.config['FILES_REST_PDF_CONVERT_PENDING_TTL']
+    except OSError:
+        return False
+
+
+def _remove(path):
+    """Remove a file which may not exist."""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+@contextmanager
+def _flock(lock_path):
+    """Try to lock a file without waiting.
+
+    :param lock_path: the path of the lock file.
+    :returns: a context yielding True if the lock is acquired.
+    """
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    with open(lock_path, 'a') as fp:
+        try:
+            fcntl.flock(fp, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(fp, fcntl.LOCK_UN)
+
+
+@contextmanager
+def _conversion_slot(path):
+    """Take one of the ``FILES_REST_PDF_CONVERT_WORKERS`` slots.
+
+    The slots bound the LibreOffice processes of the host, whichever
+    worker runs the conversions.
+
+    :raises PreviewPDFBusyError: if every slot is taken.
+    """
+    for slot in range(current_app.config['FILES_REST_PDF_CONVERT_WORKERS']):
+        with _flock(os.path.join(path, 'pdf_locks',
+                                 'slot_{}'.format(slot))) as locked:
+            if locked:
+                yield slot
+                return
+    raise PreviewPDFBusyError()
+
+
+def get_preview_pdf_status(file_id, path=None):
+    """Get the conversion status of a file, queuing it if needed.
+
+    The conversion is queued once while it is pending, the requests made
+    meanwhile only poll the status. A failed conversion is not queued again
+    before ``FILES_REST_PDF_CONVERT_PENDING_TTL`` seconds.
+
+    :param file_id: the FileInstance id.
+    :param path: the directory of the converted files.
+    :returns: ``PREVIEW_PDF_READY``, ``PREVIEW_PDF_PREPARING`` or
+        ``PREVIEW_PDF_FAILED``.
+    """
+    from .tasks import convert_preview_pdf_task
+
+    path = path or get_pdf_save_path()
+    pdf_path = get_preview_pdf_path(file_id, path)
+    if os.path.isfile(pdf_path):
+        return PREVIEW_PDF_READY
+    if _is_recent(_state_path(path, file_id, 'failed')):
+        return PREVIEW_PDF_FAILED
+    queued = _state_path(path, file_id, 'queued')
+    try:
+        os.makedirs(os.path.dirname(queued), exist_ok=True)
+        fd = os.open(queued, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        os.close(fd)
+    except FileExistsError:
+        if _is_recent(queued):
+            return PREVIEW_PDF_PREPARING
+        # the queued task is lost
+        os.utime(queued)
+    except OSError as ex:
+        current_app.logger.error('convert to pdf error')
+        current_app.logger.error(ex)
+        return PREVIEW_PDF_FAILED
+    try:
+        convert_preview_pdf_task.delay(str(file_id))
+    except Exception as ex:
+        current_app.logger.error(ex)
+        _remove(queued)
+        return PREVIEW_PDF_FAILED
+    # converted already when the tasks are eager
+    return PREVIEW_PDF_READY if os.path.isfile(pdf_path) \
+        else PREVIEW_PDF_PREPARING
+
+
+def make_preview_pdf_preparing_response():
+    """Make the response to the preview of a file being converted."""
+    response = make_response(_('The preview is being prepared.'), 202)
+    response.headers['Retry-After'] = str(
+        current_app.config['FILES_REST_PDF_PREPARING_RETRY_AFTER'])
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+def request_preview_pdfs(file_instances):
+    """Queue the conversion of the office files of a record.
+
+    :param file_instances: list of (FileInstance, mimetype).
+    """
+    path = get_pdf_save_path()
+    for file_instance, mimetype in file_instances:
+        if file_instance is not None and is_convertible_to_pdf(mimetype):
+            get_preview_pdf_status(file_instance.id, path)
+
+
+def convert_preview_pdf(file_instance):
+    """Convert a file to PDF, once at a time per file.
+
+    The files on S3 are streamed to the disk first. The PDF file is moved
+    into the cache once complete, so the requests never serve a partial
+    file.
+
+    :param file_instance: the FileInstance.
+    :returns: the path of the PDF file.
+    :raises PreviewPDFBusyError: if the file or every conversion slot is
+        locked by another worker.
+    """
+    path = get_pdf_save_path()
+    file_id = str(file_instance.id)
+    pdf_path = get_preview_pdf_path(file_id, path)
+    lock_path = os.path.join(path, 'pdf_locks', '{}.lock'.format(file_id))
+    with _flock(lock_path) as locked:
+        if not locked:
+            raise PreviewPDFBusyError()
+        if os.path.isfile(pdf_path):
+            return pdf_path
+        with _conversion_slot(path):
+            convert_dir = os.path.join(path, 'convert_' + file_id)
+            shutil.rmtree(convert_dir, ignore_errors=True)
+            os.makedirs(convert_dir)
+            try:
+                source = file_instance.uri
+                if source.startswith('s3://'):
+                    source = os.path.join(convert_dir, source.split('/')[-1])
+                    fp = file_instance.storage().open(mode='rb')
+                    try:
+                        with open(source, 'wb') as f:
+                            shutil.copyfileobj(
+                                fp, f, current_app.config[
+                                    'FILES_REST_PDF_CONVERT_CHUNK_SIZE'])
+                    finally:
+                        fp.close()
+                out_dir = os.path.join(convert_dir, 'out')
+                convert_to(out_dir, source)
+                os.makedirs(os.path.dirname(pdf_path), exist_ok=True)
+                os.replace(os.path.join(out_dir, os.path.splitext(
+                    os.path.basename(source))[0] + '.pdf'), pdf_path)
+            finally:
+                shutil.rmtree(convert_dir, ignore_errors=True)
+    _remove(lock_path)
+    return pdf_path
+
+
+def set_preview_pdf_done(file_id, failed=False):
+    """Release the queued conversion of a file.
+
+    :param file_id: the FileInstance id.
+    :param failed: True to delay the next conversion of the file.
+    """
+    path = get_pdf_save_path()
+    if failed:
+        failed_path = _state_path(path, file_id, 'failed')
+        with open(failed_path, 'a'):
+            os.utime(failed_path)
+    _remove(_state_path(path, file_id, 'queued'))
+
+
+def touch_preview_pdf(pdf_path):
+    """Mark a converted file as used, for the eviction of the cache."""
+    try:
+        os.utime(os.path.dirname(pdf_path))
+    except OSError:
+        pass
+
+
+def _listdir(path):
+    """List a directory which may not exist."""
+    return os.listdir(path) if os.path.isdir(path) else []
+
+
+def evict_preview_pdfs(path, ttl, max_size):
+    """Remove the converted files unused for a while.
+
+    The files not used for ``ttl`` seconds are removed, then the least
+    recently used ones until the cache is smaller than ``max_size``.
+
+    :param path: the directory of the converted files.
+    :param ttl: the seconds a converted file is kept unused.
+    :param max_size: the maximum size of the cache in bytes, None for no
+        limit.
+    """
+    now = time.time()
+    dirs = []
+    for name in _listdir(os.path.join(path, 'pdf_dir')):
+        d = os.path.join(path, 'pdf_dir', name)
+        try:
+            used = os.path.getmtime(d)
+            if now - used >= ttl:
+                remove_dir_with_file(d)
+            else:
+                dirs.append((used, os.path.getsize(
+                    os.path.join(d, 'data.pdf')), d))
+        except OSError:
+            continue
+    size = sum(d[1] for d in dirs)
+    for _used, dir_size, d in sorted(dirs):
+        if max_size is None or size <= max_size:
+            break
+        remove_dir_with_file(d)
+        size -= dir_size
+    # the markers of the lost tasks and of the old failures
+    for name in _listdir(os.path.join(path, 'pdf_locks')):
+        marker = os.path.join(path, 'pdf_locks', name)
+        if name.endswith(('.queued', '.failed')) and not _is_recent(marker):
+            _remove(marker)
@@ -18,6 +18,8 @@ from time import time
 
 from flask import current_app, request
 from werkzeug.datastructures import Headers
+from werkzeug.exceptions import RequestedRangeNotSatisfiable
+from werkzeug.http import parse_range_header
 from werkzeug.urls import url_quote
 from werkzeug.wsgi import FileWrapper
 
@@ -63,9 +65,15 @@ def chunk_size_or_default(chunk_size):
 
 def send_stream(stream, filename, size, mtime, mimetype=None, restricted=True,
                 as_attachment=False, etag=None, content_md5=None,
-                chunk_size=None, conditional=True, trusted=False):
+                chunk_size=None, conditional=True, trusted=False,
+                xsendfile=None):
     """Send the contents of a file to the client.
 
+    A single byte range of the file is sent when requested with the
+    ``Range`` header (and ``If-Range`` matches); the stream is then read
+    from the start of the range. A request of several ranges is answered
+    with the whole file.
+
     .. warning::
 
         It is very easy to be exposed to Cross-Site Scripting (XSS) attacks if
@@ -98,6 +106,10 @@ def send_stream(stream, filename, size, mtime, mimetype=None, restricted=True,
         that prevents your browser from rendering e.g. a HTML file which could
         contain a malicious script tag.
         (Default: ``False``)
+    :param xsendfile: The path of the file for the web server. If defined,
+        the file is sent by the web server with the
+        ``FILES_REST_XSENDFILE_HEADER`` header instead of the stream, which
+        may be ``None``. (Default: ``None``)
     :returns: A Flask response instance.
     """
     chunk_size = chunk_size_or_default(chunk_size)
@@ -110,7 +122,12 @@ def send_stream(stream, filename, size, mtime, mimetype=None, restricted=True,
 
     # Construct headers
     headers = Headers()
-    headers['Content-Length'] = size
+    if xsendfile:
+        # The web server sends the file and its length.
+        headers[current_app.config['FILES_REST_XSENDFILE_HEADER']] = \
+            xsendfile
+    else:
+        headers['Content-Length'] = size
     if content_md5:
         headers['Content-MD5'] = content_md5
 
@@ -149,7 +166,7 @@ def send_stream(stream, filename, size, mtime, mimetype=None, restricted=True,
 
     # Construct response object.
     rv = current_app.response_class(
-        FileWrapper(stream, buffer_size=chunk_size),
+        b'' if xsendfile else FileWrapper(stream, buffer_size=chunk_size),
         mimetype=mimetype,
         headers=headers,
         direct_passthrough=True,
@@ -172,11 +189,35 @@ def send_stream(stream, filename, size, mtime, mimetype=None, restricted=True,
             rv.expires = int(time() + cache_timeout)
 
     if conditional:
-        rv = rv.make_conditional(request)
+        # Without the complete length the range is not processed, the web
+        # server handles the ranges of the files it sends.
+        complete_length = size \
+            if not xsendfile and _is_single_range(request) else None
+        try:
+            rv = rv.make_conditional(
+                request, accept_ranges=True, complete_length=complete_length)
+        except RequestedRangeNotSatisfiable as e:
+            rv.close()
+            return e.get_response()
+        if rv.status_code == 206:
+            # The checksum is the one of the whole file.
+            rv.headers.pop('Content-MD5', None)
+        elif xsendfile and rv.status_code != 200:
+            # Not modified, the web server must not send the file.
+            rv.headers.pop(current_app.config['FILES_REST_XSENDFILE_HEADER'])
 
     return rv
 
 
+def _is_single_range(request):
+    """Check if the request has no ``Range`` or a single byte range.
+
+    The invalid ranges are answered with a 416 error.
+    """
+    ranges = parse_range_header(request.headers.get('Range'))
+    return ranges is None or len(ranges.ranges) == 1
+
+
 def sanitize_mimetype(mimetype, filename=None):
     """Sanitize a MIME type so the browser does not render the file."""
     # Allow some few mime type like plain text, images and audio.
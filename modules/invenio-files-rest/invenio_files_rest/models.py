@@ -36,7 +36,6 @@ model.
 
 from __future__ import absolute_import, print_function
 
-import shutil
 import mimetypes
 import os
 import re
@@ -51,15 +50,16 @@ import sqlalchemy as sa
 from flask import current_app, flash, redirect, request, url_for
 from flask_login import current_user
 from invenio_db import db
-from invenio_previewer.api import convert_to
 from sqlalchemy.dialects import mysql, postgresql
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import validates
 from sqlalchemy.orm.exc import MultipleResultsFound
 from sqlalchemy.sql.expression import func
 from sqlalchemy_utils.types import JSONType, UUIDType
-from weko_admin.models import AdminSettings
 
+from .convert import PREVIEW_PDF_PREPARING, PREVIEW_PDF_READY, \
+    get_pdf_save_path, get_preview_pdf_path, get_preview_pdf_status, \
+    make_preview_pdf_preparing_response, touch_preview_pdf
 from .errors import BucketLockedError, FileInstanceAlreadySetError, \
     FileInstanceUnreadableError, FileSizeError, InvalidKeyError, \
     InvalidOperationError, MultipartAlreadyCompleted, \
@@ -913,45 +913,22 @@ class FileInstance(db.Model, Timestamp):
         """Send file to client."""
         # Convert ms office file to PDF for preview
         if convert_to_pdf:
-
             try:
-                settings = AdminSettings.get('convert_pdf_settings')
-
-                # Load settings from settings if there is not settings in db
-                if settings:
-                    path = settings.path
-                else:
-                    path = current_app.config['FILES_REST_DEFAULT_PDF_SAVE_PATH']
-
-                pdf_dir = path + '/pdf_dir/' + str(self.id)
-                pdf_filename = '/data.pdf'
-                file_type = os.path.splitext(self.json['filename'])[1].lower()
-                # Change preview file to pdf
-                self.json['mimetype'] = 'application/pdf'
-                self.json['filename'] = self.json['filename'].replace(
-                    file_type, '.pdf')
-
-                if not os.path.isfile(pdf_dir + pdf_filename):
-                    convert_dir = path+"/convert_"+str(self.id)
-                    target_uri = self.uri
-                    if self.uri.startswith("s3://"):
-                        target_uri = convert_dir+"/"+self.uri.split("/")[-1]
-                        if os.path.exists(convert_dir):
-                            shutil.rmtree(convert_dir)
-                        os.makedirs(convert_dir)
-                        fp = self.storage(**kwargs).open(mode='rb')
-                        data = fp.read()
-                        fp.close()
-                        with open(target_uri,"wb") as f:
-                            f.write(data)
-
-                    convert_to(pdf_dir, target_uri)
-
-                    if os.path.exists(convert_dir):
-                        shutil.rmtree(convert_dir)
-
-                self.uri = pdf_dir + pdf_filename
-                self.size = os.path.getsize(pdf_dir + pdf_filename)
+                path = get_pdf_save_path()
+                status = get_preview_pdf_status(self.id, path)
+                if status == PREVIEW_PDF_PREPARING:
+                    return make_preview_pdf_preparing_response()
+                if status == PREVIEW_PDF_READY:
+                    pdf_path = get_preview_pdf_path(self.id, path)
+                    file_type = os.path.splitext(
+                        self.json['filename'])[1].lower()
+                    # Change preview file to pdf
+                    self.json['mimetype'] = 'application/pdf'
+                    self.json['filename'] = self.json['filename'].replace(
+                        file_type, '.pdf')
+                    self.uri = pdf_path
+                    self.size = os.path.getsize(pdf_path)
+                    touch_preview_pdf(pdf_path)
             except Exception as ex:
                 current_app.logger.error('convert to pdf error')
                 current_app.logger.error(ex)
@@ -93,10 +93,13 @@ class FileStorage(object):
                   checksum=None, trusted=False, chunk_size=None,
                   as_attachment=False):
         """Send the file to the client."""
-        try:
-            fp = self.open(mode='rb')
-        except Exception as e:
-            raise StorageError('Could not send file: {}'.format(e))
+        xsendfile = self.get_xsendfile_path()
+        fp = None
+        if not xsendfile:
+            try:
+                fp = self.open(mode='rb')
+            except Exception as e:
+                raise StorageError('Could not send file: {}'.format(e))
 
         try:
             md5_checksum = None
@@ -118,11 +121,21 @@ class FileStorage(object):
                 chunk_size=chunk_size,
                 trusted=trusted,
                 as_attachment=as_attachment,
+                xsendfile=xsendfile,
             )
         except Exception as e:
-            fp.close()
+            if fp is not None:
+                fp.close()
             raise StorageError('Could not send file: {}'.format(e))
 
+    def get_xsendfile_path(self):
+        """Get the path of the file for the web server.
+
+        :returns: The path or ``None`` to stream the file from the
+            application.
+        """
+        return None
+
     def checksum(self, chunk_size=None, progress_callback=None, **kwargs):
         """Compute checksum of file."""
         fp = self.open(mode='rb')
@@ -12,12 +12,14 @@ from __future__ import absolute_import, print_function
 
 import base64
 import hashlib
+import os
 import shutil
 
 import cchardet as chardet
 from flask import current_app
 from fs.opener import opener
 from fs.path import basename, dirname
+from werkzeug.urls import url_quote
 
 from ..helpers import make_path
 from .base import FileStorage, StorageError
@@ -62,6 +64,28 @@ class PyFSFileStorage(FileStorage):
         fs, path = self._get_fs()
         return fs.open(path, mode=mode)
 
+    def get_xsendfile_path(self):
+        """Get the path of the file for the web server.
+
+        Only with ``FILES_REST_XSENDFILE_ENABLED``, for the files of the
+        ``FILES_REST_XSENDFILE_LOCATIONS`` directories.
+        """
+        if not current_app.config['FILES_REST_XSENDFILE_ENABLED']:
+            return None
+        path = self.fileurl
+        if path.startswith('file://'):
+            path = path[len('file://'):]
+        if '://' in path:
+            return None
+        path = os.path.normpath(path)
+        for directory, location in current_app.config[
+                'FILES_REST_XSENDFILE_LOCATIONS'].items():
+            directory = os.path.join(os.path.normpath(directory), '')
+            if path.startswith(directory):
+                return url_quote(
+                    os.path.join(location, path[len(directory):]))
+        return None
+
     def delete(self):
         """Delete a file.
 
@@ -10,9 +10,7 @@
 
 from __future__ import absolute_import, print_function
 
-import glob
 import math
-import os
 import uuid
 from datetime import date, datetime, timedelta
 
@@ -27,8 +25,9 @@ from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from weko_admin.models import AdminSettings
 
 from .api import send_alert_mail
+from .convert import PreviewPDFBusyError, convert_preview_pdf, \
+    evict_preview_pdfs, set_preview_pdf_done
 from .models import FileInstance, Location, MultipartObject, ObjectVersion
-from .storage.pyfs import remove_dir_with_file
 from .utils import obj_or_import_string
 
 logger = get_task_logger(__name__)
@@ -310,9 +309,36 @@ def check_file_storage_time():
         path = current_app.config.get('FILES_REST_DEFAULT_PDF_SAVE_PATH',
                                       '/var/tmp')
         ttl = current_app.config.get('FILES_REST_DEFAULT_PDF_TTL', 1 * 60 * 60)
-    # Delete file if file creation time exceeded TTL
-    now = datetime.utcnow()
-    for d in glob.glob(path + "/pdf_dir/**"):
-        tLog = os.path.getmtime(d)
-        if (now - datetime.utcfromtimestamp(tLog)).total_seconds() >= ttl:
-            remove_dir_with_file(d)
+    # Delete file if file unused for TTL, then the least recently used
+    # files above the maximum size
+    evict_preview_pdfs(path, ttl,
+                       current_app.config['FILES_REST_PDF_CACHE_MAX_SIZE'])
+
+
+@shared_task(bind=True, ignore_result=True, max_retries=None)
+def convert_preview_pdf_task(self, file_id):
+    """Convert an office file to PDF for its preview.
+
+    The task is retried later while the file or every conversion slot is
+    locked by another worker.
+
+    :param file_id: the FileInstance id.
+    """
+    file_instance = FileInstance.query.get(file_id)
+    if file_instance is None:
+        set_preview_pdf_done(file_id)
+        return
+    try:
+        convert_preview_pdf(file_instance)
+    except PreviewPDFBusyError as ex:
+        if self.request.is_eager:
+            # queued again by the next request of the preview
+            set_preview_pdf_done(file_id)
+            return
+        raise self.retry(exc=ex, countdown=current_app.config[
+            'FILES_REST_PDF_CONVERT_RETRY_INTERVAL'])
+    except Exception as ex:
+        logger.error('convert to pdf error: {} {}'.format(file_id, ex))
+        set_preview_pdf_done(file_id, failed=True)
+    else:
+        set_preview_pdf_done(file_id)
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015-2019 CERN.
+#
+# Invenio is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Test the conversion of the office files to PDF."""
+
+from __future__ import absolute_import, print_function
+
+import os
+import time
+
+import pytest
+from mock import MagicMock, patch
+
+from invenio_files_rest.convert import PREVIEW_PDF_FAILED, \
+    PREVIEW_PDF_PREPARING, PREVIEW_PDF_READY, PreviewPDFBusyError, \
+    _conversion_slot, convert_preview_pdf, evict_preview_pdfs, \
+    get_preview_pdf_path, get_preview_pdf_status, is_convertible_to_pdf, \
+    set_preview_pdf_done
+
+
+# def is_convertible_to_pdf(mimetype):
+# .tox/c1/bin/pytest --cov=invenio_files_rest tests/test_convert.py::test_is_convertible_to_pdf -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/invenio-files-rest/.tox/c1/tmp
+def test_is_convertible_to_pdf():
+    assert is_convertible_to_pdf("application/msword")
+    assert is_convertible_to_pdf("application/vnd.ms-excel")
+    assert is_convertible_to_pdf("application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+    assert not is_convertible_to_pdf("application/pdf")
+    assert not is_convertible_to_pdf(None)
+
+
+# def get_preview_pdf_status(file_id, path=None):
+# .tox/c1/bin/pytest --cov=invenio_files_rest tests/test_convert.py::test_get_preview_pdf_status -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/invenio-files-rest/.tox/c1/tmp
+def test_get_preview_pdf_status(app, db, tmp_path):
+    app.config["FILES_REST_DEFAULT_PDF_SAVE_PATH"] = str(tmp_path)
+    with app.app_context():
+        # queued once while pending
+        with patch("invenio_files_rest.tasks.convert_preview_pdf_task.delay") as mock_delay:
+            assert get_preview_pdf_status("1") == PREVIEW_PDF_PREPARING
+            assert get_preview_pdf_status("1") == PREVIEW_PDF_PREPARING
+            mock_delay.assert_called_once_with("1")
+
+            # the queued task is lost
+            queued = str(tmp_path / "pdf_locks" / "1.queued")
+            os.utime(queued, (time.time() - 3600, time.time() - 3600))
+            assert get_preview_pdf_status("1") == PREVIEW_PDF_PREPARING
+            assert mock_delay.call_count == 2
+
+            # failed
+            set_preview_pdf_done("1", failed=True)
+            assert not os.path.exists(queued)
+            assert get_preview_pdf_status("1") == PREVIEW_PDF_FAILED
+            assert mock_delay.call_count == 2
+
+        # ready
+        pdf_path = get_preview_pdf_path("1")
+        os.makedirs(os.path.dirname(pdf_path))
+        with open(pdf_path, "wb") as f:
+            f.write(b"pdf")
+        assert get_preview_pdf_status("1") == PREVIEW_PDF_READY
+
+        # queue failure
+        with patch("invenio_files_rest.tasks.convert_preview_pdf_task.delay", side_effect=Exception("test")):
+            assert get_preview_pdf_status("2") == PREVIEW_PDF_FAILED
+            assert not os.path.exists(str(tmp_path / "pdf_locks" / "2.queued"))
+
+
+# def convert_preview_pdf(file_instance):
+# .tox/c1/bin/pytest --cov=invenio_files_rest tests/test_convert.py::test_convert_preview_pdf -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/invenio-files-rest/.tox/c1/tmp
+def test_convert_preview_pdf(app, db, tmp_path):
+    app.config["FILES_REST_DEFAULT_PDF_SAVE_PATH"] = str(tmp_path)
+    app.config["FILES_REST_PDF_CONVERT_WORKERS"] = 1
+    source = tmp_path / "data"
+    source.write_bytes(b"docx")
+    file_instance = MagicMock()
+    file_instance.id = "1"
+    file_instance.uri = str(source)
+
+    def mock_convert(folder, source):
+        os.makedirs(folder)
+        with open(os.path.join(folder, "data.pdf"), "wb") as f:
+            f.write(b"pdf")
+
+    with app.app_context():
+        with patch("invenio_files_rest.convert.convert_to", side_effect=mock_convert) as mock_convert_to:
+            # every worker is busy
+            with _conversion_slot(str(tmp_path)):
+                with pytest.raises(PreviewPDFBusyError):
+                    convert_preview_pdf(file_instance)
+            assert mock_convert_to.call_count == 0
+
+            pdf_path = convert_preview_pdf(file_instance)
+            assert pdf_path == get_preview_pdf_path("1")
+            with open(pdf_path, "rb") as f:
+                assert f.read() == b"pdf"
+            assert not os.path.exists(str(tmp_path / "convert_1"))
+
+            # converted once
+            convert_preview_pdf(file_instance)
+            assert mock_convert_to.call_count == 1
+
+
+# def evict_preview_pdfs(path, ttl, max_size):
+# .tox/c1/bin/pytest --cov=invenio_files_rest tests/test_convert.py::test_evict_preview_pdfs -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/invenio-files-rest/.tox/c1/tmp
+def test_evict_preview_pdfs(app, tmp_path):
+    now = time.time()
+    for name, age in (("old", 100), ("a", 30), ("b", 20), ("c", 10)):
+        d = tmp_path / "pdf_dir" / name
+        d.mkdir(parents=True)
+        (d / "data.pdf").write_bytes(b"x" * 10)
+        os.utime(str(d), (now - age, now - age))
+    (tmp_path / "pdf_locks").mkdir()
+    (tmp_path / "pdf_locks" / "a.failed").write_bytes(b"")
+    os.utime(str(tmp_path / "pdf_locks" / "a.failed"), (now - 3600, now - 3600))
+    (tmp_path / "pdf_locks" / "b.queued").write_bytes(b"")
+    with app.app_context():
+        evict_preview_pdfs(str(tmp_path), 50, 20)
+    assert sorted(os.listdir(str(tmp_path / "pdf_dir"))) == ["b", "c"]
+    assert os.listdir(str(tmp_path / "pdf_locks")) == ["b.queued"]
@@ -11,8 +11,9 @@
 from __future__ import absolute_import, print_function
 
 import pytest
+from six import BytesIO
 
-from invenio_files_rest.helpers import make_path
+from invenio_files_rest.helpers import make_path, send_stream
 
 
 def test_make_path():
@@ -33,3 +34,67 @@ def test_make_path():
     pytest.raises(AssertionError, make_path, base, myid, f, 1, 50)
     pytest.raises(AssertionError, make_path, base, myid, f, 50, 1)
     pytest.raises(AssertionError, make_path, base, myid, f, 50, 50)
+
+
+def test_send_stream_range(app):
+    """Test the byte ranges of the files."""
+    data = b'0123456789'
+
+    def send(headers, **kwargs):
+        with app.test_request_context(headers=headers):
+            res = send_stream(BytesIO(data), 'test.txt', len(data), 1000,
+                              etag='md5:test', content_md5='test', **kwargs)
+            return res, b''.join(res.response)
+
+    res, body = send({})
+    assert res.status_code == 200
+    assert res.headers['Accept-Ranges'] == 'bytes'
+    assert body == data
+
+    res, body = send({'Range': 'bytes=2-4'})
+    assert res.status_code == 206
+    assert res.headers['Content-Range'] == 'bytes 2-4/10'
+    assert res.headers['Content-Length'] == '3'
+    assert 'Content-MD5' not in res.headers
+    assert body == b'234'
+
+    res, body = send({'Range': 'bytes=-3'})
+    assert res.status_code == 206
+    assert body == b'789'
+
+    # If-Range
+    res, body = send({'Range': 'bytes=2-4', 'If-Range': '"md5:test"'})
+    assert res.status_code == 206
+    res, body = send({'Range': 'bytes=2-4', 'If-Range': '"md5:other"'})
+    assert res.status_code == 200
+    assert body == data
+
+    # several ranges
+    res, body = send({'Range': 'bytes=0-1,4-5'})
+    assert res.status_code == 200
+    assert body == data
+
+    res, body = send({'Range': 'bytes=20-30'})
+    assert res.status_code == 416
+    assert res.headers['Content-Range'] == 'bytes */10'
+
+    # not conditional
+    res, body = send({'Range': 'bytes=2-4'}, conditional=False)
+    assert res.status_code == 200
+    assert body == data
+
+
+def test_send_stream_xsendfile(app):
+    """Test the files sent by the web server."""
+    with app.test_request_context():
+        res = send_stream(None, 'test.txt', 10, 1000, etag='md5:test',
+                          xsendfile='/_files/test')
+        assert res.status_code == 200
+        assert res.headers['X-Accel-Redirect'] == '/_files/test'
+        assert res.get_data() == b''
+
+    with app.test_request_context(headers={'If-None-Match': '"md5:test"'}):
+        res = send_stream(None, 'test.txt', 10, 1000, etag='md5:test',
+                          xsendfile='/_files/test')
+        assert res.status_code == 304
+        assert 'X-Accel-Redirect' not in res.headers
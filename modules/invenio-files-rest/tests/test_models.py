@@ -16,7 +16,6 @@ import sys,os
 import uuid
 from os.path import getsize
 from mock import patch
-import shutil
 
 import pytest
 from fs.errors import ResourceNotFoundError
@@ -915,7 +914,7 @@ def test_fileinstance_copy_contents_invalid(app, db, dummy_location):
     pytest.raises(ValueError, dst.copy_contents, src)
 
 # .tox/c1/bin/pytest --cov=invenio_files_rest tests/test_models.py::test_fileinstance_send_file -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/invenio-files-rest/.tox/c1/tmp
-def test_fileinstance_send_file(app, db, dummy_location,dummy_s3_location,mocker):
+def test_fileinstance_send_file(app, db, dummy_location,dummy_s3_location,mocker,tmp_path):
     """Test file instance send file."""
     f = FileInstance.create()
     # File not readable
@@ -932,27 +931,39 @@ def test_fileinstance_send_file(app, db, dummy_location,dummy_s3_location,mocker
         assert int(res.headers['Content-Length']) == len(data)
     
     data = {'url': {'url': 'https://test_server/record/1/files/test_file.docx'}, 'date': [{'dateType': 'Available', 'dateValue': '2023-04-06'}], 'format': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document', 'filename': 'test_file.docx', 'filesize': [{'value': '31 KB'}], 'mimetype': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document', 'accessrole': 'open_access', 'version_id': '174af28a-2a26-428c-ae90-1fae1dffd21c', 'displaytype': 'preview'}
-    def mock_convert(pdf_dir,target_uri):
-        if os.path.exists(pdf_dir):
-            shutil.rmtree(pdf_dir)
-        os.makedirs(pdf_dir)
-        with open(target_uri,"rb") as f:
+    def mock_convert(folder,source):
+        os.makedirs(folder)
+        with open(source,"rb") as f:
             data = f.read()
-        with open(pdf_dir+"/data.pdf","wb") as f:
+        with open(os.path.join(folder,os.path.splitext(os.path.basename(source))[0]+".pdf"),"wb") as f:
             f.write(data)
-            
+
+    app.config["FILES_REST_DEFAULT_PDF_SAVE_PATH"] = str(tmp_path)
     mocker.patch("invenio_files_rest.storage.pyfs.PyFSFileStorage.open",return_value=open(os.path.join(os.path.dirname(__file__),"data/test_file.docx"),"rb"))
+    f = FileInstance(
+        id=uuid.uuid4(),
+        uri="s3://test_file.docx",
+        json=data,
+        readable=True
+    )
+    db.session.add(f)
+    db.session.commit()
+    convert_dir = str(tmp_path / "convert_{}".format(f.id))
     with app.test_request_context("/record/1/files/test_file.docx"):
-        with patch("invenio_files_rest.models.convert_to",side_effect=mock_convert) as mock_convert:
-            f = FileInstance(
-                id=1,
-                uri="s3://test_file.docx",
-                json=data,
-                readable=True
-            )
+        # converted by the eager task
+        with patch("invenio_files_rest.convert.convert_to",side_effect=mock_convert) as mock_convert:
+            res = f.send_file("test_file.docx",True,"application/vnd.openxmlformats-officedocument.wordprocessingml.document",False,None,False,True)
+            assert res.status_code == 200
+            mock_convert.assert_called_with(convert_dir+"/out",convert_dir+"/test_file.docx")
+        assert os.path.isfile(str(tmp_path / "pdf_dir" / str(f.id) / "data.pdf"))
+        assert not os.path.exists(convert_dir)
+        assert f.json["filename"] == "test_file.pdf"
+
+        # being converted
+        with patch("invenio_files_rest.models.get_preview_pdf_status",return_value="preparing"):
             res = f.send_file("test_file.docx",True,"application/vnd.openxmlformats-officedocument.wordprocessingml.document",False,None,False,True)
-            mock_convert.assert_called_with("/tmp/pdf_dir/1","/tmp/convert_1/test_file.docx")
-            shutil.rmtree("/tmp/pdf_dir/1")
+            assert res.status_code == 202
+            assert res.headers["Retry-After"] == "5"
 
 
 def test_fileinstance_validation(app, db, dummy_location):
@@ -319,6 +319,33 @@ def test_pyfs_send_file_fail(app, pyfs):
             pytest.raises(StorageError, pyfs.send_file, 'test.txt')
 
 
+def test_pyfs_send_file_xsendfile(app, pyfs, dummy_location):
+    """Test the files sent by the web server."""
+    uri, size, checksum = pyfs.save(BytesIO(b'sendthis'))
+
+    with app.test_request_context():
+        # disabled
+        res = pyfs.send_file('myfilename.txt', checksum=checksum)
+        assert 'X-Accel-Redirect' not in res.headers
+
+        app.config['FILES_REST_XSENDFILE_ENABLED'] = True
+        app.config['FILES_REST_XSENDFILE_LOCATIONS'] = {
+            dummy_location.uri: '/_files/'}
+        with patch.object(pyfs, 'open') as mock_open:
+            res = pyfs.send_file('myfilename.txt', checksum=checksum)
+            assert not mock_open.called
+        assert res.status_code == 200
+        assert res.headers['X-Accel-Redirect'] == \
+            '/_files/' + os.path.relpath(uri, dummy_location.uri)
+        assert res.headers['ETag'] == '"{0}"'.format(checksum)
+
+        # not in the locations
+        app.config['FILES_REST_XSENDFILE_LOCATIONS'] = {'/other': '/_files/'}
+        res = pyfs.send_file('myfilename.txt', checksum=checksum)
+        assert 'X-Accel-Redirect' not in res.headers
+        assert res.get_data() == b'sendthis'
+
+
 def test_pyfs_copy(pyfs, dummy_location):
     """Test send file."""
     s = PyFSFileStorage(join(dummy_location.uri, 'anotherpath/data'))
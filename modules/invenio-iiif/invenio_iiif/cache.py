@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2018 CERN.
+#
+# Invenio is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Disk cache of the IIIF image derivatives."""
+
+from __future__ import absolute_import, print_function
+
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime
+
+from flask import current_app
+from flask_iiif.cache.cache import ImageCache
+
+
+class ImageFileCache(ImageCache):
+    """Image cache storing the derivatives on the disk.
+
+    Unlike the simple cache of Flask-IIIF, the derivatives are shared by the
+    processes of the host and kept across restarts. The derivatives are
+    kept ``IIIF_CACHE_TIME`` seconds, the least recently served ones are
+    removed when the cache exceeds ``IIIF_CACHE_MAX_SIZE``.
+    """
+
+    @property
+    def cache_dir(self):
+        """Return the directory of the cache."""
+        return current_app.config['IIIF_CACHE_DIR'] \
+            or os.path.join(tempfile.gettempdir(), 'iiif_cache')
+
+    def _path(self, key):
+        """Return the path of the file of a key."""
+        if not isinstance(key, bytes):
+            key = key.encode('utf8')
+        digest = hashlib.sha256(key).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest)
+
+    def _is_expired(self, stat):
+        """Check if a cached file is older than the cache timeout."""
+        return time.time() - stat.st_mtime >= self.timeout
+
+    def get(self, key):
+        """Return the key value.
+
+        :param key: the object's key
+        :return: the stored object
+        :rtype: bytes
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as fp:
+                stat = os.fstat(fp.fileno())
+                if self._is_expired(stat):
+                    return None
+                value = fp.read()
+            # the access time orders the eviction
+            os.utime(path, (time.time(), stat.st_mtime))
+        except OSError:
+            return None
+        return value
+
+    def set(self, key, value, timeout=None):
+        """Cache the object.
+
+        The derivatives all expire after ``IIIF_CACHE_TIME`` seconds, the
+        timeout of a key is not supported.
+
+        :param key: the object's key
+        :param value: the stored object
+        :type value: bytes
+        :param timeout: ignored
+        """
+        if not isinstance(value, bytes):
+            value = value.encode('utf8')
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path),
+                                        suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                fp.write(value)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+        self.evict()
+
+    def get_last_modification(self, key):
+        """Get last modification of cached file.
+
+        :param key: the file object's key
+        """
+        try:
+            return datetime.utcfromtimestamp(
+                os.stat(self._path(key)).st_mtime).replace(microsecond=0)
+        except OSError:
+            return None
+
+    def set_last_modification(self, key, last_modification=None,
+                              timeout=None):
+        """Set last modification of cached file.
+
+        :param key: the file object's key
+        :param last_modification: Last modification date of
+            file represented by the key
+        :type last_modification: datetime.datetime
+        :param timeout: ignored
+        """
+        mtime = time.time() if last_modification is None else \
+            (last_modification - datetime(1970, 1, 1)).total_seconds()
+        try:
+            os.utime(self._path(key), (time.time(), mtime))
+        except OSError:
+            pass
+
+    def delete(self, key):
+        """Delete the specific key."""
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def flush(self):
+        """Flush the cache."""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def evict(self, force=False):
+        """Remove the expired and the least recently served derivatives.
+
+        The cache is scanned at most every ``IIIF_CACHE_EVICT_INTERVAL``
+        seconds.
+
+        :param force: True to scan the cache now.
+        """
+        marker = os.path.join(self.cache_dir, 'evicted')
+        now = time.time()
+        try:
+            if not force and now - os.path.getmtime(marker) < \
+                    current_app.config['IIIF_CACHE_EVICT_INTERVAL']:
+                return
+        except OSError:
+            pass
+        with open(marker, 'a'):
+            os.utime(marker)
+
+        files = []
+        for root, _dirs, names in os.walk(self.cache_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                if path == marker:
+                    continue
+                try:
+                    stat = os.stat(path)
+                    if self._is_expired(stat) or (
+                            name.endswith('.tmp')
+                            and now - stat.st_mtime >= 60 * 60):
+                        os.remove(path)
+                    elif not name.endswith('.tmp'):
+                        files.append((stat.st_atime, stat.st_size, path))
+                except OSError:
+                    # removed by another process
+                    continue
+        size = sum(f[1] for f in files)
+        max_size = current_app.config['IIIF_CACHE_MAX_SIZE']
+        for _atime, file_size, path in sorted(files):
+            if size <= max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            size -= file_size
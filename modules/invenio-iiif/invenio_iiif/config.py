@@ -34,3 +34,29 @@ IIIF_MANIFEST_ENDPOINTS = {
 
 }
 """Default manifest endpoint."""
+
+IIIF_CACHE_HANDLER = 'invenio_iiif.cache:ImageFileCache'
+"""Cache handler of the image derivatives, shared by the processes."""
+
+IIIF_CACHE_DIR = None
+"""Directory of the cached image derivatives.
+
+``None`` for ``iiif_cache`` in the temporary directory.
+"""
+
+IIIF_CACHE_MAX_SIZE = 2 * 1024 * 1024 * 1024
+"""Maximum size (bytes) of the cached image derivatives."""
+
+IIIF_CACHE_EVICT_INTERVAL = 10 * 60
+"""Minimum seconds between two evictions of the cached image derivatives."""
+
+IIIF_PRERENDER_WIDTHS = [200, 750]
+"""Widths of the derivatives rendered when an item is published."""
+
+IIIF_PRERENDER_MIMETYPES = [
+    'image/jpeg',
+    'image/png',
+    'image/tiff',
+    'application/pdf',
+]
+"""Mimetypes of the files rendered when an item is published."""
@@ -8,10 +8,11 @@
 
 """Handler functions for Flask-IIIF to open image and protect API."""
 
-import tempfile
+from io import BytesIO
 
 import pkg_resources
 from flask import g
+from flask_iiif.restful import current_iiif
 from invenio_files_rest.views import ObjectResource
 from invenio_files_rest.models import ObjectVersion
 
@@ -26,6 +27,12 @@ except ImportError:
     # ImageMagick notinstalled
     HAS_IMAGEMAGICK = False
 
+FIRST_PAGE_FORMATS = {
+    'application/pdf': 'pdf',
+    'text/plain': 'txt',
+}
+"""ImageMagick formats of the documents served by their first page."""
+
 
 def protect_api(uuid=None, **kwargs):
     """Retrieve object and check permissions.
@@ -51,14 +58,26 @@ def image_opener(key):
     else:
         obj = protect_api(key)
 
-    fp = obj.file.storage().open('rb')
-
     # If ImageMagick with Wand is installed, extract first page
     # for PDF/text.
-    if HAS_IMAGEMAGICK and obj.mimetype in ['application/pdf', 'text/plain']:
-        first_page = Image(Image(fp).sequence[0])
-        tempfile_ = tempfile.TemporaryFile()
+    if HAS_IMAGEMAGICK and obj.mimetype in FIRST_PAGE_FORMATS:
+        # the first page is rasterized once per object version
+        cache_key = u'iiif:first_page/{0}'.format(key)
+        cached = current_iiif.cache.get(cache_key)
+        if cached:
+            return BytesIO(cached)
+        fp = obj.file.storage().open('rb')
+        try:
+            with Image(file=fp, format=FIRST_PAGE_FORMATS[obj.mimetype]) \
+                    as document:
+                first_page = Image(document.sequence[0])
+        finally:
+            fp.close()
+        data = BytesIO()
         with first_page.convert(format='png') as converted:
-            converted.save(file=tempfile_)
-        return tempfile_
-    return fp
+            converted.save(file=data)
+        first_page.close()
+        current_iiif.cache.set(cache_key, data.getvalue())
+        data.seek(0)
+        return data
+    return obj.file.storage().open('rb')
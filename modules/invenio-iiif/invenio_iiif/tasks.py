@@ -11,13 +11,60 @@
 from __future__ import absolute_import, print_function
 
 from celery import shared_task
-from flask_iiif.restful import IIIFImageAPI
+from flask import current_app, g
+from flask_iiif import IIIF
+from flask_iiif.api import IIIFImageAPIWrapper
+from flask_iiif.restful import current_iiif
+from invenio_files_rest.models import ObjectVersion
+
+from .handlers import image_opener, protect_api
+
+
+def init_iiif(app):
+    """Initialize Flask-IIIF on an application without the IIIF API.
+
+    The Celery application only loads the UI extensions, Flask-IIIF is
+    initialized by the API one.
+    """
+    if 'iiif' not in app.extensions:
+        ext = IIIF(app=app)
+        ext.uuid_to_image_opener_handler(image_opener)
+        ext.api_decorator_handler(protect_api)
 
 
 @shared_task(ignore_result=True)
-def create_thumbnail(uuid, thumbnail_width):
-    """Create the thumbnail for an image."""
+def create_thumbnail(uuid, thumbnail_width, image_format='jpg'):
+    """Create the thumbnail for an image.
+
+    The thumbnail is stored in the IIIF cache under the key of the IIIF API,
+    so the requests of the same size are served without opening the
+    original file. It is rendered outside of the API, which checks the
+    permissions of the current user.
+
+    :param uuid: the IIIF image key of the object version.
+    :param thumbnail_width: the width of the thumbnail.
+    :param image_format: the format of the thumbnail.
+    """
     # size = '!' + thumbnail_width + ','
-    size = thumbnail_width + ','  # flask_iiif doesn't support ! at the moment
-    region = "full"
-    thumbnail = IIIFImageAPI().get("v2", uuid, region, size, "0", "default", "jpg")
+    size = str(thumbnail_width) + ','  # flask_iiif doesn't support ! at the moment
+    region, rotation, quality = 'full', '0', 'default'
+    init_iiif(current_app._get_current_object())
+    key = u'iiif:{0}/{1}/{2}/{3}/{4}.{5}'.format(
+        uuid, region, size, quality, rotation, image_format).encode('utf8')
+    # a new application context, ``g.obj`` is the opened object
+    with current_app.app_context():
+        if current_iiif.cache.get(key):
+            return
+        bucket, version_id, obj_key = uuid.split(':', 2)
+        g.obj = ObjectVersion.get(bucket, obj_key, version_id=version_id)
+        if g.obj is None:
+            return
+        fp = image_opener(uuid)
+        try:
+            image = IIIFImageAPIWrapper.open_image(fp)
+            image.apply_api(version='v2', region=region, size=size,
+                            rotation=rotation, quality=quality)
+            data = image.serve(image_format=image_format).getvalue()
+        finally:
+            fp.close()
+        current_iiif.cache.set(key, data)
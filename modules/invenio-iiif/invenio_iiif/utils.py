@@ -47,3 +47,22 @@ def ui_iiif_image_url(obj, version='v2', region='full', size='full',
             quality=quality,
             image_format=image_format,
         )
+
+
+def prerender_iiif_images(objs):
+    """Queue the rendering of the derivatives of the object versions.
+
+    The derivatives of ``IIIF_PRERENDER_WIDTHS`` are rendered in the
+    format of the image previewer.
+
+    :param objs: list of ObjectVersion.
+    """
+    from .tasks import create_thumbnail
+
+    for obj in objs:
+        if obj is None or obj.mimetype not in \
+                current_app.config['IIIF_PRERENDER_MIMETYPES']:
+            continue
+        image_format = 'png' if obj.key.lower().endswith('.png') else 'jpg'
+        for width in current_app.config['IIIF_PRERENDER_WIDTHS']:
+            create_thumbnail.delay(iiif_image_key(obj), width, image_format)
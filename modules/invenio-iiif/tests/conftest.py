@@ -70,6 +70,7 @@ def base_app(instance_path):
         INDEXER_FILE_DOC_TYPE="content",
         PRESERVE_CONTEXT_ON_EXCEPTION = False,
         THEME_SITEURL = 'https://localhost',
+        IIIF_CACHE_DIR=os.path.join(instance_path, 'iiif_cache'),
     )
     app_.login_manager = dict(_login_disabled=True)
     Babel(app_)
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2018 CERN.
+#
+# Invenio is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Test of the disk cache of the image derivatives."""
+
+from __future__ import absolute_import, print_function
+
+import os
+import time
+
+from invenio_iiif.cache import ImageFileCache
+
+
+# class ImageFileCache(ImageCache):
+# .tox/c1/bin/pytest --cov=invenio_iiif tests/test_cache.py::test_image_file_cache -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/invenio_iiif/.tox/c1/tmp
+def test_image_file_cache(app, tmp_path):
+    app.config.update(
+        IIIF_CACHE_DIR=str(tmp_path),
+        IIIF_CACHE_TIME=100,
+        IIIF_CACHE_MAX_SIZE=25,
+    )
+    cache = ImageFileCache()
+    assert cache() is cache
+    assert cache.get(b"iiif:a") is None
+    assert cache.get_last_modification(b"iiif:a") is None
+
+    cache.set(b"iiif:a", b"a" * 10)
+    cache.set(b"iiif:b", b"b" * 10)
+    assert cache.get(b"iiif:a") == b"a" * 10
+    assert cache.get_last_modification(b"iiif:a")
+
+    # the least recently served derivatives are evicted
+    os.utime(cache._path(b"iiif:a"), (time.time() - 50, time.time() - 50))
+    cache.set(b"iiif:c", b"c" * 10)
+    cache.evict(force=True)
+    assert cache.get(b"iiif:a") is None
+    assert cache.get(b"iiif:b") == b"b" * 10
+    assert cache.get(b"iiif:c") == b"c" * 10
+
+    # expired
+    os.utime(cache._path(b"iiif:b"), (time.time(), time.time() - 200))
+    assert cache.get(b"iiif:b") is None
+
+    cache.delete(b"iiif:c")
+    assert cache.get(b"iiif:c") is None
+
+    cache.set(b"iiif:d", b"d")
+    cache.flush()
+    assert cache.get(b"iiif:d") is None
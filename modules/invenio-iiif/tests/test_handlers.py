@@ -1,6 +1,8 @@
 
 from invenio_files_rest.models import Bucket, ObjectVersion,FileInstance
 
+from mock import patch
+
 from invenio_iiif.handlers import protect_api, image_opener
 
 # def protect_api(uuid=None, **kwargs)
@@ -36,4 +38,15 @@ def test_image_opener(db, location):
 
     id = "{}:{}:{}".format(bucket.id,version_id,key)
     result = image_opener(id)
-    assert result.read() == b""
\ No newline at end of file
+    assert result.read() == b""
+
+    # the first page of a document is served from the cache
+    with patch("invenio_iiif.handlers.HAS_IMAGEMAGICK", True):
+        with patch("invenio_iiif.handlers.current_iiif") as mock_iiif:
+            mock_iiif.cache.get.return_value = b"first page"
+            with patch("invenio_files_rest.models.FileInstance.storage") as mock_storage:
+                result = image_opener(id)
+                assert result.read() == b"first page"
+                mock_iiif.cache.get.assert_called_with(u"iiif:first_page/{}".format(id))
+                mock_storage.assert_not_called()
+
@@ -1,13 +1,16 @@
 
 import uuid
 
+from mock import patch
 from invenio_files_rest.models import Bucket, FileInstance, ObjectVersion
+from flask_iiif.restful import current_iiif
 from invenio_iiif.tasks import create_thumbnail
 
-# def create_thumbnail(uuid, thumbnail_width):
+# def create_thumbnail(uuid, thumbnail_width, image_format='jpg'):
 # .tox/c1/bin/pytest --cov=invenio_iiif tests/test_tasks.py::test_create_thumbnail -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/invenio_iiif/.tox/c1/tmp
 def test_create_thumbnail(app, db, location):
-    with app.test_request_context("/test"):
+    # rendered without a request, as in the workers
+    with app.app_context():
         bucket = Bucket.create()
         obj = ObjectVersion.create(bucket,"image-public-domain.jpg")
 
@@ -22,3 +25,15 @@ def test_create_thumbnail(app, db, location):
 
         id = "{}:{}:{}".format(bucket.id,version_id,key)
         create_thumbnail(id,"40")
+
+        # rendered once in the cache
+        key = u"iiif:{}/full/40,/default/0.jpg".format(id).encode("utf8")
+        assert current_iiif.cache.get(key)
+
+        # already cached
+        with patch("invenio_iiif.tasks.image_opener") as mock_opener:
+            create_thumbnail(id, "40")
+            mock_opener.assert_not_called()
+
+        # the object is deleted
+        create_thumbnail("{}:{}:image-public-domain.jpg".format(bucket.id, uuid.uuid4()), "40")
@@ -11,10 +11,12 @@
 from __future__ import absolute_import, print_function
 
 import pytest
+from mock import patch
 from flask_iiif import iiif_image_url
 from six.moves.urllib.parse import quote
 
-from invenio_iiif.utils import iiif_image_key, ui_iiif_image_url
+from invenio_iiif.utils import iiif_image_key, prerender_iiif_images, \
+    ui_iiif_image_url
 
 # .tox/c1/bin/pytest --cov=invenio_iiif tests/test_utils.py -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/invenio_iiif/.tox/c1/tmp
 
@@ -68,3 +70,19 @@ def test_ui_iiif_image_url(app, image_object):
     result = ui_iiif_image_url(image_object,version,region,size,rotation,quality,image_format)
     assert result == test
 
+
+# def prerender_iiif_images(objs):
+# .tox/c1/bin/pytest --cov=invenio_iiif tests/test_utils.py::test_prerender_iiif_images -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/invenio_iiif/.tox/c1/tmp
+def test_prerender_iiif_images(app, image_object):
+    app.config["IIIF_PRERENDER_WIDTHS"] = [200, 750]
+    with patch("invenio_iiif.tasks.create_thumbnail.delay") as mock_delay:
+        prerender_iiif_images([image_object, None])
+        assert mock_delay.call_count == 2
+        mock_delay.assert_any_call(iiif_image_key(image_object), 200, "png")
+        mock_delay.assert_any_call(iiif_image_key(image_object), 750, "png")
+
+    app.config["IIIF_PRERENDER_MIMETYPES"] = []
+    with patch("invenio_iiif.tasks.create_thumbnail.delay") as mock_delay:
+        prerender_iiif_images([image_object])
+        assert mock_delay.call_count == 0
+
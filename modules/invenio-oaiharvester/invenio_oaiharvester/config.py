@@ -61,3 +61,14 @@ OAIHARVESTER_ENABLE_ITEM_VERSIONING = False
 OAIHARVESTER_RETRY_COUNT = 5
 OAIHARVESTER_BACKOFF_FACTOR = 1.0
 
+OAIHARVESTER_MAPPING_WORKERS = 4
+"""Number of threads mapping the harvested records of a page to items."""
+
+OAIHARVESTER_COMMIT_INTERVAL = 50
+"""Number of harvested items committed to the database at once."""
+
+OAIHARVESTER_PREFETCH_RECORDS = 500
+"""Number of harvested records parsed ahead of their processing."""
+
+OAIHARVESTER_ITEMTYPE_CACHE_TTL = 60
+"""Seconds the mappers use their cached item types before checking them."""
@@ -21,7 +21,9 @@
 
 import copy
 import re
+import time
 from collections import OrderedDict
+from contextlib import closing
 from functools import partial
 from json import dumps, loads
 
@@ -30,6 +32,7 @@ import requests
 import xmltodict
 from bs4 import BeautifulSoup
 from flask import current_app
+from invenio_db import db
 from lxml import etree
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
@@ -39,8 +42,8 @@ from weko_records.serializers.utils import get_full_mapping, get_mapping
 from weko_records.utils import get_options_and_order_list
 
 from .config import OAIHARVESTER_BACKOFF_FACTOR, OAIHARVESTER_DOI_PREFIX, \
-    OAIHARVESTER_HDL_PREFIX, OAIHARVESTER_RETRY_COUNT, \
-    OAIHARVESTER_VERIFY_TLS_CERTIFICATE
+    OAIHARVESTER_HDL_PREFIX, OAIHARVESTER_ITEMTYPE_CACHE_TTL, \
+    OAIHARVESTER_RETRY_COUNT, OAIHARVESTER_VERIFY_TLS_CERTIFICATE
 
 DEFAULT_FIELD = [
     'title',
@@ -134,6 +137,137 @@ def list_records(
     return records, rtoken
 
 
+XML_NAMESPACE = 'http://www.w3.org/XML/1998/namespace'
+
+
+def etree_to_dict(element):
+    """Convert an element to the structure of ``xmltodict.parse``.
+
+    The result is the one of ``xmltodict.parse(etree.tostring(element))``
+    without serializing and parsing the element again.
+
+    :param element: the element.
+    :return: OrderedDict of the qualified name of the element and its value.
+    """
+    def qname(name, prefix):
+        if not name.startswith('{'):
+            return name
+        uri, local = name[1:].split('}', 1)
+        if uri == XML_NAMESPACE:
+            return 'xml:' + local
+        return '{}:{}'.format(prefix, local) if prefix else local
+
+    def attribute_qname(elem, index, name):
+        # lxml keeps the prefix of the elements only, an attribute is
+        # never in the default namespace
+        uri = name[1:].split('}', 1)[0] if name.startswith('{') else None
+        prefixes = [k for k, v in elem.nsmap.items() if k and v == uri]
+        if len(prefixes) > 1:
+            # the prefix written in the document
+            return elem.xpath('name(@*[{}])'.format(index + 1))
+        return qname(name, prefixes[0] if prefixes else None)
+
+    def convert(elem, parent_nsmap):
+        nsmap = elem.nsmap
+        value = OrderedDict()
+        for prefix, uri in nsmap.items():
+            if parent_nsmap.get(prefix) != uri:
+                value['@xmlns:' + prefix if prefix else '@xmlns'] = uri
+        for i, (k, v) in enumerate(elem.attrib.items()):
+            value['@' + attribute_qname(elem, i, k)] = v
+        texts = [elem.text or '']
+        for child in elem:
+            texts.append(child.tail or '')
+            if not isinstance(child.tag, str):
+                continue
+            key = qname(child.tag, child.prefix)
+            data = convert(child, nsmap)
+            if key not in value:
+                value[key] = data
+            elif isinstance(value[key], list):
+                value[key].append(data)
+            else:
+                value[key] = [value[key], data]
+        text = ''.join(texts).strip()
+        if not value:
+            return text or None
+        if text:
+            value[TEXT] = text
+        return value
+
+    return OrderedDict([(qname(element.tag, element.prefix),
+                         convert(element, {}))])
+
+
+class ListRecordsReader(object):
+    """Stream the records of a ListRecords response.
+
+    The response is parsed while it is received and each record is
+    yielded as soon as it is complete, converted by
+    :func:`etree_to_dict`, then released. The resumption token of the page
+    is available once the records are consumed.
+    """
+
+    def __init__(self, url, from_date=None, until_date=None,
+                 metadata_prefix=None, setspecs='*', resumption_token=None,
+                 encoding=None):
+        """Init.
+
+        :param url: the OAI-PMH endpoint.
+        :param from_date: the from argument.
+        :param until_date: the until argument.
+        :param metadata_prefix: the metadataPrefix argument.
+        :param setspecs: the set argument.
+        :param resumption_token: the resumptionToken argument.
+        :param encoding: override the encoding of the response.
+        """
+        self.url = url
+        self.payload = {
+            'verb': 'ListRecords',
+            'from': from_date if resumption_token is None else None,
+            'until': until_date if resumption_token is None else None,
+            'metadataPrefix': metadata_prefix,
+            'set': setspecs}
+        if resumption_token:
+            self.payload['resumptionToken'] = resumption_token
+        self.encoding = encoding
+        self.resumption_token = None
+
+    def __iter__(self):
+        """Yield the records of the response."""
+        # Avoid SSLError - dh key too small
+        requests.packages.urllib3.disable_warnings()
+        requests.packages.urllib3.util.ssl_.DEFAULT_CIPHERS += \
+            'HIGH:!DH:!aNULL'
+
+        with requests.Session() as s:
+            retries = Retry(total=OAIHARVESTER_RETRY_COUNT,
+                            backoff_factor=OAIHARVESTER_BACKOFF_FACTOR,
+                            status_forcelist=[500, 502, 503, 504])
+            s.mount('https://', HTTPAdapter(max_retries=retries))
+            s.mount('http://', HTTPAdapter(max_retries=retries))
+            with closing(s.get(self.url, params=self.payload, stream=True,
+                               verify=OAIHARVESTER_VERIFY_TLS_CERTIFICATE)) \
+                    as response:
+                response.raw.decode_content = True
+                for _, elem in etree.iterparse(
+                        response.raw, events=('end',),
+                        encoding=self.encoding, huge_tree=True):
+                    parent = elem.getparent()
+                    if parent is None or \
+                            etree.QName(parent).localname != 'ListRecords':
+                        continue
+                    name = etree.QName(elem).localname
+                    if name == 'record':
+                        yield etree_to_dict(elem)
+                    elif name == 'resumptionToken':
+                        self.resumption_token = elem.text
+                    # release the parsed records
+                    elem.clear()
+                    while elem.getprevious() is not None:
+                        del parent[0]
+
+
 def map_field(schema):
     """Get field map."""
     res = {}
@@ -1552,19 +1686,46 @@ class BaseMapper:
     """BaseMapper."""
 
     itemtype_map = {}
+    itemtype_versions = {}
+    itemtype_checked_at = 0
     identifiers = []
 
     @classmethod
     def update_itemtype_map(cls):
-        """Update itemtype map."""
+        """Update itemtype map.
+
+        The item types are loaded again only if one of them was created,
+        updated or deleted since they were cached.
+        """
+        versions = dict(db.session.query(ItemType.id, ItemType.updated))
+        BaseMapper.itemtype_checked_at = time.time()
+        if BaseMapper.itemtype_map and versions == BaseMapper.itemtype_versions:
+            return
+        itemtype_map = {}
         for t in ItemType.query.all():
-            cls.itemtype_map[t.item_type_name.name] = t
+            itemtype_map[t.item_type_name.name] = t
+            # the mappers of every thread share them, the session must not
+            # expire them
+            db.session.expunge(t)
+        # replaced at once, the other threads may be reading it
+        BaseMapper.itemtype_map = itemtype_map
+        BaseMapper.itemtype_versions = versions
 
     def __init__(self, xml):
-        """Init."""
-        self.xml = xml
-        self.json = xmltodict.parse(xml)
-        if not BaseMapper.itemtype_map:
+        """Init.
+
+        :param xml: the record xml, or the record already parsed by
+            :func:`etree_to_dict`.
+        """
+        if isinstance(xml, dict):
+            self.xml = None
+            self.json = xml
+        else:
+            self.xml = xml
+            self.json = xmltodict.parse(xml)
+        if not BaseMapper.itemtype_map or time.time() \
+                - BaseMapper.itemtype_checked_at \
+                > OAIHARVESTER_ITEMTYPE_CACHE_TTL:
             BaseMapper.update_itemtype_map()
 
         for item in BaseMapper.itemtype_map:
@@ -23,10 +23,14 @@ from __future__ import absolute_import, print_function
 
 import json
 import signal
+import threading
 import traceback
 from ast import literal_eval as make_tuple
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from itertools import islice
+from queue import Full, Queue
 
 import dateutil
 from celery import current_task, shared_task
@@ -36,17 +40,20 @@ from flask import current_app
 from flask_babelex import gettext as _
 from invenio_db import db
 from invenio_pidstore.models import PersistentIdentifier, PIDStatus
-from invenio_records.models import RecordMetadata
 from lxml import etree
+from sqlalchemy import and_
+from sqlalchemy.orm import aliased
 from weko_deposit.api import WekoDeposit, WekoRecord
-from weko_index_tree.models import Index
+from weko_index_tree.api import Indexes
+from weko_index_tree.models import Index, IndexAncestry
+from weko_index_tree.utils import clear_harvest_state_cache, \
+    clear_reduced_index_tree_cache
 from weko_records.models import ItemMetadata
 from weko_records_ui.utils import restore, soft_delete
 
 from .api import get_records, list_records, send_run_status_mail
 from .config import OAIHARVESTER_ENABLE_ITEM_VERSIONING
-from .harvester import DCMapper, DDIMapper, JPCOARMapper
-from .harvester import list_records as harvester_list_records
+from .harvester import DCMapper, DDIMapper, JPCOARMapper, ListRecordsReader
 from .harvester import list_sets, map_sets
 from .models import HarvestLogs, HarvestSettings
 from .signals import oaiharvest_finished
@@ -114,7 +121,13 @@ def list_records_from_dates(metadata_prefix=None, from_date=None,
 
 
 def create_indexes(parent_id, sets):
-    """Create indexes."""
+    """Create indexes.
+
+    :param parent_id: Identifier of the parent index.
+    :param sets: dict of the set names by set spec.
+    :return: The list of the created :class:`Index`.
+    """
+    created = []
     existed_leaves = Index.query.filter_by(parent=parent_id).all()
     if existed_leaves:
         pos = max([idx.position for idx in existed_leaves]) + 1
@@ -136,6 +149,11 @@ def create_indexes(parent_id, sets):
             idx.position = pos
             pos = pos + 1
             db.session.add(idx)
+            if Indexes.use_ancestry():
+                db.session.flush()
+                IndexAncestry.add_node(int(idx.id), int(parent_id))
+            created.append(idx)
+    return created
 
 
 def map_indexes(index_specs, parent_id):
@@ -156,40 +174,128 @@ def event_counter(event_name, counter):
         counter[event_name] = 1
 
 
-def process_item(record, harvesting, counter, request_info):
-    """Process item."""
-    event_counter('processed_items', counter)
-    event = ItemEvents.INIT
+def get_mapper(record, metadata_prefix):
+    """Get the mapper of a harvested record.
 
-    xml = etree.tostring(record, encoding='utf-8').decode()
+    :param record: the harvested record element, or the record parsed by
+        :func:`etree_to_dict`.
+    :param metadata_prefix: the harvested metadata prefix.
+    :return: the mapper or None if the prefix is not supported.
+    """
+    xml = record if isinstance(record, dict) else \
+        etree.tostring(record, encoding='utf-8').decode()
     # current_app.logger.debug('[{0}] [{1}] Processing xml: {2}'.format(
     #    0, 'Harvesting', xml))
-    if harvesting.metadata_prefix == 'oai_dc':
-        mapper = DCMapper(xml)
-    elif harvesting.metadata_prefix == 'jpcoar' or \
-            harvesting.metadata_prefix == 'jpcoar_1.0':
-        mapper = JPCOARMapper(xml)
-    elif harvesting.metadata_prefix == 'jpcoar_2.0':
-        mapper = JPCOARMapper(xml)
-    elif harvesting.metadata_prefix == 'oai_ddi25' or \
-            harvesting.metadata_prefix == 'ddi':
-        mapper = DDIMapper(xml)
+    if metadata_prefix == 'oai_dc':
+        return DCMapper(xml)
+    elif metadata_prefix == 'jpcoar' or \
+            metadata_prefix == 'jpcoar_1.0':
+        return JPCOARMapper(xml)
+    elif metadata_prefix == 'jpcoar_2.0':
+        return JPCOARMapper(xml)
+    elif metadata_prefix == 'oai_ddi25' or \
+            metadata_prefix == 'ddi':
+        return DDIMapper(xml)
+
+
+def map_item(app, record, metadata_prefix):
+    """Map a harvested record in a worker thread.
+
+    :param app: the Flask application.
+    :param record: the harvested record.
+    :param metadata_prefix: the harvested metadata prefix.
+    :return: tuple of the mapper and the mapped json, or None if the
+        record has to be mapped again by :func:`process_item`.
+    """
+    with app.app_context():
+        try:
+            mapper = get_mapper(record, metadata_prefix)
+            if mapper is None or mapper.is_deleted():
+                return mapper, None
+            return mapper, mapper.map()
+        except Exception:
+            current_app.logger.debug(traceback.format_exc())
+            return None
+        finally:
+            db.session.remove()
+
+
+def map_items(pool, records, metadata_prefix):
+    """Map the harvested records of a page with a worker pool.
+
+    :param pool: the executor mapping the records.
+    :param records: the harvested records.
+    :param metadata_prefix: the harvested metadata prefix.
+    :return: list of futures of :func:`map_item`, in the page order.
+    """
+    app = current_app._get_current_object()
+    return [pool.submit(map_item, app, record, metadata_prefix)
+            for record in records]
+
+
+def get_harvested_items(identifiers):
+    """Get the items already harvested for the identifiers, in one query.
+
+    :param identifiers: the OAI identifiers of the harvested records.
+    :return: dict of each identifier and its (hvstid, recid) persistent
+        identifiers, (None, None) if the record is not harvested yet.
+    """
+    harvested = dict.fromkeys(identifiers, (None, None))
+    if not harvested:
+        return harvested
+    recid = aliased(PersistentIdentifier)
+    query = db.session.query(PersistentIdentifier, recid).outerjoin(
+        recid, and_(recid.pid_type == 'recid',
+                    recid.object_uuid == PersistentIdentifier.object_uuid)
+    ).filter(
+        PersistentIdentifier.pid_type == 'hvstid',
+        PersistentIdentifier.pid_value.in_(list(harvested))
+    ).order_by(recid.id)
+    for hvstid, pid in query:
+        if harvested[hvstid.pid_value][0] is None:
+            harvested[hvstid.pid_value] = (hvstid, pid)
+    return harvested
+
+
+def process_item(record, harvesting, counter, request_info, mapped=None,
+                 harvested=None):
+    """Process item.
+
+    :param record: the harvested record.
+    :param harvesting: the harvest setting.
+    :param counter: the event counter.
+    :param request_info: the request information.
+    :param mapped: the result of :func:`map_item` for the record.
+    :param harvested: the result of :func:`get_harvested_items`, the entry
+        of the record is used once.
+    """
+    event_counter('processed_items', counter)
+    event = ItemEvents.INIT
+
+    json_data = None
+    if mapped is None:
+        mapper = get_mapper(record, harvesting.metadata_prefix)
     else:
+        mapper, json_data = mapped
+    if mapper is None:
         return
 
     current_app.logger.debug('[{0}] [{1}] Processing identifier: {2} prefix: {3}'.format(
         0, 'Harvesting', mapper.identifier(), harvesting.metadata_prefix))
-    hvstid = PersistentIdentifier.query.filter_by(
-        pid_type='hvstid', pid_value=mapper.identifier()).first()
-    if hvstid:
-        r = RecordMetadata.query.filter_by(id=hvstid.object_uuid).first()
+    if harvested is not None and mapper.identifier() in harvested:
+        hvstid, recid = harvested.pop(mapper.identifier())
+    else:
+        hvstid = PersistentIdentifier.query.filter_by(
+            pid_type='hvstid', pid_value=mapper.identifier()).first()
         recid = PersistentIdentifier.query.filter_by(
-            pid_type='recid', object_uuid=hvstid.object_uuid).first()
+            pid_type='recid', object_uuid=hvstid.object_uuid).first() \
+            if hvstid else None
+    if hvstid:
         recid.status = PIDStatus.REGISTERED
-        pubdate = dateutil.parser.parse(
-            r.json['pubdate']['attribute_value']).date()
         # dep = WekoDeposit(r.json, r)
         dep = WekoDeposit.get_record(hvstid.object_uuid)
+        pubdate = dateutil.parser.parse(
+            dep['pubdate']['attribute_value']).date()
         indexes = dep.get("path", []).copy()
         event = ItemEvents.UPDATE
     elif mapper.is_deleted():    # skip deleted item if item is not registered
@@ -220,7 +326,8 @@ def process_item(record, harvesting, counter, request_info):
         if dep.pid.status == PIDStatus.DELETED:
             recid.status = PIDStatus.DELETED
             restore(recid.pid_value)
-        json_data = mapper.map()
+        if json_data is None:
+            json_data = mapper.map()
         if not json_data:
             return
 
@@ -366,6 +473,191 @@ def link_error_handler(request, exc, traceback):
         user_data=args[2])
 
 
+class HarvestPage(object):
+    """Records of a harvested page, streamed by :func:`harvest_pages`."""
+
+    def __init__(self, queue):
+        """Init.
+
+        :param queue: the queue filled by the harvesting thread.
+        """
+        self._queue = queue
+        self.done = False
+        self.resumption_token = None
+
+    def __iter__(self):
+        """Yield the records of the page as they are received."""
+        while not self.done:
+            kind, value = self._queue.get()
+            if kind == 'record':
+                yield value
+            elif kind == 'end':
+                self.done = True
+                self.resumption_token = value
+            else:
+                raise value
+
+
+def harvest_pages(harvesting, rtoken):
+    """Iterate over the harvested pages, streaming their records.
+
+    A thread reads the responses with :class:`ListRecordsReader` and
+    queues at most ``OAIHARVESTER_PREFETCH_RECORDS`` parsed records ahead
+    of the processing, requesting the next page as soon as a page is
+    received. The resumption token of a page is set once all its records
+    are consumed.
+
+    :param harvesting: the harvest setting.
+    :param rtoken: the resumption token to start from.
+    :return: iterator of :class:`HarvestPage`.
+    """
+    def put(item):
+        while not stop.is_set():
+            try:
+                queue.put(item, timeout=1)
+                return True
+            except Full:
+                pass
+        return False
+
+    def produce(token):
+        try:
+            while True:
+                reader = ListRecordsReader(
+                    harvesting.base_url,
+                    from_date if not token else None,
+                    until_date if not token else None,
+                    harvesting.metadata_prefix,
+                    harvesting.set_spec,
+                    token)
+                for record in reader:
+                    if not put(('record', record)):
+                        return
+                token = reader.resumption_token
+                if not put(('end', token)) or not token:
+                    return
+        except Exception as ex:
+            put(('error', ex))
+
+    from_date = harvesting.from_date.__str__() \
+        if harvesting.from_date and not rtoken else None
+    until_date = harvesting.until_date.__str__() \
+        if harvesting.until_date and not rtoken else None
+    queue = Queue(maxsize=max(
+        1, current_app.config['OAIHARVESTER_PREFETCH_RECORDS']))
+    stop = threading.Event()
+    threading.Thread(target=produce, args=(rtoken,), daemon=True).start()
+    try:
+        while True:
+            page = HarvestPage(queue)
+            yield page
+            if not page.done or not page.resumption_token:
+                return
+    finally:
+        stop.set()
+
+
+def process_page(pool, page, harvesting, counter, request_info):
+    """Map and process the records of a harvested page.
+
+    The records are handled by groups of ``OAIHARVESTER_COMMIT_INTERVAL``:
+    the next group is mapped by the pool while a group is processed.
+
+    :param pool: the executor mapping the records.
+    :param page: the records of the page.
+    :param harvesting: the harvest setting.
+    :param counter: the event counter.
+    :param request_info: the request information.
+    """
+    interval = max(1, current_app.config['OAIHARVESTER_COMMIT_INTERVAL'])
+    records = iter(page)
+    group = list(islice(records, interval))
+    futures = map_items(pool, group, harvesting.metadata_prefix)
+    while group:
+        next_group = list(islice(records, interval))
+        next_futures = map_items(pool, next_group, harvesting.metadata_prefix)
+        process_items(group, futures, harvesting, counter, request_info)
+        group, futures = next_group, next_futures
+
+
+def process_items(records, futures, harvesting, counter, request_info):
+    """Process the harvested records of a page.
+
+    Each record is processed in a savepoint and the items are committed
+    every ``OAIHARVESTER_COMMIT_INTERVAL`` records. The items already
+    harvested are looked up once per commit and the Elasticsearch writes
+    are sent with one bulk request after each commit. If a commit fails,
+    the records of the batch are mapped and processed again one by one.
+
+    :param records: the harvested records, in the page order.
+    :param futures: the futures of :func:`map_item` of the records.
+    :param harvesting: the harvest setting.
+    :param counter: the event counter.
+    :param request_info: the request information.
+    """
+    def process(record, future, harvested=None):
+        # not a context manager: process_item may release the savepoint
+        savepoint = db.session.begin_nested()
+        mark = es_bulk.mark()
+        try:
+            process_item(record, harvesting, counter, request_info,
+                         mapped=future.result() if future else None,
+                         harvested=harvested)
+            if savepoint.is_active:
+                savepoint.commit()
+        except Exception as ex:
+            if savepoint.is_active:
+                savepoint.rollback()
+            es_bulk.rollback(mark)
+            current_app.logger.debug(traceback.format_exc())
+            current_app.logger.error(
+                'Error occurred while processing harvesting item\n' + str(ex))
+            event_counter('error_items', counter)
+
+    def commit():
+        try:
+            db.session.commit()
+        except Exception as ex:
+            current_app.logger.error(ex)
+            db.session.rollback()
+            es_bulk.rollback()
+            return False
+        es_bulk.send()
+        return True
+
+    def identifiers(futures):
+        for future in futures:
+            mapped = future.result()
+            if mapped and mapped[0]:
+                try:
+                    yield mapped[0].identifier()
+                except Exception:
+                    pass
+
+    interval = max(1, current_app.config['OAIHARVESTER_COMMIT_INTERVAL'])
+    with WekoDeposit.indexer.bulk_session() as es_bulk:
+        for i in range(0, len(records), interval):
+            batch = list(zip(records[i:i + interval],
+                             futures[i:i + interval]))
+            snapshot = dict(counter)
+            harvested = get_harvested_items(
+                identifiers(f for _rec, f in batch))
+            for record, future in batch:
+                process(record, future, harvested)
+            if commit():
+                continue
+            if len(batch) == 1:
+                event_counter('error_items', counter)
+                continue
+            counter.clear()
+            counter.update(snapshot)
+            # process_item changes the mapped json, so map the records again
+            for record, _future in batch:
+                process(record, None)
+                if not commit():
+                    event_counter('error_items', counter)
+
+
 def is_harvest_running(id, task_id):
     """Check harvest running."""
     actives = inspect().active()
@@ -436,8 +728,11 @@ def run_harvesting(id, start_time, user_data, request_info):
         if int(harvesting.auto_distribution):
             sets = list_sets(harvesting.base_url)
             sets_map = map_sets(sets)
-            create_indexes(harvesting.index_id, sets_map)
+            created = create_indexes(harvesting.index_id, sets_map)
             db.session.commit()
+            if created:
+                clear_reduced_index_tree_cache()
+                clear_harvest_state_cache()
         DCMapper.update_itemtype_map()
         pause = False
 
@@ -445,34 +740,21 @@ def run_harvesting(id, start_time, user_data, request_info):
             nonlocal pause
             pause = True
         signal.signal(signal.SIGTERM, sigterm_handler)
-        while True:
-            records, rtoken = harvester_list_records(
-                harvesting.base_url,
-                harvesting.from_date.__str__() if harvesting.from_date and not rtoken else None,
-                harvesting.until_date.__str__() if harvesting.until_date and not rtoken else None,
-                harvesting.metadata_prefix,
-                harvesting.set_spec,
-                rtoken)
-            current_app.logger.info('[{0}] [{1}]'.format(
-                                    0, 'Processing records'))
-            for record in records:
-                try:
-                    process_item(record, harvesting, counter, request_info)
-                    db.session.commit()
-                except Exception as ex:
-                    current_app.logger.debug(traceback.format_exc())
-                    current_app.logger.error(
-                        'Error occurred while processing harvesting item\n' + str(ex))
-                    db.session.rollback()
-                    event_counter('error_items', counter)
-            harvesting.resumption_token = rtoken
-            db.session.commit()
-            if not rtoken:
-                harvest_log.status = 'Successful'
-                break
-            elif pause is True:
-                harvest_log.status = 'Suspended'
-                break
+        with ThreadPoolExecutor(max_workers=current_app.config[
+                'OAIHARVESTER_MAPPING_WORKERS']) as pool:
+            for page in harvest_pages(harvesting, rtoken):
+                current_app.logger.info('[{0}] [{1}]'.format(
+                                        0, 'Processing records'))
+                process_page(pool, page, harvesting, counter, request_info)
+                rtoken = page.resumption_token
+                harvesting.resumption_token = rtoken
+                db.session.commit()
+                if not rtoken:
+                    harvest_log.status = 'Successful'
+                    break
+                elif pause is True:
+                    harvest_log.status = 'Suspended'
+                    break
     except Exception as ex:
         db.session.rollback()
         harvest_log.status = 'Failed'
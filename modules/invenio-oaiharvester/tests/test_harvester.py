@@ -13,6 +13,8 @@ from weko_records.serializers.utils import get_full_mapping
 from invenio_oaiharvester.harvester import (
     list_sets,
     list_records,
+    etree_to_dict,
+    ListRecordsReader,
     map_field,
     subitem_recs,
     parsing_metadata,
@@ -175,6 +177,80 @@ def test_list_records():
     assert rtoken == None
 
 
+# def etree_to_dict(element):
+# .tox/c1/bin/pytest --cov=invenio_oaiharvester tests/test_harvester.py::test_etree_to_dict -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/invenio-oaiharvester/.tox/c1/tmp
+def test_etree_to_dict(sample_jpcoar_list_xml, sample_list_xml):
+    for xml in (sample_jpcoar_list_xml, sample_list_xml):
+        et = etree.XML(xml.encode("utf-8"))
+        records = et.findall("./ListRecords/record", namespaces=et.nsmap)
+        assert records
+        for record in records:
+            assert etree_to_dict(record) == xmltodict.parse(etree.tostring(record))
+
+    record = etree.XML('<a xmlns="urn:a" xmlns:b="urn:b" xml:lang="ja">'
+                       '<b:c b:d="1">x</b:c><b:c/>tail<e xmlns:b="urn:e"><b:f>y</b:f></e></a>')
+    assert etree_to_dict(record) == xmltodict.parse(etree.tostring(record))
+
+    # several prefixes of a namespace, the ones of the document are kept
+    record = etree.XML('<a xmlns="urn:a" xmlns:p="urn:a"><p:c p:d="1">x</p:c><c>y</c></a>')
+    assert etree_to_dict(record) == xmltodict.parse(etree.tostring(record))
+    record = etree.XML('<p:a xmlns:p="urn:a" xmlns:q="urn:a">'
+                       '<q:c>x</q:c><p:c z="1" q:d="2" p:e="3">y</p:c></p:a>')
+    assert etree_to_dict(record) == xmltodict.parse(etree.tostring(record))
+
+
+# class ListRecordsReader(object):
+# .tox/c1/bin/pytest --cov=invenio_oaiharvester tests/test_harvester.py::test_list_records_reader -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/invenio-oaiharvester/.tox/c1/tmp
+@responses.activate
+def test_list_records_reader():
+    body1 = \
+        '<OAI-PMH xmlns="http://www.openarchives.org/OAI/2.0/" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">'\
+        '<responseDate>2023-03-01T10:54:40Z</responseDate>'\
+        '<request verb="ListRecords" metadataPrefix="jpcoar_1.0">https://192.168.56.103/oai</request>'\
+        '<ListRecords>'\
+        '<resumptionToken>test_token</resumptionToken>'\
+        '<record>test_record1</record>'\
+        '<record><header><identifier>oai:test:2</identifier></header></record>'\
+        '</ListRecords>'\
+        '</OAI-PMH>'
+    body2 = \
+        '<OAI-PMH xmlns="http://www.openarchives.org/OAI/2.0/">'\
+        '<ListRecords>'\
+        '<record>test_record3</record>'\
+        '<resumptionToken/>'\
+        '</ListRecords>'\
+        '</OAI-PMH>'
+    responses.add(
+        responses.GET,
+        "https://test.org/?verb=ListRecords&from=2023-01-10&until=2023-10-01&metadataPrefix=jpcoar_1.0&set=*",
+        body=body1,
+        content_type='text/xml',
+        match_querystring=True
+    )
+    responses.add(
+        responses.GET,
+        "https://test.org/?verb=ListRecords&metadataPrefix=jpcoar_1.0&set=*&resumptionToken=test_token",
+        body=body2,
+        content_type='text/xml',
+        match_querystring=True
+    )
+    # the records are the ones of list_records, parsed once
+    reader = ListRecordsReader("https://test.org/", "2023-01-10", "2023-10-01", "jpcoar_1.0", "*")
+    records = list(reader)
+    assert records == [
+        xmltodict.parse('<record xmlns="http://www.openarchives.org/OAI/2.0/" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">test_record1</record>'),
+        xmltodict.parse('<record xmlns="http://www.openarchives.org/OAI/2.0/" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"><header><identifier>oai:test:2</identifier></header></record>')]
+    assert reader.resumption_token == "test_token"
+
+    # the records are given as parsed to the mappers
+    with patch("invenio_oaiharvester.harvester.BaseMapper.update_itemtype_map"):
+        assert JPCOARMapper(records[1]).identifier() == "oai:test:2"
+
+    reader = ListRecordsReader("https://test.org/", "2023-01-10", "2023-10-01", "jpcoar_1.0", "*", resumption_token="test_token")
+    assert [r["record"]["#text"] for r in reader] == ["test_record3"]
+    assert reader.resumption_token is None
+
+
 # def map_field(schema):
 # .tox/c1/bin/pytest --cov=invenio_oaiharvester tests/test_harvester.py::test_map_field -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/invenio-oaiharvester/.tox/c1/tmp
 def test_map_field():
@@ -1032,6 +1108,42 @@ class TestBaseMapper:
         assert hasattr(mapper, "itemtype") == True
         assert mapper.itemtype == item_type2
 
+#     def update_itemtype_map(cls):
+# .tox/c1/bin/pytest --cov=invenio_oaiharvester tests/test_harvester.py::TestBaseMapper::test_update_itemtype_map -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/invenio-oaiharvester/.tox/c1/tmp
+    def test_update_itemtype_map(self,app,db):
+        item_type_name = ItemTypeName(
+            id=11, name="Multiple", has_site_license=True, is_active=True
+        )
+        item_type = ItemType(
+            id=11,name_id=11,harvesting_type=True,schema={},form={},render={},tag=1,version_id=1,is_deleted=False,
+        )
+        db.session.add(item_type_name)
+        db.session.add(item_type)
+        db.session.commit()
+        BaseMapper.update_itemtype_map()
+        itemtype_map = BaseMapper.itemtype_map
+        assert itemtype_map["Multiple"].id == 11
+
+        # not loaded again while not updated
+        BaseMapper.update_itemtype_map()
+        assert BaseMapper.itemtype_map is itemtype_map
+
+        # loaded again once updated
+        item_type = ItemType.query.get(11)
+        item_type.tag = 2
+        db.session.commit()
+        BaseMapper.update_itemtype_map()
+        assert BaseMapper.itemtype_map is not itemtype_map
+        assert BaseMapper.itemtype_map["Multiple"].tag == 2
+
+        # checked by the mappers after OAIHARVESTER_ITEMTYPE_CACHE_TTL
+        with patch("invenio_oaiharvester.harvester.BaseMapper.update_itemtype_map") as mock_update:
+            BaseMapper({})
+            mock_update.assert_not_called()
+            BaseMapper.itemtype_checked_at = 0
+            BaseMapper({})
+            mock_update.assert_called_once()
+
 #     def is_deleted(self):
 #     def identifier(self):
 #     def datestamp(self):
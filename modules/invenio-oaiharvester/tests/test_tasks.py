@@ -34,13 +34,15 @@ from lxml import etree
 
 from invenio_pidstore.models import PersistentIdentifier, PIDStatus
 
+from weko_deposit.api import WekoDeposit
 from invenio_oaiharvester.errors import InvenioOAIHarvesterError
 from invenio_oaiharvester.models import HarvestSettings,HarvestLogs
 from invenio_oaiharvester.signals import oaiharvest_finished
 from invenio_oaiharvester.tasks import create_indexes, event_counter, \
     get_specific_records, list_records_from_dates, map_indexes, \
     process_item, run_harvesting,link_success_handler,link_error_handler,\
-        is_harvest_running,check_schedules_and_run
+        is_harvest_running,check_schedules_and_run, harvest_pages, \
+        process_items, map_item, map_items, process_page, get_harvested_items
 
 # .tox/c1/bin/pytest --cov=invenio_oaiharvester tests/test_tasks.py -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/invenio-oaiharvester/.tox/c1/tmp
 
@@ -158,19 +160,40 @@ def test_create_indexes(app, db):
         db.session.add(index)
         db.session.commit()
 
-        create_indexes(index.id, {
+        created = create_indexes(index.id, {
             '1': 'set_name_1',
             '2': 'set_name_2'
         })
+        assert sorted(idx.harvest_spec for idx in created) == ['1', '2']
         assert Index.query.filter_by(harvest_spec="1").first().index_name == "set_name_1"
         assert Index.query.filter_by(harvest_spec="2").first().index_name == "set_name_2"
         
         # set in specs
-        create_indexes(index.id, {
+        assert create_indexes(index.id, {
             '1': 'new_index',
-        })
+        }) == []
         assert Index.query.filter_by(index_name="new_index").first() is None
 
+# .tox/c1/bin/pytest --cov=invenio_oaiharvester tests/test_tasks.py::test_create_indexes_ancestry -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/invenio-oaiharvester/.tox/c1/tmp
+def test_create_indexes_ancestry(app, db):
+    """Check the harvested indexes are added to the index_ancestry table."""
+    from weko_index_tree.models import IndexAncestry
+    app.config["WEKO_INDEX_TREE_USE_ANCESTRY"] = True
+    with app.app_context():
+        index = Index(parent=0)
+        db.session.add(index)
+        db.session.flush()
+        IndexAncestry.add_node(index.id, 0)
+        db.session.commit()
+
+        create_indexes(index.id, {'1': 'set_name_1'})
+        db.session.commit()
+        child = Index.query.filter_by(harvest_spec="1").first()
+        rows = IndexAncestry.query.filter_by(descendant=child.id).all()
+        assert sorted((r.ancestor, r.depth) for r in rows) == \
+            sorted([(index.id, 1), (child.id, 0)])
+        assert IndexAncestry.check() == {'missing': [], 'extra': []}
+
 
 
 def test_map_indexes(app, db):
@@ -439,6 +462,168 @@ def test_is_harvest_running(app,mocker):
         assert result == False
 
 
+# def harvest_pages(harvesting, rtoken):
+# .tox/c1/bin/pytest --cov=invenio_oaiharvester tests/test_tasks.py::test_harvest_pages -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/invenio-oaiharvester/.tox/c1/tmp
+def test_harvest_pages(app):
+    harvesting = HarvestSettings(
+        base_url="http://export.arxiv.org/oai2/",
+        from_date=datetime(2022, 10, 1),
+        until_date=None,
+        metadata_prefix="jpcoar_1.0",
+        set_spec="*"
+    )
+    app.config.update(OAIHARVESTER_PREFETCH_RECORDS=1)
+    pages = {None: (["r1", "r2"], "t1"),
+             "t1": (["r3"], "t2"),
+             "t2": (["r4"], None)}
+    calls = []
+    class MockReader(object):
+        def __init__(self, url, from_date, until_date, prefix, setspec, token):
+            calls.append((from_date, token))
+            self.records, self.token = pages[token]
+            self.resumption_token = None
+        def __iter__(self):
+            for record in self.records:
+                yield record
+            self.resumption_token = self.token
+    with patch("invenio_oaiharvester.tasks.ListRecordsReader", MockReader):
+        result = []
+        for page in harvest_pages(harvesting, None):
+            result.append((list(page), page.resumption_token))
+        assert result == [(["r1", "r2"], "t1"), (["r3"], "t2"), (["r4"], None)]
+        assert calls == [("2022-10-01 00:00:00", None), (None, "t1"), (None, "t2")]
+
+        # resume
+        calls.clear()
+        assert [list(page) for page in harvest_pages(harvesting, "t2")] == [["r4"]]
+        assert calls == [(None, "t2")]
+
+        # the harvest stops at a page not fully processed
+        pages_iter = harvest_pages(harvesting, None)
+        page = next(pages_iter)
+        assert next(iter(page)) == "r1"
+        assert list(pages_iter) == []
+        assert page.resumption_token is None
+
+    class ErrorReader(MockReader):
+        def __iter__(self):
+            yield "r1"
+            raise Exception("test_error")
+    with patch("invenio_oaiharvester.tasks.ListRecordsReader", ErrorReader):
+        page = next(harvest_pages(harvesting, None))
+        with pytest.raises(Exception) as e:
+            list(page)
+        assert str(e.value) == "test_error"
+
+
+# def process_page(pool, page, harvesting, counter, request_info):
+# .tox/c1/bin/pytest --cov=invenio_oaiharvester tests/test_tasks.py::test_process_page -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/invenio-oaiharvester/.tox/c1/tmp
+def test_process_page(app):
+    app.config.update(OAIHARVESTER_COMMIT_INTERVAL=2)
+    groups = []
+    def mock_process_items(records, futures, harvesting, counter, request_info):
+        groups.append((records, futures))
+    with patch("invenio_oaiharvester.tasks.map_items",
+               side_effect=lambda pool, records, prefix: [r.upper() for r in records]):
+        with patch("invenio_oaiharvester.tasks.process_items", side_effect=mock_process_items):
+            harvesting = HarvestSettings(metadata_prefix="jpcoar_1.0")
+            process_page(None, ["r1", "r2", "r3"], harvesting, {}, {})
+            assert groups == [(["r1", "r2"], ["R1", "R2"]), (["r3"], ["R3"])]
+
+            groups.clear()
+            process_page(None, [], harvesting, {}, {})
+            assert groups == []
+
+
+# def map_item(app, record, metadata_prefix):
+# def map_items(pool, records, metadata_prefix):
+# .tox/c1/bin/pytest --cov=invenio_oaiharvester tests/test_tasks.py::test_map_items -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/invenio-oaiharvester/.tox/c1/tmp
+def test_map_items(app, db):
+    from concurrent.futures import ThreadPoolExecutor
+    record = etree.fromstring('<record><header status="deleted"><identifier>oai:test:1</identifier></header></record>')
+    with patch("invenio_oaiharvester.harvester.BaseMapper.update_itemtype_map"):
+        mapper, json_data = map_item(app, record, "jpcoar_1.0")
+        assert mapper.identifier() == "oai:test:1"
+        assert json_data is None
+        assert map_item(app, record, "not_supported") == (None, None)
+        with patch("invenio_oaiharvester.tasks.get_mapper",
+                   side_effect=Exception("test_error")):
+            assert map_item(app, record, "jpcoar_1.0") is None
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            futures = map_items(pool, [record, record], "jpcoar_1.0")
+            assert [f.result()[0].identifier() for f in futures] == \
+                ["oai:test:1", "oai:test:1"]
+
+
+# def process_items(records, futures, harvesting, counter, request_info):
+# .tox/c1/bin/pytest --cov=invenio_oaiharvester tests/test_tasks.py::test_process_items -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/invenio-oaiharvester/.tox/c1/tmp
+def test_process_items(app, db):
+    from concurrent.futures import Future
+    app.config.update(OAIHARVESTER_COMMIT_INTERVAL=2)
+    def done(result):
+        future = Future()
+        future.set_result(result)
+        return future
+    records = ["r1", "r2", "r3"]
+    futures = [done(("m1", {})), done(None), done(("m3", {}))]
+    processed = []
+    def mock_process_item(record, harvesting, counter, request_info, mapped=None, harvested=None):
+        counter["processed_items"] = counter.get("processed_items", 0) + 1
+        processed.append((record, mapped))
+        # the writes to Elasticsearch are buffered
+        WekoDeposit.indexer._buffer(_op_type="update", _index="test", _type="item",
+                                    _id=record, _source={"doc": {}})
+        if record == "r3":
+            raise Exception("test_error")
+    bulks = []
+    def mock_bulk(client, actions, **kwargs):
+        bulks.append([action["_id"] for action in actions])
+        return []
+    counter = {}
+    with patch("weko_deposit.api.streaming_bulk", side_effect=mock_bulk):
+        with patch("invenio_oaiharvester.tasks.process_item", side_effect=mock_process_item):
+            with patch("invenio_oaiharvester.tasks.db.session.commit") as mock_commit:
+                process_items(records, futures, None, counter, {})
+                assert mock_commit.call_count == 2
+    assert processed == [("r1", ("m1", {})), ("r2", None), ("r3", ("m3", {}))]
+    assert counter == {"processed_items": 3, "error_items": 1}
+    # one bulk per commit, without the writes of the failed record
+    assert bulks == [["r1", "r2"]]
+
+    # commit failed: the records are processed again one by one
+    processed.clear()
+    bulks.clear()
+    counter = {}
+    with patch("weko_deposit.api.streaming_bulk", side_effect=mock_bulk):
+        with patch("invenio_oaiharvester.tasks.process_item", side_effect=mock_process_item):
+            with patch("invenio_oaiharvester.tasks.db.session.commit",
+                       side_effect=[Exception("test_error"), None, Exception("test_error"), None]) as mock_commit:
+                process_items(records[:2], futures[:2], None, counter, {})
+                assert mock_commit.call_count == 3
+    assert processed == [("r1", ("m1", {})), ("r2", None), ("r1", None), ("r2", None)]
+    assert counter == {"processed_items": 2, "error_items": 1}
+    assert bulks == [["r1"]]
+
+
+# def get_harvested_items(identifiers):
+# .tox/c1/bin/pytest --cov=invenio_oaiharvester tests/test_tasks.py::test_get_harvested_items -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/invenio-oaiharvester/.tox/c1/tmp
+def test_get_harvested_items(app, db):
+    import uuid
+    object_uuid = uuid.uuid4()
+    hvstid = PersistentIdentifier.create("hvstid", "oai:test:1", object_type="rec",
+                                         object_uuid=object_uuid, status=PIDStatus.REGISTERED)
+    recid = PersistentIdentifier.create("recid", "1", object_type="rec",
+                                        object_uuid=object_uuid, status=PIDStatus.REGISTERED)
+    PersistentIdentifier.create("recid", "1.1", object_type="rec",
+                                object_uuid=object_uuid, status=PIDStatus.REGISTERED)
+    db.session.commit()
+
+    assert get_harvested_items([]) == {}
+    assert get_harvested_items(["oai:test:1", "oai:test:2"]) == {
+        "oai:test:1": (hvstid, recid),
+        "oai:test:2": (None, None)}
+
+
 # .tox/c1/bin/pytest --cov=invenio_oaiharvester tests/test_tasks.py::test_run_harvesting -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/invenio-oaiharvester/.tox/c1/tmp
 @responses.activate
 def test_run_harvesting(app, db,mocker):
@@ -539,7 +724,10 @@ def test_run_harvesting(app, db,mocker):
     
     with patch('invenio_oaiharvester.tasks.is_harvest_running', return_value=False):
         with patch("invenio_oaiharvester.tasks.process_item"):
+            mock_clear = mocker.patch("invenio_oaiharvester.tasks.clear_harvest_state_cache")
             res = run_harvesting(1, '2022-10-01T00:00:00', '2022-10-01T23:59:59', {})
+            # the harvested sets are new public indexes
+            mock_clear.assert_called_once_with()
             assert res == ({"task_state":"SUCCESS","start_time":"2022-10-01T00:00:00","end_time":res[0]["end_time"],"total_records":0,"execution_time":res[0]['execution_time'],"task_name":"harvest","repository_name":"weko","task_id":None},"2022-10-01T23:59:59")
             log = HarvestLogs.query.filter_by(id=2,harvest_setting_id=1).one()
             assert log.status == "Successful"
@@ -563,7 +751,7 @@ def test_run_harvesting(app, db,mocker):
             assert log.status == "Failed"
             
         import time
-        def mock_process_item(record=None,harvesting=None,counter=None,request_info=None):
+        def mock_process_item(record=None,harvesting=None,counter=None,request_info=None,mapped=None,harvested=None):
             pid = os.getpid()
             os.kill(pid, signal.SIGTERM)
         with patch("invenio_oaiharvester.tasks.process_item",side_effect=mock_process_item):
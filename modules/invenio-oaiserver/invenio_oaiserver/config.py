@@ -48,6 +48,26 @@ OAISERVER_RESUMPTION_TOKEN_EXPIRE_TIME = 24 * 60 * 60
     https://www.elastic.co/guide/en/elasticsearch/reference/current/search-request-scroll.html
 """
 
+OAISERVER_RESUMPTION_TOKEN_MODE = 'search_after'
+"""How the resumption token resumes the harvest.
+
+``search_after`` encodes the sort values of the last record of the page
+in the token, so no Elasticsearch resource is held between requests and
+the harvest can be resumed on any node. ``scroll`` keeps a scroll context
+open until the last page. Tokens issued in scroll mode are always resumed
+with the scroll.
+"""
+
+OAISERVER_SEARCH_AFTER_SORT = [
+    {'_updated': {'order': 'asc', 'unmapped_type': 'date'}},
+    {'control_number': {'order': 'asc'}},
+]
+"""Sort of the ``search_after`` mode; the last field must be unique.
+
+Sort on doc-valued fields only, sorting on ``_id`` loads its fielddata on
+the Elasticsearch heap.
+"""
+
 OAISERVER_METADATA_FORMATS = {
     'oai_dc': {
         'serializer': (
@@ -214,3 +234,9 @@ OAISERVER_MESSAGE_NO_RECORDS_MATCH = "The combination of the values of the " \
 
 OAISERVER_ES_MAX_CLAUSE_COUNT = 1024
 """The number of clauses a Lucene BooleanQuery can have."""
+
+OAISERVER_HARVEST_STATE_CACHE_KEY = 'oaiserver_harvest_state_'
+"""Cache key prefix of the harvest state of the indexes."""
+
+OAISERVER_HARVEST_STATE_CACHE_TIMEOUT = 3600
+"""Timeout (seconds) of the harvest state of the indexes."""
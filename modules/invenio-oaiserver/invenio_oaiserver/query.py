@@ -124,19 +124,34 @@ def get_records(**kwargs):
     size_ = current_app.config['OAISERVER_PAGE_SIZE']
     scroll = current_app.config['OAISERVER_RESUMPTION_TOKEN_EXPIRE_TIME']
     scroll_id = kwargs.get('resumptionToken', {}).get('scroll_id')
+    search_after = kwargs.get('resumptionToken', {}).get('search_after')
+    use_search_after = not scroll_id and current_app.config[
+        'OAISERVER_RESUMPTION_TOKEN_MODE'] == 'search_after'
 
     if not scroll_id:
         indexes = Indexes.get_harverted_index_list()
 
         search = OAIServerSearch(
             index=current_app.config['INDEXER_DEFAULT_INDEX'],
-        ).params(
-            scroll='{0}s'.format(scroll),
-        ).extra(
-            version='true',
-        ).sort(
-            {'control_number': {'order': 'asc'}}
-        )[(page_ - 1) * size_:page_ * size_]
+        )
+        if use_search_after:
+            # one more hit tells whether there is a next page
+            search = search.extra(
+                version='true',
+                size=size_ + 1,
+            ).sort(
+                *current_app.config['OAISERVER_SEARCH_AFTER_SORT']
+            )
+            if search_after:
+                search = search.extra(search_after=search_after)
+        else:
+            search = search.params(
+                scroll='{0}s'.format(scroll),
+            ).extra(
+                version='true',
+            ).sort(
+                {'control_number': {'order': 'asc'}}
+            )[(page_ - 1) * size_:page_ * size_]
 
         sets = []
         if 'set' in kwargs:
@@ -209,9 +224,15 @@ def get_records(**kwargs):
             self.response = response
             self.total = response['hits']['total']
             self._scroll_id = response.get('_scroll_id')
+            self._search_after = None
 
+            if use_search_after:
+                hits = response['hits']['hits']
+                if self.has_next:
+                    self._search_after = hits[self.per_page - 1]['sort']
+                del hits[self.per_page:]
             # clean descriptor on last page
-            if not self.has_next:
+            elif not self.has_next:
                 current_search_client.clear_scroll(
                     scroll_id=self._scroll_id
                 )
@@ -220,6 +241,8 @@ def get_records(**kwargs):
         @cached_property
         def has_next(self):
             """Return True if there is next page."""
+            if use_search_after:
+                return len(self.response['hits']['hits']) > self.per_page
             return self.page * self.per_page <= self.total
 
         @cached_property
@@ -17,8 +17,9 @@ from flask_babelex import get_locale, to_user_timezone, to_utc
 from invenio_communities import config as invenio_communities_config
 from invenio_communities.models import Community
 from invenio_db import db
-from invenio_pidstore.errors import PIDDoesNotExistError
-from invenio_pidstore.models import PIDStatus
+from invenio_pidstore.errors import PersistentIdentifierError, \
+    PIDDoesNotExistError
+from invenio_pidstore.models import PersistentIdentifier, PIDStatus
 from invenio_records.models import RecordMetadata
 from lxml import etree
 from lxml.etree import Element, ElementTree, SubElement
@@ -35,8 +36,8 @@ from .provider import OAIIDProvider
 from .query import get_records
 from .resumption_token import serialize
 from .utils import HARVEST_PRIVATE, OUTPUT_HARVEST, PRIVATE_INDEX, \
-    datetime_to_datestamp, get_index_state, handle_license_free, \
-    is_output_harvest, serializer
+    copy_record_for_serialization, datetime_to_datestamp, \
+    get_harvest_state, handle_license_free, is_output_harvest, serializer
 
 NS_OAIPMH = 'http://www.openarchives.org/OAI/2.0/'
 NS_OAIPMH_XSD = 'http://www.openarchives.org/OAI/2.0/OAI-PMH.xsd'
@@ -403,7 +404,7 @@ def getrecord(**kwargs):
     e_tree, e_getrecord = verb(**kwargs)
     e_record = SubElement(e_getrecord, etree.QName(NS_OAIPMH, 'record'))
 
-    index_state = get_index_state()
+    index_state = get_harvest_state()
     path_list = record.get('path') if 'path' in record else []
     _is_output = is_output_harvest(path_list, index_state)
     current_app.logger.debug("_is_output:{}".format(_is_output))
@@ -451,7 +452,7 @@ def getrecord(**kwargs):
     e_metadata = SubElement(e_record,
                             etree.QName(NS_OAIPMH, 'metadata'))
 
-    etree_record = pickle.loads(pickle.dumps(record, -1))
+    etree_record = copy_record_for_serialization(record)
 
     if not etree_record.get('system_identifier_doi', None):
         etree_record['system_identifier_doi'] = get_identifier(record)
@@ -465,6 +466,37 @@ def getrecord(**kwargs):
     return e_tree
 
 
+def prefetch_records(hits):
+    """Load the OAI PIDs and the records of a page of search hits.
+
+    All the OAI identifiers of the page are resolved with one query and all
+    the records with another one, instead of two queries per hit.
+
+    :param hits: The search hits of the page.
+    :returns: dict of ``(pid_object, record)`` by OAI identifier. The record
+        is ``None`` when it does not exist or is deleted.
+    """
+    pid_values = set()
+    for r in hits:
+        try:
+            pid_values.add(
+                oaiid_fetcher(r['id'], r['json']['_source']).pid_value)
+        except (KeyError, TypeError, PersistentIdentifierError):
+            continue
+    if not pid_values:
+        return {}
+
+    pid_objects = PersistentIdentifier.query.filter(
+        PersistentIdentifier.pid_type == OAIIDProvider.pid_type,
+        PersistentIdentifier.pid_provider == OAIIDProvider.pid_provider,
+        PersistentIdentifier.pid_value.in_(pid_values)).all()
+    records = {
+        str(record.id): record for record in WekoRecord.get_records(
+            [p.object_uuid for p in pid_objects if p.object_uuid])}
+    return {p.pid_value: (p, records.get(str(p.object_uuid)))
+            for p in pid_objects}
+
+
 def listidentifiers(**kwargs):
     """Create OAI-PMH response for verb ListIdentifiers."""
     e_tree, e_listidentifiers = verb(**kwargs)
@@ -472,7 +504,7 @@ def listidentifiers(**kwargs):
     if not identify or not identify.outPutSetting:
         return error(get_error_code_msg(), **kwargs)
 
-    index_state = get_index_state()
+    index_state = get_harvest_state()
     set_is_output = 0
     if 'set' in kwargs:
         set_obj = OAISet.get_set_by_spec(kwargs['set'])
@@ -487,11 +519,16 @@ def listidentifiers(**kwargs):
     if not result.total:
         return error(get_error_code_msg(), **kwargs)
 
+    prefetched = prefetch_records(result.items)
     for r in result.items:
         try:
             pid = oaiid_fetcher(r['id'], r['json']['_source'])
-            pid_object = OAIIDProvider.get(pid_value=pid.pid_value).pid
-            record = WekoRecord.get_record_by_uuid(pid_object.object_uuid)
+            pid_object, record = prefetched.get(pid.pid_value, (None, None))
+            if pid_object is None:
+                raise PIDDoesNotExistError(OAIIDProvider.pid_type,
+                                           pid.pid_value)
+            if record is None:
+                raise NoResultFound()
             set_identifier(record, record)
 
             path_list = record.get('path') if 'path' in record else []
@@ -569,7 +606,7 @@ def listrecords(**kwargs):
             "No identify.outPutSetting")
         return error(get_error_code_msg(), **kwargs)
 
-    index_state = get_index_state()
+    index_state = get_harvest_state()
     set_is_output = 0
     if 'set' in kwargs:
         set_obj = OAISet.get_set_by_spec(kwargs['set'])
@@ -586,11 +623,16 @@ def listrecords(**kwargs):
     if not result.total:
         return error(get_error_code_msg(), **kwargs)
 
+    prefetched = prefetch_records(result.items)
     for r in result.items:
         try:
             pid = oaiid_fetcher(r['id'], r['json']['_source'])
-            pid_object = OAIIDProvider.get(pid_value=pid.pid_value).pid
-            record = WekoRecord.get_record_by_uuid(pid_object.object_uuid)
+            pid_object, record = prefetched.get(pid.pid_value, (None, None))
+            if pid_object is None:
+                raise PIDDoesNotExistError(OAIIDProvider.pid_type,
+                                           pid.pid_value)
+            if record is None:
+                raise NoResultFound()
             set_identifier(record, record)
             path_list = record.get('path') if 'path' in record else []
             _is_output = is_output_harvest(path_list, index_state) \
@@ -644,7 +686,7 @@ def listrecords(**kwargs):
                 )
                 e_metadata = SubElement(e_record, etree.QName(NS_OAIPMH,
                                                               'metadata'))
-                etree_record = pickle.loads(pickle.dumps(record, -1))
+                etree_record = copy_record_for_serialization(record)
                 if not etree_record.get('system_identifier_doi', None):
                     etree_record['system_identifier_doi'] = get_identifier(
                         record)
@@ -36,6 +36,9 @@ def serialize(pagination, **kwargs):
     scroll_id = getattr(pagination, '_scroll_id', None)
     if scroll_id:
         data['scroll_id'] = scroll_id
+    search_after = getattr(pagination, '_search_after', None)
+    if search_after:
+        data['search_after'] = search_after
 
     return token_builder.dumps(data)
 
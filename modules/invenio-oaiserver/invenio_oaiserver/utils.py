@@ -10,14 +10,20 @@
 
 from __future__ import absolute_import, print_function
 
+import copy
+import threading
+import time
 from datetime import datetime
 from functools import partial
 
 from flask import current_app
+from flask_babelex import to_utc
+from invenio_cache import current_cache
 from lxml import etree
 from lxml.builder import E
 from lxml.etree import Element
 from weko_index_tree.api import Indexes
+from weko_index_tree.utils import get_harvest_state_generation
 from weko_schema_ui.schema import get_oai_metadata_formats
 from werkzeug.utils import import_string
 
@@ -210,10 +216,28 @@ def handle_license_free(record_metadata):
     return record_metadata
 
 
-def get_index_state():
+def copy_record_for_serialization(record):
+    """Copy a record before the edits made for its OAI-PMH serialization.
+
+    Only the top-level mapping and the file metadata rewritten by
+    :func:`handle_license_free` are copied. The other values are shared with
+    ``record``, so the cost does not grow with the size of the metadata.
+    The serializers take their own copy with ``Record.dumps()``.
+
+    :param record: The :class:`invenio_records.api.Record` instance.
+    :returns: A new instance of the record class.
+    """
+    data = dict(record)
+    for key, val in data.items():
+        if isinstance(val, dict) and val.get('attribute_type') == 'file':
+            data[key] = copy.deepcopy(val)
+    return record.__class__(data, model=record.model)
+
+
+def get_index_state(indexes=None):
     from weko_records_ui.utils import is_future
     index_state = {}
-    ids = Indexes.get_all_indexes()
+    ids = Indexes.get_all_indexes() if indexes is None else indexes
     for index in ids:
         index_id = str(index.id)
         if not index.harvest_public_state:
@@ -237,8 +261,87 @@ def get_index_state():
     return index_state
 
 
+_harvest_state = dict()
+_harvest_state_lock = threading.Lock()
+
+
+def resolve_index_state(index_state):
+    """Resolve the ancestors of the state built by :func:`get_index_state`.
+
+    :param index_state: the state of each index.
+    :return: dict of index id and harvest state of the index and ancestors.
+    """
+    resolved = {}
+    for index_id in index_state:
+        chain = []
+        state = None
+        current = index_id
+        while state is None:
+            if current in resolved:
+                state = resolved[current]
+            elif current not in index_state or current in chain:
+                state = HARVEST_PRIVATE
+            else:
+                chain.append(current)
+                parent = index_state[current]['parent']
+                if not parent or parent == '0':
+                    state = index_state[current]['msg']
+                else:
+                    current = parent
+        for node in chain:
+            resolved[node] = state
+    return resolved
+
+
+def build_harvest_state():
+    """Build the harvest state of all the indexes.
+
+    :return: tuple of the expiry (epoch seconds) and the state resolved by
+        :func:`resolve_index_state`. The state expires at the next future
+        public date of an index.
+    """
+    now = datetime.utcnow()
+    expires = time.time() + \
+        current_app.config['OAISERVER_HARVEST_STATE_CACHE_TIMEOUT']
+    indexes = Indexes.get_all_indexes()
+    for index in indexes:
+        if index.public_date:
+            left = (to_utc(index.public_date) - now).total_seconds()
+            if left > 0:
+                expires = min(expires, time.time() + left)
+    return expires, resolve_index_state(get_index_state(indexes))
+
+
+def get_harvest_state():
+    """Get the harvest state of all the indexes with ancestors resolved.
+
+    The state is shared through the cache and kept in the process until
+    an index changes (see ``get_harvest_state_generation``) or the next
+    public date of an index passes.
+
+    :return: dict of index id and harvest state.
+    """
+    key = '{}{}'.format(
+        current_app.config['OAISERVER_HARVEST_STATE_CACHE_KEY'],
+        get_harvest_state_generation())
+    cached = _harvest_state.get(key)
+    if cached and cached[0] > time.time():
+        return cached[1]
+    cached = current_cache.get(key)
+    if not cached or cached[0] <= time.time():
+        cached = build_harvest_state()
+        current_cache.set(key, cached,
+                          timeout=max(1, int(cached[0] - time.time())))
+    with _harvest_state_lock:
+        _harvest_state.clear()
+        _harvest_state[key] = cached
+    return cached[1]
+
+
 def is_output_harvest(path_list, index_state):
     def _check(index_id):
+        if isinstance(index_state.get(index_id), int):
+            return index_state[index_id]
         if index_id in index_state:
             if not index_state[index_id]['parent'] \
                     or index_state[index_id]['parent'] == '0':
@@ -78,6 +78,7 @@ install_requires = [
     'Flask>=0.11.1',
     'Flask-BabelEx>=0.9.2',
     'dojson>=1.2.0',
+    'invenio-cache>=1.0.0',
     'invenio-pidstore>=1.0.0b2',
     'invenio-records>=1.0.0b3',
     'lxml>=3.5.0',
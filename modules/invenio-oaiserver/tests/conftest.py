@@ -29,6 +29,7 @@ from invenio_access import InvenioAccess
 from invenio_accounts import InvenioAccounts
 from invenio_accounts.models import User, Role
 from invenio_accounts.testutils import create_test_user
+from invenio_cache import InvenioCache
 from invenio_access.models import ActionUsers,ActionRoles
 from invenio_communities.models import Community
 from invenio_db import InvenioDB
@@ -100,13 +101,16 @@ def base_app(instance_path):
         INDEXER_DEFAULT_INDEX="{}-weko-item-v1.0.0".format("test"),
         SEARCH_UI_SEARCH_INDEX="{}-weko".format("test"),
         SEARCH_ELASTIC_HOSTS="elasticsearch",
-        SEARCH_INDEX_PREFIX="test-"
+        SEARCH_INDEX_PREFIX="test-",
+        CACHE_TYPE="simple",
+        WEKO_INDEX_TREE_HARVEST_STATE_GENERATION="index_harvest_state_generation",
     )
     if not hasattr(app_, 'cli'):
         from flask_cli import FlaskCLI
         FlaskCLI(app_)
     InvenioDB(app_)
     Babel(app_)
+    InvenioCache(app_)
     FlaskCeleryExt(app_)
     InvenioAccess(app_)
     InvenioAccounts(app_)
@@ -178,3 +178,63 @@ def test_get_records(es_app,db, mock_execute):
         assert result.next_num == 2
         result_items = [r for r in result.items]
         assert result_items == test
+
+
+# .tox/c1/bin/pytest --cov=invenio_oaiserver tests/test_query.py::test_get_records_search_after -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/invenio-oaiserver/.tox/c1/tmp
+def test_get_records_search_after(es_app, db):
+    from invenio_oaiserver.query import OAIServerSearch
+    es_app.config.update(OAISERVER_PAGE_SIZE=2,
+                         OAISERVER_RESUMPTION_TOKEN_MODE="search_after")
+
+    def _hit(i):
+        return {
+            "_id": "test_id_{}".format(i),
+            "_source": {"_oai": {"id": "oai:test:0000{}".format(i), "sets": []},
+                        "_updated": "2022-01-10T10:02:23"},
+            "sort": [1641808943000, "{}".format(i)]
+        }
+
+    bodies = []
+
+    def _execute(hits):
+        def execute(self):
+            bodies.append(self.to_dict())
+            response = {"hits": {"total": 3, "hits": hits}}
+            return type("Response", (), {"to_dict": lambda _: response})()
+        return execute
+
+    with patch("invenio_oaiserver.query.Indexes.get_harverted_index_list",
+               return_value=[]):
+        # first page
+        with patch.object(OAIServerSearch, "execute",
+                          _execute([_hit(1), _hit(2), _hit(3)])):
+            with patch("invenio_oaiserver.query.current_search_client.clear_scroll") as mock_clear:
+                result = get_records()
+                mock_clear.assert_not_called()
+        assert bodies[0]["size"] == 3
+        assert "search_after" not in bodies[0]
+        assert bodies[0]["sort"] == es_app.config["OAISERVER_SEARCH_AFTER_SORT"]
+        assert result.has_next
+        assert result.next_num == 2
+        assert result._scroll_id is None
+        assert result._search_after == [1641808943000, "2"]
+        assert [r["id"] for r in result.items] == ["test_id_1", "test_id_2"]
+
+        # last page
+        token = {"page": 2, "search_after": result._search_after}
+        with patch.object(OAIServerSearch, "execute", _execute([_hit(3)])):
+            result = get_records(resumptionToken=token)
+        assert bodies[1]["search_after"] == [1641808943000, "2"]
+        assert not result.has_next
+        assert result._search_after is None
+        assert [r["id"] for r in result.items] == ["test_id_3"]
+
+    # scroll mode
+    es_app.config.update(OAISERVER_RESUMPTION_TOKEN_MODE="scroll")
+    with patch("invenio_oaiserver.query.Indexes.get_harverted_index_list",
+               return_value=[]):
+        with patch.object(OAIServerSearch, "execute",
+                          _execute([_hit(1), _hit(2)])):
+            result = get_records()
+    assert bodies[2]["size"] == 2
+    assert result._search_after is None
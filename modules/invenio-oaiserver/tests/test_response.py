@@ -14,12 +14,10 @@ from mock import patch
 from flask import current_app
 from flask_babelex import Babel
 from werkzeug.utils import cached_property
-from sqlalchemy.orm.exc import NoResultFound
 from lxml import etree
 from lxml.etree import Element, SubElement
 
 from invenio_records.models import RecordMetadata
-from invenio_pidstore.errors import PIDDoesNotExistError
 from invenio_pidstore.models import PersistentIdentifier,PIDStatus
 from invenio_pidrelations.models import PIDRelation
 
@@ -52,7 +50,8 @@ from invenio_oaiserver.response import (
     create_files_url,
     get_identifier,
     header,
-    identify
+    identify,
+    prefetch_records
 )
 
 
@@ -753,11 +752,11 @@ def test_listidentifiers(es_app,records,item_type,mock_execute,db,mocker):
         )
         with patch("invenio_oaiserver.response.get_records",return_value=MockPagenation(dummy_data)):
             # raise PIDDoesNotExistError
-            with patch("invenio_oaiserver.response.OAIIDProvider.get",side_effect=PIDDoesNotExistError("test pid_type","test pid_value")):
+            with patch("invenio_oaiserver.response.prefetch_records",return_value={}):
                 res=listidentifiers(**kwargs)
                 assert res.xpath("/x:OAI-PMH/x:error",namespaces=NAMESPACES)[0].attrib["code"] == "noRecordsMatch"
             # raise NoResultFound
-            with patch("invenio_oaiserver.response.WekoRecord.get_record_by_uuid",side_effect=NoResultFound()):
+            with patch("invenio_oaiserver.response.WekoRecord.get_records",return_value=[]):
                 res=listidentifiers(**kwargs)
                 assert res.xpath("/x:OAI-PMH/x:error",namespaces=NAMESPACES)[0].attrib["code"] == "noRecordsMatch"
 
@@ -1054,15 +1053,40 @@ def test_listrecords(es_app,records,item_type,mock_execute,db,mocker):
         )
         with patch("invenio_oaiserver.response.get_records",return_value=MockPagenation(dummy_data)):
             # raise PIDDoesNotExistError
-            with patch("invenio_oaiserver.response.OAIIDProvider.get",side_effect=PIDDoesNotExistError("test pid_type","test pid_value")):
+            with patch("invenio_oaiserver.response.prefetch_records",return_value={}):
                 res=listrecords(**kwargs)
                 assert res.xpath("/x:OAI-PMH/x:error",namespaces=NAMESPACES)[0].attrib["code"] == "noRecordsMatch"
             # raise NoResultFound
-            with patch("invenio_oaiserver.response.WekoRecord.get_record_by_uuid",side_effect=NoResultFound()):
+            with patch("invenio_oaiserver.response.WekoRecord.get_records",return_value=[]):
                 res=listrecords(**kwargs)
                 assert res.xpath("/x:OAI-PMH/x:error",namespaces=NAMESPACES)[0].attrib["code"] == "noRecordsMatch"
 
 
+# def prefetch_records(hits):
+# .tox/c1/bin/pytest --cov=invenio_oaiserver tests/test_response.py::test_prefetch_records -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/invenio-oaiserver/.tox/c1/tmp
+def test_prefetch_records(app,records,db):
+    def _hit(i):
+        return {"id": records[i][2].id,
+                "json": {"_source": {"_oai": {"id": records[i][1].pid.pid_value}}}}
+    hits = [_hit(0), _hit(1), _hit(0), {"id": None, "json": {"_source": {}}}]
+    with patch("invenio_oaiserver.response.OAIIDProvider.get") as mock_get:
+        res = prefetch_records(hits)
+        mock_get.assert_not_called()
+    assert sorted(res.keys()) == sorted(
+        [records[0][1].pid.pid_value, records[1][1].pid.pid_value])
+    pid_object, record = res[records[0][1].pid.pid_value]
+    assert pid_object.object_uuid == records[0][2].id
+    assert record.id == records[0][2].id
+    assert record == records[0][2]
+
+    # deleted record
+    with patch("invenio_oaiserver.response.WekoRecord.get_records", return_value=[]):
+        res = prefetch_records([_hit(0)])
+        assert res[records[0][1].pid.pid_value][1] is None
+
+    assert prefetch_records([]) == {}
+
+
 # def envelope(**kwargs):
 # .tox/c1/bin/pytest --cov=invenio_oaiserver tests/test_response.py::test_envelope -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/invenio-oaiserver/.tox/c1/tmp
 def test_envelope(app):
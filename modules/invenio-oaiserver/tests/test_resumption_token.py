@@ -40,6 +40,14 @@ def test_serialize(app,mocker):
     assert args[0]["scroll_id"] == 2
     assert args[0]["kwargs"] == {"identifier":"test_identifier","metadataPrefix":"jpcoar_1.0"}
 
+    pagination = MockPagenation(True,10,None)
+    pagination._search_after = [1641808943000,"test_id_2"]
+    mock_dump = mocker.patch("invenio_oaiserver.resumption_token.URLSafeTimedSerializer.dumps")
+    result = serialize(pagination,verb="GetRecord",identifier="test_identifier",metadataPrefix="jpcoar_1.0")
+    args, _ = mock_dump.call_args
+    assert args[0]["search_after"] == [1641808943000,"test_id_2"]
+    assert "scroll_id" not in args[0]
+
 #class ResumptionToken(fields.Field):
 #    def _deserialize(self, value, attr, data):
 #class ResumptionTokenSchema(Schema):
@@ -14,7 +14,10 @@ from invenio_oaiserver.utils import (
     datetime_to_datestamp,
     eprints_description,
     handle_license_free,
+    copy_record_for_serialization,
     get_index_state,
+    resolve_index_state,
+    get_harvest_state,
     is_output_harvest
 )
 
@@ -137,6 +140,38 @@ def test_handle_license_free(app):
     current_app.config.update(WEKO_RECORDS_UI_LICENSE_DICT=[])
     handle_license_free(data)
     
+#def copy_record_for_serialization(record):
+# .tox/c1/bin/pytest --cov=invenio_oaiserver tests/test_utils.py::test_copy_record_for_serialization -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/invenio-oaiserver/.tox/c1/tmp
+def test_copy_record_for_serialization(app, db):
+    from invenio_records.api import Record
+    data = {
+        "item_1617605131499": {
+            "attribute_name": "File",
+            "attribute_type": "file",
+            "attribute_value_mlt": [
+                {"licensefree": "own license", "licensetype": "license_free"}
+            ]
+        },
+        "item_1617186331708": {
+            "attribute_name": "Title",
+            "attribute_value_mlt": [{"subitem_title": "title"}]
+        }
+    }
+    record = Record.create(copy.deepcopy(data))
+    res = copy_record_for_serialization(record)
+    assert isinstance(res, Record)
+    assert res == record
+    assert res.id == record.id
+    assert res.updated == record.updated
+
+    res["system_identifier_doi"] = "doi"
+    handle_license_free(res)
+    assert "system_identifier_doi" not in record
+    assert record["item_1617605131499"] == data["item_1617605131499"]
+    # other values are shared with the record
+    assert res["item_1617186331708"] is record["item_1617186331708"]
+
+
 #def get_index_state():
 # .tox/c1/bin/pytest --cov=invenio_oaiserver tests/test_utils.py::test_get_index_state -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/invenio-oaiserver/.tox/c1/tmp
 def test_get_index_state(app, db):
@@ -191,4 +226,86 @@ def test_is_output_harvest(app):
     }
     path_list = ["1","2","1000"]
     result = is_output_harvest(path_list,index_state)
-    assert result == 3
\ No newline at end of file
+    assert result == 3
+
+    # resolved state
+    index_state = {"1": 3, "2": 1}
+    assert is_output_harvest(["2"], index_state) == 1
+    assert is_output_harvest(["1", "2"], index_state) == 3
+    assert is_output_harvest(["1000"], index_state) == 2
+
+
+#def resolve_index_state(index_state):
+# .tox/c1/bin/pytest --cov=invenio_oaiserver tests/test_utils.py::test_resolve_index_state -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/invenio-oaiserver/.tox/c1/tmp
+def test_resolve_index_state(app):
+    index_state = {
+        "1": {"parent": "0", "msg": 3},
+        "2": {"parent": "1", "msg": 3},
+        "3": {"parent": None, "msg": 1},
+        "4": {"parent": "3", "msg": 3},
+        "5": {"parent": "4", "msg": 3},
+        "6": {"parent": "1000", "msg": 3},
+        "7": {"parent": "8", "msg": 3},
+        "8": {"parent": "7", "msg": 3},
+    }
+    result = resolve_index_state(index_state)
+    assert result == {"1": 3, "2": 3, "3": 1, "4": 1, "5": 1,
+                      "6": 2, "7": 2, "8": 2}
+    for path in ["1", "2", "4", "5", "6", "1000"]:
+        assert is_output_harvest([path], result) == \
+            is_output_harvest([path], index_state)
+
+
+#def get_harvest_state():
+# .tox/c1/bin/pytest --cov=invenio_oaiserver tests/test_utils.py::test_get_harvest_state -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/invenio-oaiserver/.tox/c1/tmp
+def test_get_harvest_state(app, db):
+    from weko_index_tree.models import Index
+    from weko_index_tree.utils import clear_harvest_state_cache
+
+    index1 = Index(
+        id=1,
+        parent=0,
+        position=1,
+        harvest_public_state=True,
+        public_state=True,
+        browsing_role="3,-99"
+    )
+    index2 = Index(
+        id=2,
+        parent=1,
+        position=1,
+        harvest_public_state=True,
+        public_state=True,
+        browsing_role="3,-99"
+    )
+    db.session.add_all([index1, index2])
+    db.session.commit()
+    clear_harvest_state_cache()
+    with patch("invenio_oaiserver.utils.Indexes.get_all_indexes",
+               wraps=Indexes.get_all_indexes) as mock_indexes:
+        assert get_harvest_state() == {"1": 3, "2": 3}
+        assert get_harvest_state() == {"1": 3, "2": 3}
+        assert mock_indexes.call_count == 1
+
+        # index updated
+        index1.public_state = False
+        db.session.commit()
+        clear_harvest_state_cache()
+        assert get_harvest_state() == {"1": 1, "2": 1}
+        assert mock_indexes.call_count == 2
+
+        # public date in the future
+        index1.public_state = True
+        index1.public_date = datetime(2100, 1, 1)
+        db.session.commit()
+        clear_harvest_state_cache()
+        assert get_harvest_state() == {"1": 1, "2": 1}
+        assert mock_indexes.call_count == 3
+
+        # public date passed
+        with patch("invenio_oaiserver.utils.time.time",
+                   return_value=datetime(2100, 1, 2).timestamp()):
+            index1.public_date = datetime(2000, 1, 1)
+            db.session.commit()
+            assert get_harvest_state() == {"1": 3, "2": 3}
+            assert mock_indexes.call_count == 4
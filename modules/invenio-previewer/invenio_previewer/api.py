@@ -34,7 +34,8 @@ import subprocess
 from os.path import basename, splitext
 from time import sleep
 
-from flask import current_app, flash, redirect, request, url_for
+from flask import current_app, flash, has_request_context, redirect, \
+    request, url_for
 from flask_babelex import gettext as _
 
 
@@ -110,6 +111,12 @@ def convert_to(folder, source):
             )
         )
 
+    def notify_error(err_txt):
+        # the conversions of the background tasks have no request
+        if has_request_context():
+            flash(err_txt, category='error')
+            redirect_detail_page(request.path.split('/').pop(2))
+
     timeout = current_app.config['PREVIEWER_CONVERT_PDF_TIMEOUT']
     args = [
         'libreoffice',
@@ -130,7 +137,6 @@ def convert_to(folder, source):
     # Change home var for next subprocess for process runs faster.
     os_env['HOME'] = temp_folder
     filename = err_txt = None
-    pid_value = request.path.split('/').pop(2)
 
     try:
         process_count = 0
@@ -165,8 +171,7 @@ def convert_to(folder, source):
             '{' + folder + '} ',
             _('Please contact the administrator.')
         ))
-        flash(err_txt, category='error')
-        redirect_detail_page(pid_value)
+        notify_error(err_txt)
     except PermissionError as ex:
         current_app.logger.error(ex)
         err_txt = ''.join((
@@ -174,8 +179,7 @@ def convert_to(folder, source):
             '{' + folder + '} ',
             _('Please contact the administrator.')
         ))
-        flash(err_txt, category='error')
-        redirect_detail_page(pid_value)
+        notify_error(err_txt)
     except OSError as ex:
         if ex.errno == errno.ENOSPC:
             current_app.logger.error(ex)
@@ -183,14 +187,12 @@ def convert_to(folder, source):
                 _('There is not enough storage space.'),
                 _('Please contact the administrator.')
             ))
-        flash(err_txt, category='error')
-        redirect_detail_page(pid_value)
+        notify_error(err_txt)
     except Exception as ex:
         current_app.logger.error(ex)
         # Fill strings if necessary
         err_txt = ''
-        flash(err_txt, category='error')
-        redirect_detail_page(pid_value)
+        notify_error(err_txt)
     finally:
         shutil.rmtree(temp_folder)
 
@@ -20,7 +20,7 @@ from celery.utils.log import get_task_logger
 from dateutil import parser
 from elasticsearch import VERSION as ES_VERSION
 from elasticsearch.helpers import bulk
-from elasticsearch_dsl import Index, Search
+from elasticsearch_dsl import A, Index, Search
 from flask import current_app
 from invenio_search import current_search_client
 from invenio_search.utils import prefix_index
@@ -290,27 +290,58 @@ class StatAggregator(object):
 
     def agg_iter(self, lower_limit=None, upper_limit=None, manual=False):
         """Aggregate and return dictionary to be indexed in ES."""
-        logger = get_task_logger(__name__)
-
-        lower_limit = (
-            lower_limit
-            or self.bookmark_api.get_bookmark()
-            or self._get_oldest_event_timestamp()
-        )
-        upper_limit = upper_limit or (
-            datetime.datetime.utcnow().replace(microsecond=0).isoformat())
-        aggregation_data = {}
-
-        self.agg_query = Search(using=self.client,
-                                index=self.event_index).\
+        db_backup = current_app.config['STATS_WEKO_DB_BACKUP_AGGREGATION']
+        db_backup_size = current_app.config.get(
+            'STATS_WEKO_DB_BACKUP_BULK_SIZE', 0)
+        db_backup_buffer = []
+        try:
+            for rtn_data in self._agg_iter(lower_limit, upper_limit, manual):
+                if db_backup:
+                    # Save stats aggregation into Database.
+                    if db_backup_size > 0:
+                        db_backup_buffer.append(rtn_data)
+                        if len(db_backup_buffer) >= db_backup_size:
+                            StatsAggregation.save_bulk(
+                                db_backup_buffer, delete=True)
+                            db_backup_buffer = []
+                    else:
+                        StatsAggregation.save(rtn_data, delete=True)
+                yield rtn_data
+        finally:
+            if db_backup_buffer:
+                StatsAggregation.save_bulk(db_backup_buffer, delete=True)
+
+    def _build_agg_query(self, lower_limit, upper_limit):
+        """Build the raw events query of the given range."""
+        agg_query = Search(using=self.client,
+                           index=self.event_index)[0:0].\
             filter('range', timestamp={
                 'gte': format_range_dt(lower_limit, self.aggregation_interval),
                 'lte': format_range_dt(upper_limit, self.aggregation_interval)})
 
         # apply query modifiers
         for modifier in self.query_modifiers:
-            self.agg_query = modifier(self.agg_query)
+            agg_query = modifier(agg_query)
+        return agg_query
 
+    def _apply_bucket_metrics(self, agg):
+        """Add the top hit and the metric aggregations to a bucket agg."""
+        agg.metric(
+            'top_hit', 'top_hits', size=1, sort={'timestamp': 'desc'}
+        )
+        for dst, (metric, src, opts) in self.metric_aggregation_fields.items():
+            agg.metric(dst, metric, field=src, **opts)
+
+    def _histogram_buckets(self, lower_limit, upper_limit):
+        """Fetch all the buckets of the range in a single request.
+
+        The whole date_histogram/terms aggregation is held in memory, prefer
+        :meth:`_composite_buckets` on large event indices.
+
+        :returns: iterator of (interval date, bucket) tuples.
+        """
+        logger = get_task_logger(__name__)
+        self.agg_query = self._build_agg_query(lower_limit, upper_limit)
         hist = self.agg_query.aggs.bucket(
             'histogram',
             'date_histogram',
@@ -321,12 +352,7 @@ class StatAggregator(object):
             'terms', 'terms', field=self.aggregation_field,
             size=current_app.config['STATS_ES_INTEGER_MAX_VALUE']
         )
-        # FIXME: Paginate?
-        top = terms.metric(
-            'top_hit', 'top_hits', size=1, sort={'timestamp': 'desc'}
-        )
-        for dst, (metric, src, opts) in self.metric_aggregation_fields.items():
-            terms.metric(dst, metric, field=src, **opts)
+        self._apply_bucket_metrics(terms)
         logger.debug("agg_query query: {}".format(self.agg_query))
         results = self.agg_query.execute()
         logger.debug("agg_query result: {}".format(len(results)))
@@ -334,53 +360,165 @@ class StatAggregator(object):
             interval_date = datetime.datetime.strptime(
                 interval['key_as_string'], '%Y-%m-%dT%H:%M:%S')
             for aggregation in interval['terms'].buckets:
-                aggregation_data['timestamp'] = interval_date.isoformat()
-                aggregation_data[self.aggregation_field] = aggregation['key']
-                aggregation_data['count'] = aggregation['doc_count']
-
-                if self.metric_aggregation_fields:
-                    for f in self.metric_aggregation_fields:
-                        aggregation_data[f] = aggregation[f]['value']
-
-                doc = aggregation.top_hit.hits.hits[0]['_source']
-                for destination, source in self.copy_fields.items():
-                    if isinstance(source, six.string_types):
-                        if source == 'root_file_id' and source not in doc:
-                            if 'file_id' in doc:
-                                aggregation_data[destination] = doc['file_id']
-                        else:
-                            aggregation_data[destination] = doc.get(source, '')
-                    else:
-                        aggregation_data[destination] = source(
-                            doc,
-                            aggregation_data
-                        )
-
-                index_name = '{0}-stats-{1}'.\
-                             format(self.search_index_prefix, self.event)
-                logger.debug("index_name: {}".format(index_name))
-
-                if manual:
-                    res = Search(using=self.client,
-                                 index=index_name).\
-                        filter('term', unique_id=aggregation['key']).\
-                        execute()
-                    
-                    if res.hits.total > 0:
-                        index_name = res.hits.hits[0]['_index']
-
-                rtn_data = dict(
-                    _id='{0}'.format(aggregation['key']),
-                    _index=index_name,
-                    _type=self.aggregation_doc_type,
-                    _source=aggregation_data
+                yield interval_date, aggregation
+
+    def _composite_buckets(self, lower_limit, upper_limit, page_size):
+        """Page through the buckets of the range with a composite aggregation.
+
+        Only ``page_size`` buckets are held in memory at a time, the next
+        page is requested with the ``after_key`` of the previous one.
+
+        :returns: iterator of (interval date, bucket) tuples. The bucket
+            ``key`` is the value of the aggregation field.
+        """
+        logger = get_task_logger(__name__)
+        after_key = None
+        while True:
+            self.agg_query = self._build_agg_query(lower_limit, upper_limit)
+            composite_args = dict(
+                size=page_size,
+                sources=[
+                    {'timestamp': A('date_histogram', field='timestamp',
+                                    interval=self.aggregation_interval)},
+                    {self.aggregation_field: A(
+                        'terms', field=self.aggregation_field)}
+                ]
+            )
+            if after_key:
+                composite_args['after'] = after_key
+            composite = self.agg_query.aggs.bucket(
+                'composite', 'composite', **composite_args)
+            self._apply_bucket_metrics(composite)
+            logger.debug("agg_query query: {}".format(self.agg_query))
+            page = self.agg_query.execute().aggregations['composite'].\
+                to_dict()
+            buckets = page.get('buckets', [])
+            logger.debug("agg_query result: {}".format(len(buckets)))
+            if not buckets:
+                break
+            for bucket in buckets:
+                key = bucket['key']
+                interval_date = datetime.datetime.utcfromtimestamp(
+                    key['timestamp'] / 1000)
+                bucket['key'] = key[self.aggregation_field]
+                yield interval_date, bucket
+            # ES < 6.3 does not return after_key, use the last bucket key.
+            after_key = page.get('after_key') or key
+            if len(buckets) < page_size:
+                break
+
+    def _agg_iter(self, lower_limit=None, upper_limit=None, manual=False):
+        """Iterate over the aggregation documents of the given range."""
+        lower_limit = (
+            lower_limit
+            or self.bookmark_api.get_bookmark()
+            or self._get_oldest_event_timestamp()
+        )
+        upper_limit = upper_limit or (
+            datetime.datetime.utcnow().replace(microsecond=0).isoformat())
+
+        page_size = current_app.config.get(
+            'STATS_AGGREGATION_COMPOSITE_SIZE', 0)
+        if page_size > 0:
+            buckets = self._composite_buckets(
+                lower_limit, upper_limit, page_size)
+        else:
+            buckets = self._histogram_buckets(lower_limit, upper_limit)
+        actions = (self._build_action(interval_date, aggregation)
+                   for interval_date, aggregation in buckets)
+        if manual:
+            actions = self._resolve_indices(actions)
+        for rtn_data in actions:
+            self.indices.add(rtn_data['_index'])
+            yield rtn_data
+
+    def _build_action(self, interval_date, aggregation):
+        """Build the bulk action of an aggregation bucket."""
+        logger = get_task_logger(__name__)
+        # A new dict per bucket: the actions may be buffered before
+        # being serialized (DB backup).
+        aggregation_data = {}
+        aggregation_data['timestamp'] = interval_date.isoformat()
+        aggregation_data[self.aggregation_field] = aggregation['key']
+        aggregation_data['count'] = aggregation['doc_count']
+
+        if self.metric_aggregation_fields:
+            for f in self.metric_aggregation_fields:
+                aggregation_data[f] = aggregation[f]['value']
+
+        doc = aggregation['top_hit']['hits']['hits'][0]['_source']
+        for destination, source in self.copy_fields.items():
+            if isinstance(source, six.string_types):
+                if source == 'root_file_id' and source not in doc:
+                    if 'file_id' in doc:
+                        aggregation_data[destination] = doc['file_id']
+                else:
+                    aggregation_data[destination] = doc.get(source, '')
+            else:
+                aggregation_data[destination] = source(
+                    doc,
+                    aggregation_data
                 )
-                self.indices.add(index_name)
-                if current_app.config['STATS_WEKO_DB_BACKUP_AGGREGATION']:
-                    # Save stats aggregation into Database.
-                    StatsAggregation.save(rtn_data, delete=True)
 
-                yield rtn_data
+        index_name = '{0}-stats-{1}'.\
+                     format(self.search_index_prefix, self.event)
+        logger.debug("index_name: {}".format(index_name))
+
+        return dict(
+            _id='{0}'.format(aggregation['key']),
+            _index=index_name,
+            _type=self.aggregation_doc_type,
+            _source=aggregation_data
+        )
+
+    def _resolve_indices(self, actions):
+        """Point the actions to the index of the existing aggregations.
+
+        The destination indices are resolved per chunk of
+        ``STATS_AGGREGATION_RESOLVE_CHUNK_SIZE`` actions with a single
+        terms query, and remembered for the rest of the iteration since
+        the same key appears in every interval of the batch.
+        """
+        chunk_size = current_app.config.get(
+            'STATS_AGGREGATION_RESOLVE_CHUNK_SIZE', 500)
+        index_map = {}
+        chunk = []
+        for action in actions:
+            chunk.append(action)
+            if len(chunk) >= chunk_size:
+                for resolved in self._resolve_chunk_indices(chunk, index_map):
+                    yield resolved
+                chunk = []
+        for resolved in self._resolve_chunk_indices(chunk, index_map):
+            yield resolved
+
+    def _resolve_chunk_indices(self, chunk, index_map):
+        """Resolve the destination index of a chunk of actions.
+
+        :param chunk: list of bulk actions.
+        :param index_map: dict of already resolved unique_id -> index name,
+            ``None`` when no aggregation exists yet. Updated in place.
+        :returns: the actions of the chunk.
+        """
+        keys = {action['_id'] for action in chunk
+                if action['_id'] not in index_map}
+        if keys:
+            index_name = '{0}-stats-{1}'.format(
+                self.search_index_prefix, self.event)
+            query = Search(using=self.client, index=index_name)[0:0].\
+                filter('terms', unique_id=list(keys))
+            query.aggs.bucket(
+                'unique_id', 'terms', field='unique_id', size=len(keys)
+            ).metric('top_hit', 'top_hits', size=1, _source=False)
+            res = query.execute()
+            for bucket in res.aggregations['unique_id'].buckets:
+                index_map['{0}'.format(bucket['key'])] = \
+                    bucket['top_hit']['hits']['hits'][0]['_index']
+            for key in keys:
+                index_map.setdefault(key, None)
+        for action in chunk:
+            action['_index'] = index_map[action['_id']] or action['_index']
+        return chunk
 
     def run(self, start_date=None, end_date=None, update_bookmark=True, manual=False):
         """Calculate statistics aggregations."""
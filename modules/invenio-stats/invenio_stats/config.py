@@ -93,6 +93,30 @@ is the name of the emitted event.
     a request they will increase the response time.
 """
 
+STATS_EVENTS_PARALLEL_WORKERS = 1
+"""Number of workers consuming one event queue in parallel in
+``process_events``. Each worker uses its own AMQP connection, so the broker
+connection pool must allow at least this number of connections."""
+
+STATS_EVENTS_BULK_CHUNK_SIZE = 50
+"""Number of events sent to elasticsearch per bulk request."""
+
+STATS_EVENTS_BULK_MAX_CHUNK_BYTES = 100 * 1024 * 1024
+"""Maximum size in bytes of a bulk request sent to elasticsearch."""
+
+STATS_PREPROCESSOR_CACHE_SIZES = {
+    'geoip': 10000,
+    'robot': 10000,
+    'machine': 10000,
+}
+"""Maximum number of entries of the worker-local LRU caches used by the
+event preprocessors: IP address -> country (``geoip``) and user agent ->
+robot/machine flag (``robot``, ``machine``). ``0`` disables a cache."""
+
+STATS_ANONYMIZATION_SALT_LOCAL_TIMEOUT = 300
+"""Seconds during which a worker reuses the daily anonymization salt it
+read from the cache before reading it again."""
+
 STATS_EXCLUDED_ADDRS = []
 """Fill IP Addresses which will be excluded from stats in `[]`"""
 
@@ -181,6 +205,15 @@ mimicked the same functonality.
 Changed from 2147483647 to 6000. (refs. weko#23741)
 """
 
+STATS_AGGREGATION_COMPOSITE_SIZE = 1000
+"""Number of buckets fetched per composite aggregation page when
+aggregating events. ``0`` fetches all the buckets of a batch in a single
+date_histogram/terms request, bounded by ``STATS_ES_INTEGER_MAX_VALUE``."""
+
+STATS_AGGREGATION_RESOLVE_CHUNK_SIZE = 500
+"""Number of aggregations whose existing index is resolved per request
+during a manual re-aggregation."""
+
 SEARCH_INDEX_PREFIX = os.environ.get('SEARCH_INDEX_PREFIX', '')
 """Search index prefix which is set in weko config."""
 
@@ -213,3 +246,7 @@ STATS_WEKO_DB_BACKUP_AGGREGATION = False
 
 STATS_WEKO_DB_BACKUP_BOOKMARK = False
 """Enable DB backup of bookmark."""
+
+STATS_WEKO_DB_BACKUP_BULK_SIZE = 50
+"""Number of events/aggregations saved per multi-row upsert and commit when
+the DB backup is enabled. Set ``0`` to save and commit them one by one."""
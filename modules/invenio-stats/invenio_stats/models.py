@@ -9,9 +9,10 @@
 """Database models for Invenio-Stats."""
 import hashlib
 import json
+from collections import OrderedDict
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
-from typing import List
+from typing import List, Optional
 from uuid import uuid4
 
 from celery.utils.log import get_task_logger
@@ -127,6 +128,29 @@ class _StataModelBase(Timestamp):
             db.session.rollback()
             return False
 
+    @classmethod
+    def _make_stats_data(cls, data_object: dict) -> Optional[dict]:
+        """Convert a bulk action into a row of stats table.
+
+        :param data_object: stats event object.
+        :return: row data or None if the object has no source.
+        """
+        if not data_object.get("_source"):
+            return None
+        date = None
+        if 'timestamp' in data_object.get("_source"):
+            date = data_object.get("_source").get("timestamp")
+        elif 'date' in data_object.get("_source"):
+            date = data_object.get("_source").get("date")
+        return {
+            'id': _generate_id(),
+            'source_id': data_object.get("_id"),
+            'index': data_object.get("_index"),
+            'type': data_object.get("_type"),
+            'source': json.dumps(data_object.get("_source")),
+            'date': date
+        }
+
     @classmethod
     def save(cls, data_object: dict, delete: bool = False) -> bool:
         """Save stats event.
@@ -136,21 +160,8 @@ class _StataModelBase(Timestamp):
         :return:
         """
         try:
-            if data_object.get("_source"):
-                date = None
-                if 'timestamp' in data_object.get("_source"):
-                    date = data_object.get("_source").get("timestamp")
-                elif 'date' in data_object.get("_source"):
-                    date = data_object.get("_source").get("date")
-                stats_data = {
-                    'id': _generate_id(),
-                    'source_id': data_object.get("_id"),
-                    'index': data_object.get("_index"),
-                    'type': data_object.get("_type"),
-                    'source': json.dumps(data_object.get("_source")),
-                    'date': date
-                }
-            else:
+            stats_data = cls._make_stats_data(data_object)
+            if stats_data is None:
                 return False
             uq_stats_key = cls.get_uq_key()
             stmt = insert(cls)
@@ -166,6 +177,49 @@ class _StataModelBase(Timestamp):
             db.session.rollback()
             return False
 
+    @classmethod
+    def save_bulk(cls, data_objects: List[dict], delete: bool = False) -> int:
+        """Save stats events with one multi-row upsert and one commit.
+
+        Rows sharing the same unique key are collapsed (the last one wins)
+        because PostgreSQL refuses to update the same row twice in a single
+        ``INSERT ... ON CONFLICT`` statement. If the statement fails, the
+        rows are saved one by one so that a single bad row does not discard
+        the whole chunk.
+
+        :param data_objects: list of stats event objects.
+        :param delete:
+        :return: number of saved rows.
+        """
+        rows = OrderedDict()
+        for data_object in data_objects:
+            stats_data = cls._make_stats_data(data_object)
+            if stats_data is None:
+                continue
+            key = (stats_data['source_id'], stats_data['index'],
+                   stats_data['date'])
+            rows.pop(key, None)
+            rows[key] = (data_object, stats_data)
+        if not rows:
+            return 0
+        try:
+            uq_stats_key = cls.get_uq_key()
+            stmt = insert(cls).values(
+                [stats_data for _, stats_data in rows.values()])
+            db.session.execute(
+                stmt.on_conflict_do_update(
+                    set_={'source': stmt.excluded.source},
+                    constraint=uq_stats_key))
+            db.session.commit()
+            return len(rows)
+        except SQLAlchemyError as err:
+            current_app.logger.error(
+                "Bulk save of {} rows into {} failed, retrying one by one: "
+                "{}".format(len(rows), cls.__tablename__, err))
+            db.session.rollback()
+        return sum(1 for data_object, _ in rows.values()
+                   if cls.save(data_object, delete))
+
 
 class StatsEvents(db.Model, _StataModelBase):
     """Database for Stats events."""
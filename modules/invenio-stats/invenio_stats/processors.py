@@ -11,6 +11,8 @@
 from __future__ import absolute_import, print_function
 
 import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
 from itertools import tee
 from time import mktime
 
@@ -25,7 +27,8 @@ from weko_admin.api import is_restricted_user
 from weko_admin.utils import get_redis_cache, reset_redis_cache, is_exists_key_in_redis
 
 from .models import StatsEvents
-from .utils import get_anonymization_salt, get_geoip, obj_or_import_string
+from .utils import get_anonymization_salt, get_geoip, \
+    get_preprocessor_cache, obj_or_import_string
 
 
 def anonymize_user(doc):
@@ -121,7 +124,9 @@ def flag_robots(doc):
     into robots and machines by `the Make Data Count project
     <https://github.com/CDLUC3/Make-Data-Count/tree/master/user-agents>`_.
     """
-    doc['is_robot'] = 'user_agent' in doc and is_robot(doc['user_agent'])
+    doc['is_robot'] = 'user_agent' in doc and \
+        get_preprocessor_cache('robot').get_or_compute(
+            doc['user_agent'], is_robot)
     return doc
 
 
@@ -136,7 +141,9 @@ def flag_machines(doc):
     <https://github.com/CDLUC3/Make-Data-Count/tree/master/user-agents>`_.
 
     """
-    doc['is_machine'] = 'user_agent' in doc and is_machine(doc['user_agent'])
+    doc['is_machine'] = 'user_agent' in doc and \
+        get_preprocessor_cache('machine').get_or_compute(
+            doc['user_agent'], is_machine)
     return doc
 
 
@@ -186,10 +193,39 @@ class EventsIndexer(object):
             obj_or_import_string(preproc) for preproc in preprocessors
         ] if preprocessors is not None else self.default_preprocessors
         self.double_click_window = double_click_window
+        self.worker_stats = []
 
-    def actionsiter(self):
-        """Iterator."""
-        for msg in self.queue.consume():
+    def actionsiter(self, messages=None):
+        """Iterator.
+
+        :param messages: iterable of event messages. Defaults to consuming
+            the whole queue.
+        """
+        db_backup = current_app.config['STATS_WEKO_DB_BACKUP_EVENTS']
+        db_backup_size = current_app.config.get(
+            'STATS_WEKO_DB_BACKUP_BULK_SIZE', 0)
+        db_backup_buffer = []
+        try:
+            for rtn_data in self._actionsiter(messages):
+                if db_backup:
+                    # Save stats event into Database.
+                    if db_backup_size > 0:
+                        db_backup_buffer.append(rtn_data)
+                        if len(db_backup_buffer) >= db_backup_size:
+                            StatsEvents.save_bulk(db_backup_buffer, True)
+                            db_backup_buffer = []
+                    else:
+                        StatsEvents.save(rtn_data, True)
+                yield rtn_data
+        finally:
+            if db_backup_buffer:
+                StatsEvents.save_bulk(db_backup_buffer, True)
+
+    def _actionsiter(self, messages=None):
+        """Iterate over the preprocessed bulk actions of the queue."""
+        if messages is None:
+            messages = self.queue.consume()
+        for msg in messages:
             try:
                 for preproc in self.preprocessors:
                     msg = preproc(msg)
@@ -226,19 +262,90 @@ class EventsIndexer(object):
                     _type=self.doctype,
                     _source=msg,
                 )
-                if current_app.config['STATS_WEKO_DB_BACKUP_EVENTS']:
-                    # Save stats event into Database.
-                    StatsEvents.save(rtn_data, True)
 
                 yield rtn_data
             except Exception:
                 current_app.logger.exception(u'Error while processing event')
 
-    def run(self):
-        """Process events queue."""
+    def run(self, workers=None):
+        """Process events queue.
+
+        :param workers: number of workers consuming the queue in parallel.
+            Defaults to ``STATS_EVENTS_PARALLEL_WORKERS``.
+        :returns: tuple of (number of indexed events, number of errors).
+        """
+        workers = workers or current_app.config.get(
+            'STATS_EVENTS_PARALLEL_WORKERS', 1)
+        if workers > 1:
+            return self.run_parallel(workers)
         return elasticsearch.helpers.bulk(
             self.client,
             self.actionsiter(),
             stats_only=True,
-            chunk_size=50
+            chunk_size=current_app.config.get(
+                'STATS_EVENTS_BULK_CHUNK_SIZE', 50),
+            max_chunk_bytes=current_app.config.get(
+                'STATS_EVENTS_BULK_MAX_CHUNK_BYTES', 100 * 1024 * 1024)
         )
+
+    def run_parallel(self, workers):
+        """Process events queue with several competing consumers.
+
+        Each worker holds its own AMQP connection and streams its share of
+        the queue to elasticsearch. Since the document ids are computed by
+        :func:`hash_id` from the event content only, duplicated events
+        consumed by different workers still end up in the same document.
+
+        :param workers: number of worker threads.
+        :returns: tuple of (number of indexed events, number of errors).
+        """
+        app = current_app._get_current_object()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(self._run_worker, app, n)
+                       for n in range(workers)]
+            results = [f.result() for f in futures]
+        self.worker_stats = results
+        return (sum(r['success'] for r in results),
+                sum(r['errors'] for r in results))
+
+    def _run_worker(self, app, worker_id):
+        """Consume and index events in a worker thread.
+
+        :param app: flask application.
+        :param worker_id: worker number, used for reporting.
+        :returns: dict with the worker throughput.
+        """
+        success = errors = 0
+        start = time.time()
+        with app.app_context():
+            with self.queue.connection_pool.acquire(block=True) as conn:
+                consumer = self.queue.consumer(conn)
+                messages = (msg.payload for msg in consumer.iterqueue())
+                for ok, _ in elasticsearch.helpers.streaming_bulk(
+                    self.client,
+                    self.actionsiter(messages),
+                    chunk_size=app.config.get(
+                        'STATS_EVENTS_BULK_CHUNK_SIZE', 50),
+                    max_chunk_bytes=app.config.get(
+                        'STATS_EVENTS_BULK_MAX_CHUNK_BYTES',
+                        100 * 1024 * 1024),
+                    raise_on_error=False,
+                    raise_on_exception=False
+                ):
+                    if ok:
+                        success += 1
+                    else:
+                        errors += 1
+            elapsed = time.time() - start
+            stats = dict(
+                worker=worker_id,
+                success=success,
+                errors=errors,
+                elapsed=elapsed,
+                rate=(success + errors) / elapsed if elapsed else 0.0
+            )
+            app.logger.info(
+                'Stats events worker {worker} of {queue}: {success} indexed, '
+                '{errors} errors in {elapsed:.2f}s ({rate:.1f} events/s)'
+                .format(queue=self.queue.routing_key, **stats))
+        return stats
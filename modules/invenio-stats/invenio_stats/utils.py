@@ -14,7 +14,10 @@ import calendar
 import operator
 import os
 import re
+import threading
+import time
 from base64 import b64encode
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from math import ceil
 from typing import Generator, NoReturn, Union
@@ -28,7 +31,7 @@ from elasticsearch import exceptions as es_exceptions
 from elasticsearch_dsl.aggs import A
 from elasticsearch.helpers import bulk
 from elasticsearch_dsl import Search
-from flask import current_app, request, session
+from flask import current_app, has_app_context, request, session
 from flask_login import current_user
 from geolite2 import geolite2
 from invenio_cache import current_cache
@@ -42,21 +45,147 @@ from .permissions import stats_api_permission
 from .proxies import current_stats
 
 
+_anonymization_salts = {}
+_anonymization_salts_lock = threading.Lock()
+
+
 def get_anonymization_salt(ts):
-    """Get the anonymization salt based on the event timestamp's day."""
-    salt_key = 'stats:salt:{}'.format(ts.date().isoformat())
+    """Get the anonymization salt based on the event timestamp's day.
+
+    The salt is shared by all the workers through ``current_cache``: the
+    first worker storing a salt for a day wins and the others read it back.
+    Each worker then keeps the salt of a day in memory for
+    ``STATS_ANONYMIZATION_SALT_LOCAL_TIMEOUT`` seconds, so the cache is not
+    queried for every event.
+    """
+    day = ts.date().isoformat()
+    now = time.time()
+    local = _anonymization_salts.get(day)
+    if local and local[1] > now:
+        return local[0]
+
+    salt_key = 'stats:salt:{}'.format(day)
     salt = current_cache.get(salt_key)
     if not salt:
         salt_bytes = os.urandom(32)
-        salt = b64encode(salt_bytes).decode('utf-8')
-        current_cache.set(salt_key, salt, timeout=60 * 60 * 24)
+        new_salt = b64encode(salt_bytes).decode('utf-8')
+        # Only set the salt if no other worker did it in the meantime.
+        current_cache.add(salt_key, new_salt, timeout=60 * 60 * 24)
+        salt = current_cache.get(salt_key) or new_salt
+
+    timeout = current_app.config.get(
+        'STATS_ANONYMIZATION_SALT_LOCAL_TIMEOUT',
+        config.STATS_ANONYMIZATION_SALT_LOCAL_TIMEOUT)
+    with _anonymization_salts_lock:
+        for expired in [d for d, (_, expires) in _anonymization_salts.items()
+                        if expires <= now]:
+            del _anonymization_salts[expired]
+        _anonymization_salts[day] = (salt, now + timeout)
     return salt
 
 
+class LRUCache(object):
+    """Bounded, thread-safe in-process LRU cache with hit/miss counters."""
+
+    _missing = object()
+
+    def __init__(self, maxsize):
+        """Initialize the cache.
+
+        :param maxsize: maximum number of entries. ``0`` disables caching.
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, func):
+        """Return the cached value of ``key`` or compute it with ``func``.
+
+        :param key: hashable cache key.
+        :param func: callable computing the value from ``key``.
+        """
+        with self._lock:
+            value = self._data.get(key, self._missing)
+            if value is not self._missing:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+        value = func(key)
+        if self.maxsize > 0:
+            with self._lock:
+                self._data[key] = value
+                self._data.move_to_end(key)
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+        return value
+
+    def clear(self):
+        """Remove all the entries and reset the counters."""
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def info(self):
+        """Get the cache statistics."""
+        return dict(hits=self.hits, misses=self.misses,
+                    size=len(self._data), maxsize=self.maxsize)
+
+
+_preprocessor_caches = {}
+_preprocessor_caches_lock = threading.Lock()
+
+
+def get_preprocessor_cache(name):
+    """Get the worker-local cache of an event preprocessor.
+
+    The size of the cache is read from the ``STATS_PREPROCESSOR_CACHE_SIZES``
+    config variable when the cache is first used.
+
+    :param name: cache name, e.g. ``geoip`` or ``robot``.
+    """
+    cache = _preprocessor_caches.get(name)
+    if cache is None:
+        sizes = current_app.config.get(
+            'STATS_PREPROCESSOR_CACHE_SIZES',
+            config.STATS_PREPROCESSOR_CACHE_SIZES
+        ) if has_app_context() else config.STATS_PREPROCESSOR_CACHE_SIZES
+        with _preprocessor_caches_lock:
+            cache = _preprocessor_caches.setdefault(
+                name, LRUCache(sizes.get(name, 0)))
+    return cache
+
+
+def get_preprocessor_cache_info():
+    """Get the hit/miss counters of the preprocessor caches."""
+    return {name: cache.info()
+            for name, cache in _preprocessor_caches.items()}
+
+
+_geoip_reader = None
+_geoip_reader_pid = None
+
+
+def get_geoip_reader():
+    """Get the GeoLite2 reader, opened once per worker process."""
+    global _geoip_reader, _geoip_reader_pid
+    if _geoip_reader is None or _geoip_reader_pid != os.getpid():
+        _geoip_reader = geolite2.reader()
+        _geoip_reader_pid = os.getpid()
+    return _geoip_reader
+
+
+def _lookup_geoip(ip):
+    """Lookup country for IP address in the GeoLite2 database."""
+    match = get_geoip_reader().get(ip)
+    return match.get('country', {}).get('iso_code') if match else None
+
+
 def get_geoip(ip):
     """Lookup country for IP address."""
-    match = geolite2.reader().get(ip)
-    return match.get('country', {}).get('iso_code') if match else None
+    return get_preprocessor_cache('geoip').get_or_compute(ip, _lookup_geoip)
 
 
 def get_user():
@@ -15,7 +15,7 @@ import pytest
 from tests.conftest import _create_file_download_event
 from elasticsearch_dsl import Index, Search
 from invenio_search import current_search, current_search_client
-from mock import patch
+from mock import MagicMock, patch
 
 from invenio_stats import current_stats
 from invenio_stats.aggregations import StatAggregator, filter_robots, BookmarkAPI
@@ -73,6 +73,90 @@ def test_StatAggregator(app):
                               aggregation_interval='day')
     stat_agg.run()
 
+# .tox/c1/bin/pytest --cov=invenio_stats tests/test_aggregations.py::test_StatAggregator_composite_paging -v -s -vv --cov-branch --cov-report=term --cov-config=tox.ini --basetemp=/code/modules/invenio-stats/.tox/c1/tmp
+def test_StatAggregator_composite_paging(app):
+    """Test that the buckets are fetched page by page."""
+    def _bucket(ts, file_id):
+        return {
+            'key': {'timestamp': ts, 'file_id': file_id},
+            'doc_count': 2,
+            'top_hit': {'hits': {'hits': [
+                {'_source': {'file_id': file_id, 'bucket_id': 'b1'}}]}}
+        }
+
+    pages = [
+        {'buckets': [_bucket(1483228800000, 'f1'),
+                     _bucket(1483228800000, 'f2')],
+         'after_key': {'timestamp': 1483228800000, 'file_id': 'f2'}},
+        {'buckets': [_bucket(1483315200000, 'f1')]},
+    ]
+
+    def _execute(*args, **kwargs):
+        res = MagicMock()
+        res.aggregations.__getitem__.return_value.to_dict.return_value = \
+            pages.pop(0)
+        return res
+
+    app.config.update(STATS_AGGREGATION_COMPOSITE_SIZE=2,
+                      STATS_WEKO_DB_BACKUP_AGGREGATION=False)
+    stat_agg = StatAggregator(name='file-download-agg',
+                              client=current_search_client,
+                              event='file-download',
+                              aggregation_field='file_id',
+                              copy_fields={'bucket_id': 'bucket_id'},
+                              aggregation_interval='day')
+    with patch('invenio_stats.aggregations.Search.execute',
+               side_effect=_execute) as mock_execute:
+        docs = list(stat_agg.agg_iter(datetime.datetime(2017, 1, 1),
+                                      datetime.datetime(2017, 1, 2)))
+    assert mock_execute.call_count == 2
+    assert stat_agg.agg_query.to_dict()['aggs']['composite']['composite'][
+        'after'] == {'timestamp': 1483228800000, 'file_id': 'f2'}
+    assert [(d['_id'], d['_source']['timestamp']) for d in docs] == [
+        ('f1', '2017-01-01T00:00:00'),
+        ('f2', '2017-01-01T00:00:00'),
+        ('f1', '2017-01-02T00:00:00'),
+    ]
+    assert docs[0]['_source']['count'] == 2
+    assert docs[0]['_source']['bucket_id'] == 'b1'
+
+
+# .tox/c1/bin/pytest --cov=invenio_stats tests/test_aggregations.py::test_StatAggregator_resolve_indices -v -s -vv --cov-branch --cov-report=term --cov-config=tox.ini --basetemp=/code/modules/invenio-stats/.tox/c1/tmp
+def test_StatAggregator_resolve_indices(app):
+    """Test that manual aggregation resolves indices per chunk."""
+    def _action(key):
+        return dict(_id=key, _index='test-stats-file-download',
+                    _type='file-download-day-aggregation',
+                    _source={'file_id': key})
+
+    def _execute(*args, **kwargs):
+        res = MagicMock()
+        res.aggregations.__getitem__.return_value.buckets = [
+            {'key': 'f1', 'top_hit': {'hits': {'hits': [
+                {'_index': 'test-stats-file-download-0001'}]}}}
+        ]
+        return res
+
+    app.config.update(STATS_AGGREGATION_RESOLVE_CHUNK_SIZE=2)
+    stat_agg = StatAggregator(name='file-download-agg',
+                              client=current_search_client,
+                              event='file-download',
+                              aggregation_field='file_id',
+                              aggregation_interval='day')
+    actions = [_action('f1'), _action('f2'), _action('f1'), _action('f3')]
+    with patch('invenio_stats.aggregations.Search.execute',
+               side_effect=_execute) as mock_execute:
+        docs = list(stat_agg._resolve_indices(iter(actions)))
+    # f1 and f2 are resolved by the first request, only f3 by the second
+    assert mock_execute.call_count == 2
+    assert [d['_index'] for d in docs] == [
+        'test-stats-file-download-0001',
+        'test-stats-file-download',
+        'test-stats-file-download-0001',
+        'test-stats-file-download',
+    ]
+
+
 # def test_overwriting_aggregations(app, mock_event_queue, es_with_templates):
 #     """Check that the StatAggregator correctly starts from bookmark.
 
@@ -42,6 +42,47 @@ def test_StatsEvents(app, db, stats_events_for_db):
         assert StatsEvents.save(_save_data1) == False
 
 
+# def save_bulk(cls, data_objects: List[dict], delete: bool = False) -> int:
+# .tox/c1/bin/pytest --cov=invenio_stats tests/test_models.py::test_StatsEvents_save_bulk -v -s -vv --cov-branch --cov-report=term --cov-config=tox.ini --basetemp=/code/modules/invenio-stats/.tox/c1/tmp
+def test_StatsEvents_save_bulk(app, db):
+    _save_data = [
+        {
+            "_id": "1",
+            "_index": "test-events-stats-record-view",
+            "_type": "record-view",
+            "_source": {"timestamp": "2023-01-01T01:01:00", "count": 1}
+        },
+        {
+            "_id": "1",
+            "_index": "test-events-stats-record-view",
+            "_type": "record-view",
+            "_source": {"timestamp": "2023-01-01T01:01:00", "count": 2}
+        },
+        {
+            "_id": "2",
+            "_index": "test-events-stats-record-view",
+            "_type": "record-view",
+            "_source": {"timestamp": "2023-01-01T01:01:00", "count": 3}
+        },
+        {"_source": None}
+    ]
+    assert StatsEvents.save_bulk([]) == 0
+    assert StatsEvents.save_bulk([{"_source": None}]) == 0
+    with patch('invenio_db.db.session.execute', return_value=True) as mock_exec, \
+            patch('invenio_db.db.session.commit') as mock_commit:
+        # duplicated keys are collapsed into one row
+        assert StatsEvents.save_bulk(_save_data) == 2
+        assert mock_exec.call_count == 1
+        assert mock_commit.call_count == 1
+    with patch('invenio_db.db.session.execute', side_effect=SQLAlchemyError("test_sql_error")):
+        assert StatsEvents.save_bulk(_save_data) == 0
+    with patch('invenio_db.db.session.execute', side_effect=SQLAlchemyError("test_sql_error")), \
+            patch('invenio_stats.models.StatsEvents.save', side_effect=[True, False]) as mock_save:
+        # fallback to one by one saving
+        assert StatsEvents.save_bulk(_save_data) == 1
+        assert mock_save.call_count == 2
+
+
 # class StatsAggregation(db.Model, _StataModelBase):
 # .tox/c1/bin/pytest --cov=invenio_stats tests/test_models.py::test_StatsAggregation -v -s -vv --cov-branch --cov-report=term --cov-config=tox.ini --basetemp=/code/modules/invenio-stats/.tox/c1/tmp
 def test_StatsAggregation(app, db):
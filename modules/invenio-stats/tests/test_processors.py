@@ -16,7 +16,7 @@ from tests.conftest import _create_file_download_event
 from elasticsearch_dsl import Search
 from tests.helpers import get_queue_size
 from invenio_queues.proxies import current_queues
-from mock import patch
+from mock import MagicMock, Mock, patch
 
 from invenio_stats.contrib.event_builders import build_file_unique_id, \
     file_download_event_builder
@@ -245,6 +245,66 @@ def test_events_indexer_id_windowing(app, mock_event_queue):
     assert len(ids) == 3
 
 
+def test_events_indexer_db_backup(app, mock_event_queue):
+    """Check that EventsIndexer backs up events in chunks."""
+    indexer = EventsIndexer(mock_event_queue, preprocessors=[])
+    mock_event_queue.consume.return_value = [
+        _create_file_download_event(date) for date in
+        [(2017, 6, 1, 0, 0, s) for s in range(0, 50, 10)]
+    ]
+    received_docs = []
+
+    def bulk(client, generator, *args, **kwargs):
+        received_docs.extend(generator)
+
+    app.config.update(STATS_WEKO_DB_BACKUP_EVENTS=True,
+                      STATS_WEKO_DB_BACKUP_BULK_SIZE=2)
+    with patch('elasticsearch.helpers.bulk', side_effect=bulk), \
+            patch('invenio_stats.processors.StatsEvents.save_bulk') as mock_bulk, \
+            patch('invenio_stats.processors.StatsEvents.save') as mock_save:
+        indexer.run()
+    assert len(received_docs) == 5
+    assert [len(c[0][0]) for c in mock_bulk.call_args_list] == [2, 2, 1]
+    mock_save.assert_not_called()
+
+    received_docs = []
+    app.config.update(STATS_WEKO_DB_BACKUP_BULK_SIZE=0)
+    with patch('elasticsearch.helpers.bulk', side_effect=bulk), \
+            patch('invenio_stats.processors.StatsEvents.save_bulk') as mock_bulk, \
+            patch('invenio_stats.processors.StatsEvents.save') as mock_save:
+        indexer.run()
+    assert len(received_docs) == 5
+    assert mock_save.call_count == 5
+    mock_bulk.assert_not_called()
+
+
+def test_events_indexer_run_parallel(app, mock_event_queue):
+    """Check that EventsIndexer shards the queue over several workers."""
+    events = [_create_file_download_event(date) for date in
+              [(2017, 6, 1, 0, 0, s) for s in range(0, 60, 10)]]
+    mock_event_queue.connection_pool = MagicMock()
+    mock_event_queue.consumer.return_value.iterqueue.side_effect = [
+        iter([Mock(payload=e) for e in events[:4]]),
+        iter([Mock(payload=e) for e in events[4:]]),
+    ]
+    indexer = EventsIndexer(mock_event_queue, preprocessors=[])
+    received_docs = []
+
+    def streaming_bulk(client, generator, *args, **kwargs):
+        for doc in generator:
+            received_docs.append(doc)
+            yield True, {}
+
+    app.config.update(STATS_WEKO_DB_BACKUP_EVENTS=False)
+    with patch('elasticsearch.helpers.streaming_bulk',
+               side_effect=streaming_bulk):
+        assert indexer.run(workers=2) == (6, 0)
+    assert len(received_docs) == 6
+    assert len(set(doc['_id'] for doc in received_docs)) == 6
+    assert sorted(s['worker'] for s in indexer.worker_stats) == [0, 1]
+    assert sum(s['success'] for s in indexer.worker_stats) == 6
+
+
 def test_double_clicks(app, mock_event_queue, es):
     """Test that events occurring within a time window are counted as 1."""
     event_type = 'file-download'
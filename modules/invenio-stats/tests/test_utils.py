@@ -21,6 +21,10 @@ from invenio_stats.errors import UnknownQueryError
 from invenio_stats.utils import (
     get_anonymization_salt,
     get_geoip,
+    get_geoip_reader,
+    get_preprocessor_cache,
+    get_preprocessor_cache_info,
+    LRUCache,
     get_user,
     obj_or_import_string,
     load_or_import_from_config,
@@ -47,12 +51,88 @@ from invenio_stats.utils import (
 def test_get_anonymization_salt(app):
     assert get_anonymization_salt(datetime.datetime(2022, 1, 1))
 
+# .tox/c1/bin/pytest --cov=invenio_stats tests/test_utils.py::test_get_anonymization_salt_local_cache -v -s -vv --cov-branch --cov-report=term --cov-config=tox.ini --basetemp=/code/modules/invenio-stats/.tox/c1/tmp
+def test_get_anonymization_salt_local_cache(app):
+    store = {'stats:salt:2022-01-02': 'salt-of-other-worker'}
+
+    class MockCache:
+        def __init__(self):
+            self.gets = 0
+
+        def get(self, key):
+            self.gets += 1
+            return store.get(key)
+
+        def add(self, key, value, timeout=None):
+            store.setdefault(key, value)
+
+    mock_cache = MockCache()
+    with patch('invenio_stats.utils.current_cache', mock_cache), \
+            patch('invenio_stats.utils._anonymization_salts', {}):
+        # the salt already stored by another worker wins
+        assert get_anonymization_salt(
+            datetime.datetime(2022, 1, 2, 1)) == 'salt-of-other-worker'
+        assert get_anonymization_salt(
+            datetime.datetime(2022, 1, 2, 23)) == 'salt-of-other-worker'
+        assert mock_cache.gets == 1
+        # day boundary
+        salt = get_anonymization_salt(datetime.datetime(2022, 1, 3))
+        assert salt == store['stats:salt:2022-01-03']
+        assert salt != 'salt-of-other-worker'
+        assert mock_cache.gets == 3
+        # expired local entry
+        app.config['STATS_ANONYMIZATION_SALT_LOCAL_TIMEOUT'] = 0
+        get_anonymization_salt(datetime.datetime(2022, 1, 4))
+        get_anonymization_salt(datetime.datetime(2022, 1, 4))
+        assert mock_cache.gets == 6
+
 # def get_geoip(ip):
 # .tox/c1/bin/pytest --cov=invenio_stats tests/test_utils.py::test_get_geoip -v -s -vv --cov-branch --cov-report=term --cov-config=tox.ini --basetemp=/code/modules/invenio-stats/.tox/c1/tmp
 def test_get_geoip():
     """Test looking up IP address."""
     assert get_geoip("74.125.67.100") == 'US'
 
+# class LRUCache(object):
+# .tox/c1/bin/pytest --cov=invenio_stats tests/test_utils.py::test_LRUCache -v -s -vv --cov-branch --cov-report=term --cov-config=tox.ini --basetemp=/code/modules/invenio-stats/.tox/c1/tmp
+def test_LRUCache():
+    calls = []
+
+    def _compute(key):
+        calls.append(key)
+        return None if key == 'none' else key.upper()
+
+    cache = LRUCache(2)
+    assert cache.get_or_compute('a', _compute) == 'A'
+    assert cache.get_or_compute('a', _compute) == 'A'
+    assert cache.get_or_compute('none', _compute) is None
+    assert cache.get_or_compute('none', _compute) is None
+    assert calls == ['a', 'none']
+    # 'a' is the least recently used entry
+    cache.get_or_compute('b', _compute)
+    cache.get_or_compute('a', _compute)
+    assert calls == ['a', 'none', 'b', 'a']
+    assert cache.info() == dict(hits=2, misses=4, size=2, maxsize=2)
+    cache.clear()
+    assert cache.info() == dict(hits=0, misses=0, size=0, maxsize=2)
+
+    disabled = LRUCache(0)
+    disabled.get_or_compute('a', _compute)
+    assert disabled.info()['size'] == 0
+
+# def get_geoip_reader():
+# .tox/c1/bin/pytest --cov=invenio_stats tests/test_utils.py::test_get_geoip_cache -v -s -vv --cov-branch --cov-report=term --cov-config=tox.ini --basetemp=/code/modules/invenio-stats/.tox/c1/tmp
+def test_get_geoip_cache():
+    assert get_geoip_reader() is get_geoip_reader()
+    cache = get_preprocessor_cache('geoip')
+    cache.clear()
+    with patch('invenio_stats.utils._lookup_geoip', return_value='JP') as mock_lookup:
+        assert get_geoip("133.1.1.1") == 'JP'
+        assert get_geoip("133.1.1.1") == 'JP'
+        assert mock_lookup.call_count == 1
+    assert get_preprocessor_cache_info()['geoip']['hits'] == 1
+    assert get_preprocessor_cache_info()['geoip']['misses'] == 1
+    cache.clear()
+
 # def get_user():
 # .tox/c1/bin/pytest --cov=invenio_stats tests/test_utils.py::test_get_user -v -s -vv --cov-branch --cov-report=term --cov-config=tox.ini --basetemp=/code/modules/invenio-stats/.tox/c1/tmp
 def test_get_user(app, mock_users, request_headers):
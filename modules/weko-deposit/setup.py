@@ -82,6 +82,9 @@ setup(
     include_package_data=True,
     platforms='any',
     entry_points={
+        'flask.commands': [
+            'weko_deposit = weko_deposit.cli:weko_deposit',
+        ],
         'invenio_base.apps': [
             'weko_deposit = weko_deposit:WekoDeposit',
         ],
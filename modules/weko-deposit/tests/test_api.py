@@ -178,6 +178,26 @@ class TestWekoIndexer:
         ret = indexer.get_metadata_by_item_id(item_id)
         assert ret['_source']['title'] == title
 
+    # .tox/c1/bin/pytest --cov=weko_deposit tests/test_api.py::TestWekoIndexer::test_upload_metadata_bulk_session -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/weko-deposit/.tox/c1/tmp
+    def test_upload_metadata_bulk_session(self,app,es_records):
+        indexer, records = es_records
+        record_data = records[0]['record_data']
+        item_id = records[0]['recid'].id
+        # outside a session, the write is sent at once
+        assert indexer._buffer(_op_type='index', _id=str(item_id)) is False
+        title = 'SINGLE{}'.format(uuid.uuid4())
+        indexer.upload_metadata(dict(record_data, title=title), item_id, 5)
+        assert indexer.get_metadata_by_item_id(item_id)['_source']['title'] == title
+
+        # inside a session, the write is buffered until the session exits
+        title = 'BULK{}'.format(uuid.uuid4())
+        with indexer.bulk_session() as session:
+            indexer.upload_metadata(dict(record_data, title=title), item_id, 6)
+            assert len(session.actions) == 1
+            assert session.actions[0]['_id'] == str(item_id)
+            assert indexer.get_metadata_by_item_id(item_id)['_source']['title'] != title
+        assert indexer.get_metadata_by_item_id(item_id)['_source']['title'] == title
+
 
     # def delete_file_index(self, body, parent_id):
     # .tox/c1/bin/pytest --cov=weko_deposit tests/test_api.py::TestWekoIndexer::test_delete_file_index -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/weko-deposit/.tox/c1/tmp
@@ -262,7 +282,15 @@ class TestWekoIndexer:
         assert isinstance(next(ret),dict)
         assert ret is not None
         
-    #     def get_metadata_by_item_id(self, item_id):
+    #     def scan_ids_by_index_id(self, path, size=1000):
+    # .tox/c1/bin/pytest --cov=weko_deposit tests/test_api.py::TestWekoIndexer::test_scan_ids_by_index_id -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/weko-deposit/.tox/c1/tmp
+    def test_scan_ids_by_index_id(self,es_records):
+        indexer, records = es_records
+        pages = list(indexer.scan_ids_by_index_id('2', size=2))
+        assert [len(page) for page in pages] == [2, 2, 1]
+        assert sorted(sum(pages, [])) == sorted(str(r['record'].id) for r in records[0::2])
+        assert list(indexer.scan_ids_by_index_id('100')) == []
+
     # .tox/c1/bin/pytest --cov=weko_deposit tests/test_api.py::TestWekoIndexer::test_get_metadata_by_item_id -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/weko-deposit/.tox/c1/tmp
     def test_get_metadata_by_item_id(self,es_records):
         indexer, records = es_records
@@ -317,6 +345,117 @@ class TestWekoIndexer:
         with patch("weko_deposit.api.bulk",return_value=(0,["test_error1","test_error2"])):
             indexer.bulk_update(res)
 
+    #     def bulk_session(self):
+    #     def _buffer(self, ignore=(), **action):
+    # class WekoIndexerBulk(object):
+    # .tox/c1/bin/pytest --cov=weko_deposit tests/test_api.py::TestWekoIndexer::test_bulk_session -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/weko-deposit/.tox/c1/tmp
+    def test_bulk_session(self,es_records):
+        indexer, records = es_records
+        record = records[0]['record']
+        record_data = records[0]['record_data']
+        new_id = uuid.uuid4()
+        with indexer.bulk_session() as session:
+            # nested sessions share the buffer
+            with indexer.bulk_session() as nested:
+                assert nested is session
+            title = 'BULK{}'.format(uuid.uuid4())
+            indexer.upload_metadata(dict(record_data, title=title), record.id, 1)
+            indexer.upload_metadata(dict(record_data, title=title), new_id, 1)
+            assert indexer.update_feedback_mail_list(
+                {'id': record.id, 'mail_list': [{'email': 'wekosoftware@nii.ac.jp', 'author_id': ''}]}) is None
+            assert indexer.update_relation_version_is_last({'id': uuid.uuid4(), 'is_last': True}) is None
+            mark = session.mark()
+            indexer.update_es_data(record, update_revision=False)
+            assert len(session.actions) == 5
+            session.rollback(mark)
+            assert len(session.actions) == 4
+            # nothing is written before the end of the session
+            assert indexer.get_metadata_by_item_id(record.id)['_source']['title'] != title
+        assert session.actions == []
+        ret = indexer.get_metadata_by_item_id(record.id)
+        assert ret['_source']['title'] == title
+        assert ret['_source']['feedback_mail_list'] == [{'email': 'wekosoftware@nii.ac.jp', 'author_id': ''}]
+        assert indexer.get_metadata_by_item_id(new_id)['_version'] == 1
+
+        # errors are reported, except the ignored ones
+        with indexer.bulk_session() as session:
+            indexer.update_relation_version_is_last({'id': uuid.uuid4(), 'is_last': True})
+            indexer.update_feedback_mail_list({'id': uuid.uuid4(), 'mail_list': []})
+            errors = session.flush()
+        assert len(errors) == 1
+        assert errors[0]['update']['status'] == 404
+
+        # the writes are discarded if the session fails
+        with pytest.raises(Exception):
+            with indexer.bulk_session():
+                indexer.upload_metadata(record_data, uuid.uuid4(), 1)
+                raise Exception('test_error')
+        with patch("weko_deposit.api.streaming_bulk") as mock_bulk:
+            with indexer.bulk_session():
+                pass
+            mock_bulk.assert_not_called()
+
+    # .tox/c1/bin/pytest --cov=weko_deposit tests/test_api.py::TestWekoIndexer::test_bulk_session_transactional -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/weko-deposit/.tox/c1/tmp
+    def test_bulk_session_transactional(self,db,es_records):
+        indexer, records = es_records
+        record = records[0]['record']
+        with indexer.bulk_session(transactional=True) as session:
+            indexer.update_author_link({'id': record.id, 'author_link': ['1']})
+            with db.session.begin_nested():
+                assert indexer.update_jpcoar_identifier({'title': ['BULK']}, record.id) is None
+            # the writes of a rolled back savepoint are discarded
+            with pytest.raises(Exception):
+                with db.session.begin_nested():
+                    indexer.update_feedback_mail_list({'id': record.id, 'mail_list': []})
+                    raise Exception('test_error')
+            assert len(session.actions) == 2
+        # the writes wait for the commit
+        assert len(session.actions) == 2
+        assert indexer.get_metadata_by_item_id(record.id)['_source'].get('author_link') != ['1']
+        db.session.commit()
+        assert session.actions == []
+        assert db.session.info['weko_indexer_bulks'] == []
+        ret = indexer.get_metadata_by_item_id(record.id)
+        assert ret['_source']['author_link'] == ['1']
+        assert ret['_source']['_item_metadata']['title'] == ['BULK']
+
+        # the writes are discarded if the transaction rolls back
+        with indexer.bulk_session(transactional=True) as session:
+            indexer.update_author_link({'id': record.id, 'author_link': ['2']})
+        db.session.rollback()
+        assert session.actions == []
+        assert db.session.info['weko_indexer_bulks'] == []
+        assert indexer.get_metadata_by_item_id(record.id)['_source']['author_link'] == ['1']
+
+        # the errors are reported per write
+        missing = uuid.uuid4()
+        with indexer.bulk_session(transactional=True) as session:
+            indexer.update_author_link({'id': record.id, 'author_link': ['3']})
+            indexer.update_author_link({'id': missing, 'author_link': ['3']})
+            db.session.commit()
+        assert len(session.errors) == 1
+        assert session.errors[0]['update']['_id'] == str(missing)
+        assert session.errors[0]['update']['status'] == 404
+        assert indexer.get_metadata_by_item_id(record.id)['_source']['author_link'] == ['3']
+
+    #     def update_file_content(self, item_id, version_id, content):
+    # .tox/c1/bin/pytest --cov=weko_deposit tests/test_api.py::TestWekoIndexer::test_update_file_content -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/weko-deposit/.tox/c1/tmp
+    def test_update_file_content(self,es_records):
+        indexer, records = es_records
+        record = records[0]['record']
+        record_data = records[0]['record_data']
+        content = [{'version_id': 'ver1', 'attachment': {}},
+                   {'version_id': 'ver2'}]
+        indexer.upload_metadata(dict(record_data, content=content), record.id, 1)
+        assert indexer.update_file_content(record.id, 'ver1', 'text1') == True
+        assert indexer.update_file_content(record.id, 'ver2', 'text2') == True
+        ret = indexer.get_metadata_by_item_id(record.id)
+        assert ret['_source']['content'] == [
+            {'version_id': 'ver1', 'attachment': {'content': 'text1'}},
+            {'version_id': 'ver2', 'attachment': {'content': 'text2'}}]
+        assert indexer.update_file_content(record.id, 'ver3', 'text3') == False
+        assert indexer.update_file_content(uuid.uuid4(), 'ver1', 'text1') == False
+
 # class WekoDeposit(Deposit):
 # .tox/c1/bin/pytest --cov=weko_deposit tests/test_api.py::TestWekoDeposit -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/weko-deposit/.tox/c1/tmp
 class TestWekoDeposit:
@@ -812,6 +951,17 @@ class TestWekoDeposit:
         deposit = record['deposit']
         deposit.delete_by_index_tree_id('1',[])
 
+        # every page of the index is processed
+        app.config['WEKO_DEPOSIT_INDEX_DETACH_BATCH_SIZE'] = 1
+        progress = []
+        with patch("weko_records_ui.utils.soft_delete") as mock_delete:
+            ret = WekoDeposit.delete_by_index_tree_id(
+                2, ['3'], progress=lambda done, total: progress.append((done, total)))
+        assert sorted(ret) == ['1', '5', '7', '9']
+        assert mock_delete.call_count == 4
+        assert progress == [(1, 5), (2, 5), (3, 5), (4, 5), (5, 5)]
+        assert records[2]['record'].model.json['path'] == ['2']
+
 
     # def update_pid_by_index_tree_id(self, path):
     # .tox/c1/bin/pytest --cov=weko_deposit tests/test_api.py::TestWekoDeposit::test_update_pid_by_index_tree_id -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/weko-deposit/.tox/c1/tmp
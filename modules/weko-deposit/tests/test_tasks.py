@@ -28,7 +28,8 @@ from mock import patch, MagicMock
 from invenio_pidstore.errors import PIDDoesNotExistError
 from weko_authors.models import AuthorsAffiliationSettings,AuthorsPrefixSettings
 
-from weko_deposit.tasks import update_items_by_authorInfo
+from weko_deposit.tasks import update_items_by_authorInfo, \
+    extract_file_content_task, update_file_content_task
 [
     {
         "recid": "1",
@@ -223,3 +224,59 @@ def test_update_authorInfo(app, db, records,mocker):
         with patch("weko_deposit.tasks.RecordIndexer", MockRecordIndexer):
             update_items_by_authorInfo(["1","xxx"], _target)
 
+
+# def extract_file_content_task(file_id, key, mimetype, queued_at):
+# .tox/c1/bin/pytest --cov=weko_deposit tests/test_tasks.py::test_extract_file_content_task -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/weko-deposit/.tox/c1/tmp
+def test_extract_file_content_task(app, mocker):
+    mocker.patch("weko_deposit.tasks.FileInstance")
+    mocker.patch("weko_deposit.tasks.set_cached_file_content")
+    mock_metrics = mocker.patch("weko_deposit.tasks.add_file_content_metrics")
+    mocker.patch("weko_deposit.tasks.pop_file_content_targets",
+                 return_value=[("rec1", "ver1"), ("rec2", "ver2")])
+    mock_update = mocker.patch("weko_deposit.tasks.update_file_content_task.delay")
+
+    # extracted, then the patch of every record requesting it is queued
+    with patch("weko_deposit.tasks.get_cached_file_content", return_value=None):
+        with patch("weko_deposit.tasks.extract_file_content", return_value="text") as mock_extract:
+            extract_file_content_task("file1", "md5:test", "text/plain", 0)
+            mock_extract.assert_called_once()
+    assert [c[0] for c in mock_update.call_args_list] == [
+        ("rec1", "ver1", "md5:test"), ("rec2", "ver2", "md5:test")]
+    assert mock_metrics.call_args[0][1] is not None
+
+    # already cached
+    mock_update.reset_mock()
+    with patch("weko_deposit.tasks.get_cached_file_content", return_value="text"):
+        with patch("weko_deposit.tasks.extract_file_content") as mock_extract:
+            extract_file_content_task("file1", "md5:test", "text/plain", 0)
+            mock_extract.assert_not_called()
+    assert mock_update.call_count == 2
+    assert mock_metrics.call_args[0][1:] == (None, False)
+
+    # failed
+    mock_update.reset_mock()
+    with patch("weko_deposit.tasks.get_cached_file_content", return_value=None):
+        with patch("weko_deposit.tasks.extract_file_content", side_effect=Exception("test_error")):
+            extract_file_content_task("file1", "md5:test", "text/plain", 0)
+    mock_update.assert_not_called()
+    assert mock_metrics.call_args[0][1:] == (None, True)
+
+
+# def update_file_content_task(record_id, version_id, key, retry=0):
+# .tox/c1/bin/pytest --cov=weko_deposit tests/test_tasks.py::test_update_file_content_task -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/weko-deposit/.tox/c1/tmp
+def test_update_file_content_task(app, mocker):
+    mocker.patch("weko_deposit.tasks.get_cached_file_content", return_value="text")
+    mock_retry = mocker.patch("weko_deposit.tasks.update_file_content_task.apply_async")
+    with patch("weko_deposit.tasks.WekoDeposit.indexer.update_file_content", return_value=True) as mock_es:
+        update_file_content_task("rec1", "ver1", "md5:test")
+        mock_es.assert_called_with("rec1", "ver1", "text")
+    mock_retry.assert_not_called()
+
+    # the record is not indexed yet
+    with patch("weko_deposit.tasks.WekoDeposit.indexer.update_file_content", return_value=False):
+        update_file_content_task("rec1", "ver1", "md5:test")
+        assert mock_retry.call_args[1]["args"] == ("rec1", "ver1", "md5:test", 1)
+        mock_retry.reset_mock()
+        update_file_content_task("rec1", "ver1", "md5:test",
+                                 app.config["WEKO_DEPOSIT_FILE_CONTENT_UPDATE_RETRY"])
+        mock_retry.assert_not_called()
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of WEKO3.
+# Copyright (C) 2017 National Institute of Informatics.
+#
+# WEKO3 is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# WEKO3 is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WEKO3; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+
+"""Module tests."""
+
+
+import pytest
+from mock import patch, MagicMock
+from six import BytesIO
+
+from weko_deposit.utils import add_file_content_metrics, call_after_commit, \
+    extract_file_content, get_cached_file_content, get_file_content_key, get_file_content_metrics, \
+    get_file_content_redis, pop_file_content_targets, request_file_content, \
+    set_cached_file_content
+
+# .tox/c1/bin/pytest --cov=weko_deposit tests/test_utils.py -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/weko-deposit/.tox/c1/tmp
+
+
+@pytest.fixture()
+def content_redis(app):
+    app.config.update(CACHE_TYPE="redis")
+    redis = get_file_content_redis()
+    prefix = app.config["WEKO_DEPOSIT_FILE_CONTENT_CACHE_PREFIX"]
+    for key in redis.keys(prefix + "*"):
+        redis.delete(key)
+    return redis
+
+
+def mock_file_instance(data, checksum="md5:test"):
+    file_instance = MagicMock(id="file1", checksum=checksum)
+    file_instance.storage.return_value.open.side_effect = lambda mode: BytesIO(data)
+    return file_instance
+
+
+# def get_file_content_key(file_instance):
+# .tox/c1/bin/pytest --cov=weko_deposit tests/test_utils.py::test_get_file_content_key -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/weko-deposit/.tox/c1/tmp
+def test_get_file_content_key():
+    assert get_file_content_key(MagicMock(id=1, checksum="md5:test")) == "md5:test"
+    assert get_file_content_key(MagicMock(id=1, checksum=None)) == "id:1"
+
+
+# def get_cached_file_content(key):
+# def set_cached_file_content(key, content):
+# .tox/c1/bin/pytest --cov=weko_deposit tests/test_utils.py::test_cached_file_content -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/weko-deposit/.tox/c1/tmp
+def test_cached_file_content(app, content_redis):
+    assert get_cached_file_content("md5:test") is None
+    set_cached_file_content("md5:test", "テスト content")
+    assert get_cached_file_content("md5:test") == "テスト content"
+    set_cached_file_content("md5:empty", "")
+    assert get_cached_file_content("md5:empty") == ""
+
+    # the cache is optional
+    with patch("weko_deposit.utils.get_file_content_redis", side_effect=Exception("test_error")):
+        assert get_cached_file_content("md5:test") is None
+        set_cached_file_content("md5:test", "content")
+
+
+# def extract_file_content(file_instance, mimetype):
+# .tox/c1/bin/pytest --cov=weko_deposit tests/test_utils.py::test_extract_file_content -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/weko-deposit/.tox/c1/tmp
+def test_extract_file_content(app):
+    file_instance = mock_file_instance("テスト".encode("utf-8"))
+    assert extract_file_content(file_instance, "text/plain") == "テスト"
+
+    app.config.update(WEKO_DEPOSIT_FILESIZE_LIMIT=4)
+    with patch("weko_deposit.utils.parser.from_buffer",
+               return_value={"content": "line1\nline2"}) as mock_parser:
+        file_instance = mock_file_instance(b"%PDF-1.4")
+        assert extract_file_content(file_instance, "application/pdf") == "line1line2"
+        mock_parser.assert_called_with(b"%PDF")
+    with patch("weko_deposit.utils.parser.from_buffer", return_value=None):
+        assert extract_file_content(file_instance, "application/pdf") == ""
+
+
+# def call_after_commit(func, *args, on_rollback=None):
+# .tox/c1/bin/pytest --cov=weko_deposit tests/test_utils.py::test_call_after_commit -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/weko-deposit/.tox/c1/tmp
+def test_call_after_commit(app, db):
+    func = MagicMock()
+    on_rollback = MagicMock()
+
+    # called once the transaction is committed
+    call_after_commit(func, 1, 2, on_rollback=on_rollback)
+    with db.session.begin_nested():
+        pass
+    func.assert_not_called()
+    db.session.commit()
+    func.assert_called_once_with(1, 2)
+    on_rollback.assert_not_called()
+
+    # replaced by on_rollback if the transaction is rolled back
+    func.reset_mock()
+    call_after_commit(func, 1, 2, on_rollback=on_rollback)
+    call_after_commit(func, 3)
+    db.session.rollback()
+    func.assert_not_called()
+    on_rollback.assert_called_once_with()
+    db.session.commit()
+    func.assert_not_called()
+
+    # the errors are logged
+    func.side_effect = Exception("test_error")
+    other = MagicMock()
+    call_after_commit(func)
+    call_after_commit(other)
+    db.session.commit()
+    other.assert_called_once_with()
+
+
+# def request_file_content(key, file_instance, mimetype, record_id,
+# def pop_file_content_targets(key):
+# .tox/c1/bin/pytest --cov=weko_deposit tests/test_utils.py::test_request_file_content -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/weko-deposit/.tox/c1/tmp
+def test_request_file_content(app, db, content_redis):
+    file_instance = mock_file_instance(b"test")
+    with patch("weko_deposit.tasks.extract_file_content_task.delay") as mock_delay:
+        assert request_file_content("md5:test", file_instance, "text/plain", "rec1", "ver1")
+        assert request_file_content("md5:test", file_instance, "text/plain", "rec2", "ver2")
+        # queued once committed
+        mock_delay.assert_not_called()
+        db.session.commit()
+        # queued once while pending
+        assert mock_delay.call_count == 1
+        assert mock_delay.call_args[0][:3] == ("file1", "md5:test", "text/plain")
+        assert get_file_content_metrics()["queue_depth"] == 1
+
+        assert sorted(pop_file_content_targets("md5:test")) == [("rec1", "ver1"), ("rec2", "ver2")]
+        assert pop_file_content_targets("md5:test") == []
+        assert get_file_content_metrics()["queue_depth"] == 0
+
+        # queued again once released
+        assert request_file_content("md5:test", file_instance, "text/plain", "rec1", "ver1")
+        db.session.commit()
+        assert mock_delay.call_count == 2
+        pop_file_content_targets("md5:test")
+
+        # released if the transaction is rolled back
+        assert request_file_content("md5:test", file_instance, "text/plain", "rec1", "ver1")
+        db.session.rollback()
+        assert mock_delay.call_count == 2
+        assert get_file_content_metrics()["queue_depth"] == 0
+        assert request_file_content("md5:test", file_instance, "text/plain", "rec1", "ver1")
+        db.session.commit()
+        assert mock_delay.call_count == 3
+        pop_file_content_targets("md5:test")
+
+        # released if the task can not be queued
+        mock_delay.side_effect = Exception("test_error")
+        assert request_file_content("md5:test", file_instance, "text/plain", "rec1", "ver1")
+        db.session.commit()
+        assert get_file_content_metrics()["queue_depth"] == 0
+        assert pop_file_content_targets("md5:test") == []
+        mock_delay.side_effect = None
+
+        app.config.update(WEKO_DEPOSIT_FILE_CONTENT_ASYNC=False)
+        assert not request_file_content("md5:other", file_instance, "text/plain", "rec1", "ver1")
+        app.config.update(WEKO_DEPOSIT_FILE_CONTENT_ASYNC=True)
+        with patch("weko_deposit.utils.get_file_content_redis", side_effect=Exception("test_error")):
+            assert not request_file_content("md5:other", file_instance, "text/plain", "rec1", "ver1")
+            # the redis errors are logged
+            assert pop_file_content_targets("md5:other") == []
+        db.session.commit()
+        assert mock_delay.call_count == 4
+
+
+# def add_file_content_metrics(wait, duration=None, error=False):
+# def get_file_content_metrics():
+# .tox/c1/bin/pytest --cov=weko_deposit tests/test_utils.py::test_file_content_metrics -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/weko-deposit/.tox/c1/tmp
+def test_file_content_metrics(app, content_redis):
+    content_redis.delete(app.config["WEKO_DEPOSIT_FILE_CONTENT_METRICS_KEY"])
+    assert get_file_content_metrics() == {
+        "queue_depth": 0, "extracted": 0, "cached": 0, "errors": 0,
+        "avg_extraction_seconds": 0, "max_extraction_seconds": 0,
+        "avg_wait_seconds": 0}
+    add_file_content_metrics(1.0, 2.0)
+    add_file_content_metrics(3.0, 4.0)
+    add_file_content_metrics(2.0)
+    add_file_content_metrics(2.0, error=True)
+    assert get_file_content_metrics() == {
+        "queue_depth": 0, "extracted": 2, "cached": 1, "errors": 1,
+        "avg_extraction_seconds": 3.0, "max_extraction_seconds": 4.0,
+        "avg_wait_seconds": 2.0}
+
+    # the redis errors are logged
+    with patch("weko_deposit.utils.get_file_content_redis", side_effect=Exception("test_error")):
+        add_file_content_metrics(2.0, 1.0)
@@ -22,20 +22,20 @@
 import copy
 import inspect
 import sys
+import threading
 import uuid
 import io
-import chardet
 from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime, timezone,date
 from typing import NoReturn, Union
-from tika import parser
 
 import redis
 from redis import sentinel
 from dictdiffer import dot_lookup
 from dictdiffer.merge import Merger, UnresolvedConflictsException
-from elasticsearch.exceptions import TransportError
-from elasticsearch.helpers import bulk
+from elasticsearch.exceptions import NotFoundError, TransportError
+from elasticsearch.helpers import bulk, streaming_bulk
 from flask import abort, current_app, json, request, session
 from flask_security import current_user
 from invenio_db import db
@@ -57,7 +57,10 @@ from invenio_records_files.api import FileObject, Record
 from invenio_records_files.models import RecordsBuckets
 from invenio_records_rest.errors import PIDResolveRESTError
 from invenio_files_rest.errors import StorageError
+from invenio_files_rest.convert import request_preview_pdfs
+from invenio_iiif.utils import prerender_iiif_images
 from simplekv.memory.redisstore import RedisStore
+from sqlalchemy import event
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm.attributes import flag_modified
 from weko_admin.models import AdminSettings
@@ -74,6 +77,9 @@ from weko_user_profiles.models import UserProfile
 
 from .config import WEKO_DEPOSIT_BIBLIOGRAPHIC_INFO_KEY, \
     WEKO_DEPOSIT_BIBLIOGRAPHIC_INFO_SYS_KEY, WEKO_DEPOSIT_SYS_CREATOR_KEY
+from .utils import call_after_commit, extract_file_content, \
+    get_cached_file_content, get_file_content_key, request_file_content, \
+    set_cached_file_content
 from .pidstore import get_latest_version_id, get_record_without_version, \
     weko_deposit_fetcher, weko_deposit_minter
 
@@ -131,9 +137,213 @@ class WekoFileObject(FileObject):
         return True
 
 
+_bulk_sessions = threading.local()
+
+
+def _transaction_bulks(session):
+    """Get the bulks sent when a database session commits.
+
+    The listeners are registered once per session.
+
+    :param session: the database session.
+    :return: list of the :class:`WekoIndexerBulk`.
+    """
+    if 'weko_indexer_bulks' not in session.info:
+        session.info['weko_indexer_bulks'] = []
+        event.listen(session, 'after_transaction_create',
+                     _after_transaction_create)
+        event.listen(session, 'after_soft_rollback', _after_soft_rollback)
+        event.listen(session, 'after_commit', _after_commit)
+        event.listen(session, 'after_transaction_end', _after_transaction_end)
+    return session.info['weko_indexer_bulks']
+
+
+def _after_transaction_create(session, transaction):
+    """Remember where the writes of a savepoint start."""
+    if transaction.nested:
+        for es_bulk in session.info['weko_indexer_bulks']:
+            es_bulk.savepoints[transaction] = es_bulk.mark()
+
+
+def _after_soft_rollback(session, previous_transaction):
+    """Discard the writes of a rolled back savepoint."""
+    for es_bulk in session.info['weko_indexer_bulks']:
+        mark = es_bulk.savepoints.pop(previous_transaction, None)
+        if mark is not None:
+            es_bulk.rollback(mark)
+
+
+def _after_commit(session):
+    """Send the writes once the transaction is committed."""
+    # also called when a savepoint is released
+    if session.transaction is not None and session.transaction.nested:
+        return
+    for es_bulk in list(session.info['weko_indexer_bulks']):
+        try:
+            es_bulk.send()
+        except Exception as ex:
+            current_app.logger.error(ex)
+
+
+def _after_transaction_end(session, transaction):
+    """Discard the writes not committed with the transaction."""
+    bulks = session.info['weko_indexer_bulks']
+    for es_bulk in list(bulks):
+        es_bulk.savepoints.pop(transaction, None)
+        if transaction.parent is None:
+            es_bulk.rollback()
+            if es_bulk.closed:
+                bulks.remove(es_bulk)
+
+
+class WekoIndexerBulk(object):
+    """Elasticsearch writes of :class:`WekoIndexer` buffered for a bulk."""
+
+    def __init__(self, indexer):
+        """Init.
+
+        :param indexer: the indexer sending the writes.
+        """
+        self.indexer = indexer
+        self.actions = []
+        self.ignore = set()
+        self.errors = []
+        self.savepoints = {}
+        self.closed = False
+
+    def add(self, action, ignore=()):
+        """Buffer a write.
+
+        :param action: the bulk action.
+        :param ignore: the error statuses of the write to ignore.
+        """
+        self.actions.append(action)
+        for status in ignore:
+            self.ignore.add((action['_op_type'], action['_id'], status))
+
+    def mark(self):
+        """Get the position of the next write, see :meth:`rollback`."""
+        return len(self.actions)
+
+    def rollback(self, mark=0):
+        """Discard the writes buffered since ``mark``.
+
+        :param mark: the position returned by :meth:`mark`.
+        """
+        del self.actions[mark:]
+
+    def flush(self):
+        """Send the buffered writes with streamed bulk requests.
+
+        As :meth:`WekoIndexer.upload_metadata`, a document is indexed with
+        its revision as external version only if it does not exist yet.
+        The other versions are sent as is, so a write conflicting with a
+        newer revision fails like the single request.
+
+        :return: list of the errors of the writes, also appended to
+            :attr:`errors`.
+        """
+        actions, self.actions = self.actions, []
+        ignore, self.ignore = self.ignore, set()
+        if not actions:
+            return []
+        client = self.indexer.client
+        chunk_size = current_app.config['WEKO_DEPOSIT_BULK_CHUNK_SIZE']
+        versioned = [a for a in actions if '_version_type' in a]
+        existing = set()
+        for i in range(0, len(versioned), chunk_size):
+            docs = client.mget(body={'docs': [
+                dict(_index=a['_index'], _type=a['_type'], _id=a['_id'])
+                for a in versioned[i:i + chunk_size]]},
+                _source=False)['docs']
+            existing.update((d['_index'], d['_id'])
+                            for d in docs if d['found'])
+        for action in actions:
+            if action['_op_type'] != 'index':
+                continue
+            key = (action['_index'], action['_id'])
+            if key in existing:
+                action.pop('_version', None)
+                action.pop('_version_type', None)
+            existing.add(key)
+        errors = []
+        for ok, item in streaming_bulk(
+                client, actions, chunk_size=chunk_size,
+                max_retries=current_app.config['WEKO_DEPOSIT_BULK_MAX_RETRIES'],
+                raise_on_error=False, raise_on_exception=False):
+            if ok:
+                continue
+            op, info = next(iter(item.items()))
+            if (op, info.get('_id'), info.get('status')) not in ignore:
+                errors.append(item)
+        self.errors.extend(errors)
+        return errors
+
+    def send(self):
+        """Send the buffered writes and log the failed ones."""
+        for error in self.flush():
+            for op, info in error.items():
+                current_app.logger.error(
+                    'Failed to {} {} in Elasticsearch ({}): {}'.format(
+                        op, info.get('_id'), info.get('status'),
+                        info.get('error')))
+
+
 class WekoIndexer(RecordIndexer):
     """Provide an interface for indexing records in Elasticsearch."""
 
+    @contextmanager
+    def bulk_session(self, transactional=False):
+        """Buffer the writes of the current thread in a bulk.
+
+        ``upload_metadata``, ``update_relation_version_is_last``,
+        ``update_feedback_mail_list``, ``update_author_link``,
+        ``update_jpcoar_identifier`` and ``update_es_data`` only buffer
+        their write while the session is open. The writes still buffered
+        are sent when the block exits, or discarded if it raises.
+
+        A transactional session sends its writes when the database
+        transaction commits instead, and discards them when it rolls back
+        (only those of the savepoint for a savepoint). The writes still
+        buffered when the block exits wait for the end of the transaction.
+
+        :param transactional: send the writes at the database commit.
+        :return: the :class:`WekoIndexerBulk`.
+        """
+        session = getattr(_bulk_sessions, 'session', None)
+        if session is not None:
+            yield session
+            return
+        session = WekoIndexerBulk(self)
+        bulks = _transaction_bulks(db.session()) if transactional else None
+        if bulks is not None:
+            bulks.append(session)
+        _bulk_sessions.session = session
+        done = False
+        try:
+            yield session
+            done = True
+            if bulks is None:
+                session.send()
+        finally:
+            _bulk_sessions.session = None
+            session.closed = True
+            if not done or bulks is None:
+                session.rollback()
+            if bulks is not None and not session.actions:
+                bulks.remove(session)
+
+    def _buffer(self, ignore=(), **action):
+        """Buffer a write in the bulk session of the thread, if any.
+
+        :return: True if the write is buffered.
+        """
+        session = getattr(_bulk_sessions, 'session', None)
+        if session is None:
+            return False
+        session.add(action, ignore)
+        return True
+
     def get_es_index(self):
         """Elastic search settings."""
         self.es_index = current_app.config['SEARCH_UI_SEARCH_INDEX']
@@ -166,6 +376,12 @@ class WekoIndexer(RecordIndexer):
                     version_type=self._version_type,
                     body=jrc)
 
+        if self._buffer(_op_type='index', _index=es_info['index'],
+                        _type=es_info['doc_type'], _id=es_info['id'],
+                        _version=revision_id,
+                        _version_type=self._version_type, _source=jrc):
+            return
+
         if self.client.exists(**es_info):
             del body['version']
             del body['version_type']
@@ -202,6 +418,10 @@ class WekoIndexer(RecordIndexer):
         self.get_es_index()
         pst = 'relation_version_is_last'
         body = {'doc': {pst: version.get('is_last')}}
+        if self._buffer(ignore=(400, 404), _op_type='update',
+                        _index=self.es_index, _type=self.es_doc_type,
+                        _id=str(version.get('id')), _source=body):
+            return None
         return self.client.update(
             index=self.es_index,
             doc_type=self.es_doc_type,
@@ -258,6 +478,11 @@ class WekoIndexer(RecordIndexer):
                 }
             }
 
+        if self._buffer(_op_type='update', _index=self.es_index,
+                        _type=self.es_doc_type, _id=str(record.id),
+                        _source=body, **(dict(_version=record.revision_id)
+                                         if update_revision else {})):
+            return None
         if update_revision:
             return self.client.update(
                 index=self.es_index,
@@ -365,6 +590,39 @@ class WekoIndexer(RecordIndexer):
 
             self.client.clear_scroll(scroll_id=scroll_id)
 
+    def scan_ids_by_index_id(self, path, size=1000):
+        """Get the ids of all the records of an index, page by page.
+
+        Unlike :meth:`get_pid_by_es_scroll`, every page of the scroll is
+        read and the scroll is cleared even if the reading stops early.
+
+        :param path: the index id.
+        :param size: the number of ids per page.
+        :return: generator of the lists of record ids.
+        """
+        search_query = {
+            'query': {
+                'match': {
+                    'path.tree': path
+                }
+            },
+            '_source': False,
+            'sort': ['_doc'],
+            'size': size
+        }
+        ind, doc_type = self.record_to_index({})
+        result = self.client.search(index=ind, doc_type=doc_type,
+                                    body=search_query, scroll='5m')
+        scroll_id = result.get('_scroll_id')
+        try:
+            while result['hits']['hits']:
+                yield [h['_id'] for h in result['hits']['hits']]
+                result = self.client.scroll(scroll_id=scroll_id, scroll='5m')
+                scroll_id = result.get('_scroll_id', scroll_id)
+        finally:
+            if scroll_id:
+                self.client.clear_scroll(scroll_id=scroll_id, ignore=[404])
+
     def get_metadata_by_item_id(self, item_id):
         """Get metadata of item by id from ES.
 
@@ -389,7 +647,10 @@ class WekoIndexer(RecordIndexer):
         self.get_es_index()
         pst = 'feedback_mail_list'
         body = {'doc': {pst: feedback_mail.get('mail_list')}}
-        
+        if self._buffer(_op_type='update', _index=self.es_index,
+                        _type=self.es_doc_type,
+                        _id=str(feedback_mail.get('id')), _source=body):
+            return None
         return self.client.update(
             index=self.es_index,
             doc_type=self.es_doc_type,
@@ -397,13 +658,48 @@ class WekoIndexer(RecordIndexer):
             body=body
         )
 
+    def update_file_content(self, item_id, version_id, content):
+        """Set the text extracted from a file in an indexed record.
+
+        :param item_id: the record id.
+        :param version_id: the version id of the file.
+        :param content: the extracted text.
+        :return: False if the record or the file is not indexed.
+        """
+        self.get_es_index()
+        script = {
+            'source': 'boolean found = false;'
+                      'if (ctx._source.content != null) {'
+                      ' for (def c : ctx._source.content) {'
+                      '  if (c.version_id == params.version_id) {'
+                      '   if (c.attachment == null) { c.attachment = [:]; }'
+                      '   c.attachment.content = params.content;'
+                      '   found = true; } } }'
+                      'if (!found) { ctx.op = "noop"; }',
+            'lang': 'painless',
+            'params': {'version_id': str(version_id), 'content': content}
+        }
+        try:
+            result = self.client.update(
+                index=self.es_index,
+                doc_type=self.es_doc_type,
+                id=str(item_id),
+                body={'script': script}
+            )
+        except NotFoundError:
+            return False
+        return result.get('result') != 'noop'
+
     def update_author_link(self, author_link):
         """Update author_link info."""
         # current_app.logger.error("author_link:{}".format(author_link));
         self.get_es_index()
         pst = 'author_link'
         body = {'doc': {pst: author_link.get('author_link')}}
-        
+        if self._buffer(_op_type='update', _index=self.es_index,
+                        _type=self.es_doc_type,
+                        _id=str(author_link.get('id')), _source=body):
+            return None
         return self.client.update(
             index=self.es_index,
             doc_type=self.es_doc_type,
@@ -416,6 +712,10 @@ class WekoIndexer(RecordIndexer):
         # current_app.logger.error("dc:{}".format(dc));
         self.get_es_index()
         body = {'doc': {'_item_metadata': dc}}
+        if self._buffer(_op_type='update', _index=self.es_index,
+                        _type=self.es_doc_type, _id=str(item_id),
+                        _source=body):
+            return None
         return self.client.update(
             index=self.es_index,
             doc_type=self.es_doc_type,
@@ -717,6 +1017,21 @@ class WekoDeposit(Deposit):
             relations_ver['is_last'] = relations_ver.get('index') == 0
             self.indexer.update_relation_version_is_last(relations_ver)
 
+        # convert the office files and render the images for their
+        # preview in the background once committed
+        if self.files:
+            try:
+                call_after_commit(
+                    request_preview_pdfs,
+                    [(file.obj.file, file.obj.mimetype) for file in self.files])
+            except Exception as ex:
+                current_app.logger.error(ex)
+            try:
+                call_after_commit(
+                    prerender_iiif_images, [file.obj for file in self.files])
+            except Exception as ex:
+                current_app.logger.error(ex)
+
         # current_app.logger.error("deposit:{}".format(deposit))
         return deposit
 
@@ -1138,16 +1453,15 @@ class WekoDeposit(Deposit):
                                 attachment = {}
                                 if file.obj.mimetype in mimetypes:
                                     try:
-                                        with file.obj.file.storage().open(mode='rb') as fp:
-                                            data = ""
-                                            if file.obj.mimetype in current_app.config['WEKO_DEPOSIT_TEXTMIMETYPE_WHITELIST_FOR_ES']:
-                                                data = fp.read(current_app.config['WEKO_DEPOSIT_FILESIZE_LIMIT'])
-                                                inf = chardet.detect(data)
-                                                data = data.decode(inf['encoding'], errors='replace')
-                                            else:
-                                                reader = parser.from_buffer(fp.read(current_app.config['WEKO_DEPOSIT_FILESIZE_LIMIT']))
-                                                if reader is not None and "content" in reader and reader["content"] is not None:
-                                                    data = "".join(reader["content"].splitlines())
+                                        # the text is extracted once per file
+                                        key = get_file_content_key(file.obj.file)
+                                        data = get_cached_file_content(key)
+                                        if data is None and not request_file_content(
+                                                key, file.obj.file, file.obj.mimetype,
+                                                self.pid.object_uuid, file.obj.version_id):
+                                            data = extract_file_content(file.obj.file, file.obj.mimetype)
+                                            set_cached_file_content(key, data)
+                                        if data is not None:
                                             attachment["content"] = data
                                     except FileNotFoundError as se:
                                         current_app.logger.error("FileNotFoundError: {}".format(se))
@@ -1571,38 +1885,66 @@ class WekoDeposit(Deposit):
                 self.jrc[geo_location_key] = new_data
 
     @classmethod
-    def delete_by_index_tree_id(cls, index_id: str, ignore_items: list = []):
+    def delete_by_index_tree_id(cls, index_id: str, ignore_items: list = [],
+                                progress=None):
         """ 
 
         Delete by index tree id.
 
+        Every record of the index is read from the search index, page by
+        page, and loaded ``WEKO_DEPOSIT_INDEX_DETACH_BATCH_SIZE`` at a time.
+        The index is removed from their path and the records left without
+        index are soft deleted. The search index is updated with bulk
+        requests once the transaction is committed.
+
         Args:
             index_id (str): index_id
             ignore_items (list):
                 list of items that will be ingnored, therefore will not be deleted
-        
+            progress (callable):
+                called with the numbers of processed and total records
+                after each batch. (Default: ``None``)
 
         Returns:
-            None
+            list: recids of the detached or deleted records
 
         Raises:
             Exception: all exception 
         """
+        from weko_records_ui.utils import soft_delete
+
         if index_id:
             index_id = str(index_id)
-        obj_ids = next((cls.indexer.get_pid_by_es_scroll(index_id)), [])
-        for obj_uuid in obj_ids:
-            r = RecordMetadata.query.filter_by(id=obj_uuid).first()
-            if r.json['recid'].split('.')[0] in ignore_items:
-                continue
-            r.json['path'].remove(index_id)
-            flag_modified(r, 'json')
-            if r.json and not r.json['path']:
-                from weko_records_ui.utils import soft_delete
-                soft_delete(obj_uuid)
-            else:
-                dep = WekoDeposit(r.json, r)
-                dep.indexer.update_es_data(dep, update_revision=False)
+        ignore_items = {str(i) for i in ignore_items}
+        size = current_app.config['WEKO_DEPOSIT_INDEX_DETACH_BATCH_SIZE']
+        total = cls.indexer.get_count_by_index_id(index_id)
+        done = 0
+        result = []
+        with cls.indexer.bulk_session(transactional=True):
+            for obj_ids in cls.indexer.scan_ids_by_index_id(index_id, size):
+                records = RecordMetadata.query.filter(
+                    RecordMetadata.id.in_(obj_ids)).all()
+                for r in records:
+                    recid = r.json.get('recid', '')
+                    if recid.split('.')[0] in ignore_items \
+                            or index_id not in r.json.get('path', []):
+                        continue
+                    r.json['path'].remove(index_id)
+                    flag_modified(r, 'json')
+                    if not r.json['path']:
+                        soft_delete(str(r.id))
+                    else:
+                        dep = WekoDeposit(r.json, r)
+                        dep.indexer.update_es_data(dep, update_revision=False)
+                    result.append(recid)
+                db.session.flush()
+                done += len(obj_ids)
+                current_app.logger.info(
+                    'Index {}: {}/{} records processed.'.format(
+                        index_id, done, total))
+                if progress:
+                    progress(done, total)
+        return result
 
     def update_pid_by_index_tree_id(self, path):
         """ 
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of WEKO3.
+# Copyright (C) 2017 National Institute of Informatics.
+#
+# WEKO3 is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# WEKO3 is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WEKO3; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+
+"""Command line interface creation kit."""
+import click
+from flask.cli import with_appcontext
+
+from .utils import get_file_content_metrics
+
+
+@click.group()
+def weko_deposit():
+    """Weko deposit commands."""
+
+
+@weko_deposit.command('file-content-metrics')
+@with_appcontext
+def file_content_metrics():
+    """Show the metrics of the full-text extraction of the files."""
+    for key, value in sorted(get_file_content_metrics().items()):
+        click.echo('{}: {}'.format(key, value))
@@ -50,6 +50,36 @@ WEKO_MIMETYPE_WHITELIST_FOR_ES = [
 WEKO_DEPOSIT_FILESIZE_LIMIT = 2 * 1024 * 1024
 """ The file size(Byte) limit for extracting text from a file. """
 
+WEKO_DEPOSIT_FILE_CONTENT_ASYNC = True
+"""Extract the text of the files in a celery task, not while committing."""
+
+WEKO_DEPOSIT_FILE_CONTENT_CACHE_PREFIX = 'weko_deposit_file_content_'
+"""Prefix of the redis keys of the texts extracted from the files."""
+
+WEKO_DEPOSIT_FILE_CONTENT_CACHE_TTL = 60 * 60 * 24 * 30
+"""Time (sec.) the extracted texts are cached."""
+
+WEKO_DEPOSIT_FILE_CONTENT_PENDING_TTL = 60 * 60
+"""Time (sec.) after which a pending extraction can be queued again."""
+
+WEKO_DEPOSIT_FILE_CONTENT_UPDATE_RETRY = 5
+"""Retries to patch a record not indexed yet with the extracted text."""
+
+WEKO_DEPOSIT_FILE_CONTENT_UPDATE_COUNTDOWN = 30
+"""Delay (sec.) between the retries to patch a record."""
+
+WEKO_DEPOSIT_FILE_CONTENT_METRICS_KEY = 'weko_deposit_file_content_metrics'
+"""Redis key of the metrics of the text extraction."""
+
+WEKO_DEPOSIT_BULK_CHUNK_SIZE = 500
+"""Number of writes per request of the Elasticsearch bulk sessions."""
+
+WEKO_DEPOSIT_BULK_MAX_RETRIES = 3
+"""Number of retries of the writes rejected by an overloaded cluster."""
+
+WEKO_DEPOSIT_INDEX_DETACH_BATCH_SIZE = 500
+"""Number of records loaded at a time when an index is deleted."""
+
 FILES_REST_STORAGE_FACTORY = 'weko_deposit.storage.pyfs_storage_factory'
 """Import path of factory used to create a storage instance."""
 
@@ -21,6 +21,7 @@
 """Weko Deposit celery tasks."""
 import csv
 import json
+import time
 from time import sleep
 from io import StringIO
 
@@ -28,6 +29,7 @@ from celery import shared_task
 from celery.utils.log import get_task_logger
 from flask import current_app
 from invenio_db import db
+from invenio_files_rest.models import FileInstance
 from invenio_indexer.api import RecordIndexer
 from invenio_pidstore.errors import PIDDoesNotExistError
 from invenio_pidstore.models import PersistentIdentifier
@@ -40,6 +42,9 @@ from weko_schema_ui.models import PublishStatus
 from weko_workflow.utils import delete_cache_data, update_cache_data
 
 from .api import WekoDeposit
+from .utils import add_file_content_metrics, extract_file_content, \
+    get_cached_file_content, pop_file_content_targets, \
+    set_cached_file_content
 
 logger = get_task_logger(__name__)
 
@@ -312,9 +317,10 @@ def update_items_by_authorInfo(user_id, target, origin_pkid_list=[], origin_id_l
                 es_bulk_kwargs={'raise_on_error': True})
         if update_es_authorinfo:
             sleep(20)
-            for d in update_es_authorinfo:
-                dep = WekoDeposit.get_record(d['id'])
-                dep.update_author_link(d['author_link'])
+            with WekoDeposit.indexer.bulk_session():
+                for d in update_es_authorinfo:
+                    dep = WekoDeposit.get_record(d['id'])
+                    dep.update_author_link(d['author_link'])
 
         data_total = search['hits']['total']
         if data_total > data_size + data_from:
@@ -438,6 +444,63 @@ def update_items_by_authorInfo(user_id, target, origin_pkid_list=[], origin_id_l
         update_items_by_authorInfo.retry(countdown=3, exc=e, max_retries=1)
 
 
+@shared_task(ignore_result=True)
+def extract_file_content_task(file_id, key, mimetype, queued_at):
+    """Extract the text of a file and patch the records requesting it.
+
+    :param file_id: the FileInstance id.
+    :param key: the key returned by :func:`.utils.get_file_content_key`.
+    :param mimetype: the mimetype of the file.
+    :param queued_at: the time the extraction was queued.
+    """
+    start = time.time()
+    duration = None
+    error = False
+    content = get_cached_file_content(key)
+    try:
+        if content is None:
+            file_instance = FileInstance.query.get(file_id)
+            if file_instance is None:
+                raise FileNotFoundError(file_id)
+            content = extract_file_content(file_instance, mimetype)
+            duration = time.time() - start
+            set_cached_file_content(key, content)
+    except Exception as ex:
+        error = True
+        current_app.logger.error(
+            'Text extraction of file {} failed: {}'.format(file_id, ex))
+    finally:
+        targets = pop_file_content_targets(key)
+        add_file_content_metrics(start - queued_at, duration, error)
+    if content is None:
+        return
+    for record_id, version_id in targets:
+        update_file_content_task.delay(record_id, version_id, key)
+
+
+@shared_task(ignore_result=True)
+def update_file_content_task(record_id, version_id, key, retry=0):
+    """Patch the extracted text of a file in the record indexed in ES.
+
+    The record may not be indexed yet when the extraction is quicker than
+    its commit, the patch is then retried later.
+
+    :param record_id: the record id.
+    :param version_id: the version id of the file in the record.
+    :param key: the key returned by :func:`.utils.get_file_content_key`.
+    :param retry: the number of the retry.
+    """
+    content = get_cached_file_content(key)
+    if content is None or WekoDeposit.indexer.update_file_content(
+            record_id, version_id, content):
+        return
+    if retry < current_app.config['WEKO_DEPOSIT_FILE_CONTENT_UPDATE_RETRY']:
+        update_file_content_task.apply_async(
+            args=(record_id, version_id, key, retry + 1),
+            countdown=current_app.config[
+                'WEKO_DEPOSIT_FILE_CONTENT_UPDATE_COUNTDOWN'])
+
+
 def get_origin_data(origin_pkid_list):
     author_data = Authors.query.filter(Authors.id.in_(origin_pkid_list)).all()
     return [a.json for a in author_data]
@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of WEKO3.
+# Copyright (C) 2017 National Institute of Informatics.
+#
+# WEKO3 is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# WEKO3 is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WEKO3; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+
+"""Utilities for the full-text extraction of the deposit files."""
+
+import time
+import zlib
+
+import chardet
+from flask import current_app
+from invenio_db import db
+from sqlalchemy import event
+from tika import parser
+from weko_redis.redis import RedisConnection
+
+
+def get_file_content_redis():
+    """Get the redis storing the extracted texts and their metrics."""
+    return RedisConnection().connection(
+        db=current_app.config['CACHE_REDIS_DB'])
+
+
+def get_file_content_key(file_instance):
+    """Get the key of the text extracted from a file.
+
+    The content of a file instance never changes, so the text is shared by
+    every object version, record and version of the item using it.
+
+    :param file_instance: the FileInstance.
+    :return: the checksum, or the id of the file without checksum.
+    """
+    return file_instance.checksum or 'id:{}'.format(file_instance.id)
+
+
+def get_cached_file_content(key):
+    """Get the cached text of a file.
+
+    :param key: the key returned by :func:`get_file_content_key`.
+    :return: the text, or None if it is not extracted yet.
+    """
+    try:
+        data = get_file_content_redis().get(
+            current_app.config['WEKO_DEPOSIT_FILE_CONTENT_CACHE_PREFIX']
+            + key)
+    except Exception as ex:
+        current_app.logger.error(ex)
+        return None
+    if data is None:
+        return None
+    return zlib.decompress(data).decode('utf-8')
+
+
+def set_cached_file_content(key, content):
+    """Cache the text of a file.
+
+    :param key: the key returned by :func:`get_file_content_key`.
+    :param content: the text.
+    """
+    try:
+        get_file_content_redis().setex(
+            current_app.config['WEKO_DEPOSIT_FILE_CONTENT_CACHE_PREFIX']
+            + key,
+            current_app.config['WEKO_DEPOSIT_FILE_CONTENT_CACHE_TTL'],
+            zlib.compress(content.encode('utf-8')))
+    except Exception as ex:
+        current_app.logger.error(ex)
+
+
+def extract_file_content(file_instance, mimetype):
+    """Extract the text of a file.
+
+    At most ``WEKO_DEPOSIT_FILESIZE_LIMIT`` bytes of the file are read. The
+    text files are decoded, the other files are parsed by Tika.
+
+    :param file_instance: the FileInstance.
+    :param mimetype: the mimetype of the file.
+    :return: the text.
+    """
+    with file_instance.storage().open(mode='rb') as fp:
+        data = fp.read(current_app.config['WEKO_DEPOSIT_FILESIZE_LIMIT'])
+    if mimetype in current_app.config[
+            'WEKO_DEPOSIT_TEXTMIMETYPE_WHITELIST_FOR_ES']:
+        inf = chardet.detect(data)
+        return data.decode(inf['encoding'] or 'utf-8', errors='replace')
+    reader = parser.from_buffer(data)
+    if reader is not None and "content" in reader \
+            and reader["content"] is not None:
+        return "".join(reader["content"].splitlines())
+    return ""
+
+
+def call_after_commit(func, *args, on_rollback=None):
+    """Call a function once the database transaction is committed.
+
+    Background tasks reading the data written by the transaction must not
+    be queued before it is visible to the workers. The calls are made in a
+    new transaction, the calls of a rolled back transaction are replaced by
+    ``on_rollback``. The errors are logged.
+
+    :param func: the function to call.
+    :param args: the arguments of the function.
+    :param on_rollback: the function called without arguments if the
+        transaction is rolled back.
+    """
+    session = db.session()
+    if 'weko_deposit_after_commit' not in session.info:
+        session.info['weko_deposit_after_commit'] = []
+        session.info['weko_deposit_committed'] = []
+        event.listen(session, 'after_commit', _after_commit_calls)
+        event.listen(session, 'after_transaction_end',
+                     _after_transaction_end_calls)
+    session.info['weko_deposit_after_commit'].append(
+        (func, args, on_rollback))
+
+
+def _after_commit_calls(session):
+    """Keep the calls of the committed transaction."""
+    # also called when a savepoint is released
+    if session.transaction is not None and session.transaction.nested:
+        return
+    session.info['weko_deposit_committed'].extend(
+        session.info['weko_deposit_after_commit'])
+    session.info['weko_deposit_after_commit'] = []
+
+
+def _after_transaction_end_calls(session, transaction):
+    """Make the calls once the transaction is ended."""
+    if transaction.parent is not None:
+        return
+    committed = session.info['weko_deposit_committed']
+    rolled_back = session.info['weko_deposit_after_commit']
+    session.info['weko_deposit_committed'] = []
+    session.info['weko_deposit_after_commit'] = []
+    calls = [(func, args) for func, args, _on_rollback in committed]
+    calls.extend((on_rollback, ()) for _func, _args, on_rollback
+                 in rolled_back if on_rollback is not None)
+    for func, args in calls:
+        try:
+            func(*args)
+        except Exception as ex:
+            current_app.logger.error(ex)
+
+
+def request_file_content(key, file_instance, mimetype, record_id,
+                         version_id):
+    """Extract the text of a file in the background.
+
+    The record is patched in Elasticsearch once the text is extracted. The
+    extraction of a file is only queued once while it is pending, the
+    records requesting it meanwhile are patched by the same task. The task
+    is queued once the transaction is committed.
+
+    :param key: the key returned by :func:`get_file_content_key`.
+    :param file_instance: the FileInstance.
+    :param mimetype: the mimetype of the file.
+    :param record_id: the id of the record to patch.
+    :param version_id: the version id of the file in the record.
+    :return: False if the text must be extracted synchronously.
+    """
+    if not current_app.config['WEKO_DEPOSIT_FILE_CONTENT_ASYNC']:
+        return False
+    prefix = current_app.config['WEKO_DEPOSIT_FILE_CONTENT_CACHE_PREFIX']
+    ttl = current_app.config['WEKO_DEPOSIT_FILE_CONTENT_PENDING_TTL']
+    try:
+        redis = get_file_content_redis()
+        targets = prefix + 'targets_' + key
+        redis.sadd(targets, '{}|{}'.format(record_id, version_id))
+        redis.expire(targets, ttl)
+        if redis.set(prefix + 'pending_' + key, 1, nx=True, ex=ttl):
+            redis.hincrby(
+                current_app.config['WEKO_DEPOSIT_FILE_CONTENT_METRICS_KEY'],
+                'queued', 1)
+            call_after_commit(
+                _queue_file_content, str(file_instance.id), key, mimetype,
+                on_rollback=lambda: pop_file_content_targets(key))
+    except Exception as ex:
+        current_app.logger.error(ex)
+        return False
+    return True
+
+
+def _queue_file_content(file_id, key, mimetype):
+    """Queue the extraction of a file.
+
+    :param file_id: the FileInstance id.
+    :param key: the key returned by :func:`get_file_content_key`.
+    :param mimetype: the mimetype of the file.
+    """
+    from .tasks import extract_file_content_task
+
+    try:
+        extract_file_content_task.delay(file_id, key, mimetype, time.time())
+    except Exception:
+        # the next request of the file queues it again
+        pop_file_content_targets(key)
+        raise
+
+
+def pop_file_content_targets(key):
+    """Release the pending extraction of a file.
+
+    :param key: the key returned by :func:`get_file_content_key`.
+    :return: list of the (record id, version id) to patch.
+    """
+    prefix = current_app.config['WEKO_DEPOSIT_FILE_CONTENT_CACHE_PREFIX']
+    targets = []
+    try:
+        redis = get_file_content_redis()
+        redis.delete(prefix + 'pending_' + key)
+        redis.hincrby(
+            current_app.config['WEKO_DEPOSIT_FILE_CONTENT_METRICS_KEY'],
+            'queued', -1)
+        while True:
+            target = redis.spop(prefix + 'targets_' + key)
+            if target is None:
+                break
+            targets.append(tuple(target.decode('utf-8').split('|', 1)))
+    except Exception as ex:
+        current_app.logger.error(ex)
+    return targets
+
+
+def add_file_content_metrics(wait, duration=None, error=False):
+    """Add an extraction to the metrics.
+
+    :param wait: the seconds the extraction waited in the queue.
+    :param duration: the seconds of the extraction, None if the text was
+        already cached.
+    :param error: True if the extraction failed.
+    """
+    key = current_app.config['WEKO_DEPOSIT_FILE_CONTENT_METRICS_KEY']
+    try:
+        redis = get_file_content_redis()
+        pipe = redis.pipeline()
+        pipe.hincrbyfloat(key, 'wait_seconds', wait)
+        if error:
+            pipe.hincrby(key, 'errors', 1)
+        elif duration is None:
+            pipe.hincrby(key, 'cached', 1)
+        else:
+            pipe.hincrby(key, 'extracted', 1)
+            pipe.hincrbyfloat(key, 'extraction_seconds', duration)
+        pipe.execute()
+        if duration is not None:
+            # not atomic, the maximum is indicative
+            max_duration = float(
+                redis.hget(key, 'max_extraction_seconds') or 0)
+            if duration > max_duration:
+                redis.hset(key, 'max_extraction_seconds', duration)
+    except Exception as ex:
+        current_app.logger.error(ex)
+
+
+def get_file_content_metrics():
+    """Get the metrics of the full-text extraction.
+
+    :return: dict of the queue depth, the number of extracted, cached and
+        failed extractions and the average and maximum latencies.
+    """
+    data = {k.decode('utf-8'): float(v) for k, v in
+            get_file_content_redis().hgetall(current_app.config[
+                'WEKO_DEPOSIT_FILE_CONTENT_METRICS_KEY']).items()}
+    extracted = int(data.get('extracted', 0))
+    done = extracted + int(data.get('cached', 0)) + int(data.get('errors', 0))
+    return {
+        'queue_depth': max(0, int(data.get('queued', 0))),
+        'extracted': extracted,
+        'cached': int(data.get('cached', 0)),
+        'errors': int(data.get('errors', 0)),
+        'avg_extraction_seconds':
+            data.get('extraction_seconds', 0) / extracted
+            if extracted else 0,
+        'max_extraction_seconds': data.get('max_extraction_seconds', 0),
+        'avg_wait_seconds':
+            data.get('wait_seconds', 0) / done if done else 0,
+    }
@@ -38,7 +38,7 @@ from sqlalchemy.exc import IntegrityError
 
 from weko_deposit.api import WekoDeposit
 from weko_index_tree.api import Indexes
-from weko_index_tree.models import Index
+from weko_index_tree.models import Index, IndexAncestry
 from weko_index_tree import WekoIndexTree
 from weko_groups.api import Group
 
@@ -522,6 +522,62 @@ def test_Indexes_recs_query(i18n_app, db):
     ]
     assert result == test
 
+#     def get_ancestry_paths(cls, index_ids):
+# .tox/c1/bin/pytest --cov=weko_index_tree tests/test_api.py::test_Indexes_ancestry -v -s -vv --cov-branch --cov-report=term --cov-config=tox.ini --basetemp=/code/modules/weko-index-tree/.tox/c1/tmp
+def test_Indexes_ancestry(i18n_app, db):
+    # used by default
+    with patch.dict(i18n_app.config):
+        i18n_app.config.pop("WEKO_INDEX_TREE_USE_ANCESTRY", None)
+        assert Indexes.use_ancestry()
+
+    def make_index(id, parent, position, index_name, index_name_english):
+        return Index(
+            id=id,
+            parent=parent,position=position,
+            index_name=index_name,index_name_english=index_name_english,
+        )
+    with db.session.begin_nested():
+        db.session.add(make_index(1,0,0,"テストインデックス1","test_index1"))
+        db.session.add(make_index(11,1,0,"テストインデックス11","test_index11"))
+        db.session.add(make_index(12,1,2,None,"test_index12"))
+        db.session.add(make_index(121,12,0,"テストインデックス121","test_index121"))
+        db.session.add(make_index(2,0,1,None,"test_index2"))
+        db.session.add(make_index(21,2,0,"テストインデックス21","test_index21"))
+        db.session.add(make_index(22,2,1,None,"test_index22"))
+    db.session.commit()
+
+    # not built yet, fall back to the recursive queries
+    assert Indexes.get_ancestry_paths([121]) == {}
+    assert Indexes.get_full_path(121) == "1/12/121"
+    parents = Indexes.get_all_parent_indexes(121)
+    assert [i.id for i in parents] == [1, 12, 121]
+
+    IndexAncestry.rebuild()
+    recursive_t = Indexes.recs_query()
+    expected = db.session.query(recursive_t).order_by(recursive_t.c.path).all()
+    paths = Indexes.get_ancestry_paths([1, 11, 12, 121, 2, 21, 22])
+    assert sorted(paths.values(), key=lambda x: x.path) == expected
+    assert Indexes.get_self_path(121) == paths[121]
+    with patch("weko_index_tree.api.filter_index_list_by_role", side_effect=lambda x: x):
+        assert Indexes.get_path_name([121, 11]) == [paths[11], paths[121]]
+    assert Indexes.get_full_path(121) == "1/12/121"
+    assert Indexes.get_full_path_reverse(121) == "121/12/1"
+    # the same rows as the recursive query
+    assert Indexes.get_all_parent_indexes(121) == parents
+    assert Indexes.get_child_list_recursive(1) == ["1", "11", "12", "121"]
+
+    # the indexes missing from the table use the recursive queries
+    with db.session.begin_nested():
+        db.session.add(make_index(122,12,1,"テストインデックス122","test_index122"))
+    db.session.commit()
+    with patch("weko_index_tree.api.filter_index_list_by_role", side_effect=lambda x: x):
+        res = Indexes.get_path_name([121, 122])
+        assert [i.path for i in res] == ["1/12/121", "1/12/122"]
+    assert Indexes.get_child_list_recursive(1) == ["1", "11", "12", "121", "122"]
+
+    i18n_app.config["WEKO_INDEX_TREE_USE_ANCESTRY"] = False
+    assert Indexes.get_self_path(121) == expected[3]
+
 #     def recs_tree_query(cls, pid=0, ):
 #     def recs_root_tree_query(cls, pid=0):
 #     def get_harvest_public_state(cls, paths):
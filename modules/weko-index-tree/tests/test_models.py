@@ -1,6 +1,6 @@
 from mock import patch
 
-from weko_index_tree.models import Index, IndexStyle
+from weko_index_tree.models import Index, IndexAncestry, IndexStyle
 
 
 # class Index(db.Model, Timestamp):
@@ -34,6 +34,68 @@ def test_Index_get_all(app, db):
 
 
 
+# class IndexAncestry(db.Model):
+#     def add_node(cls, index_id, parent):
+#     def move_subtree(cls, index_id, parent):
+#     def remove_node(cls, index_id):
+#     def remove_nodes(cls, index_ids):
+#     def compute(cls):
+#     def check(cls):
+#     def rebuild(cls, chunk_size=1000):
+# .tox/c1/bin/pytest --cov=weko_index_tree tests/test_models.py::test_IndexAncestry -v -s -vv --cov-branch --cov-report=term --cov-config=tox.ini --basetemp=/code/modules/weko-index-tree/.tox/c1/tmp
+def test_IndexAncestry(app, db, test_indices):
+    def _rows():
+        return sorted(db.session.query(
+            IndexAncestry.ancestor, IndexAncestry.descendant,
+            IndexAncestry.depth).all())
+
+    res = IndexAncestry.check()
+    assert len(res["missing"]) == 11
+    assert res["extra"] == []
+
+    assert IndexAncestry.rebuild(chunk_size=5) == 11
+    assert IndexAncestry.check() == {"missing": [], "extra": []}
+    assert (2, 21, 1) in _rows()
+
+    # add 211 under 21
+    db.session.add(Index(id=211, parent=21, position=0))
+    IndexAncestry.add_node(211, 21)
+    db.session.commit()
+    assert IndexAncestry.check() == {"missing": [], "extra": []}
+    assert (2, 211, 2) in _rows()
+
+    # move 21 under 1
+    Index.query.filter_by(id=21).update({"parent": 1, "position": 1})
+    IndexAncestry.move_subtree(21, 1)
+    db.session.commit()
+    assert IndexAncestry.check() == {"missing": [], "extra": []}
+    assert (1, 211, 2) in _rows()
+    assert (2, 211, 2) not in _rows()
+
+    # delete 21 and move 211 to 1
+    Index.query.filter_by(id=211).update({"parent": 1, "position": 2})
+    Index.query.filter_by(id=21).delete()
+    IndexAncestry.remove_node(21)
+    db.session.commit()
+    assert IndexAncestry.check() == {"missing": [], "extra": []}
+    assert (1, 211, 1) in _rows()
+
+    # delete 1 with its children
+    Index.query.filter(Index.id.in_([1, 11, 211])).delete(
+        synchronize_session=False)
+    IndexAncestry.remove_nodes([1, 11, 211])
+    db.session.commit()
+    assert IndexAncestry.check() == {"missing": [], "extra": []}
+
+    # broken table
+    IndexAncestry.query.filter_by(ancestor=3, descendant=31).update(
+        {"depth": 2})
+    db.session.commit()
+    res = IndexAncestry.check()
+    assert res["missing"] == [(3, 31, 1)]
+    assert res["extra"] == [(3, 31, 2)]
+
+
 # class IndexStyle(db.Model, Timestamp):
 #     def create(cls, community_id, **data):
 #     def get(cls, community_id):
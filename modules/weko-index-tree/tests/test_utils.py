@@ -2,6 +2,8 @@ import copy
 import os
 
 from weko_index_tree.utils import (
+    get_harvest_state_generation,
+    clear_harvest_state_cache,
     get_index_link_list,
     is_index_tree_updated,
     get_user_roles,
@@ -24,6 +26,9 @@ from weko_index_tree.utils import (
     perform_delete_index,
     get_doi_items_in_index,
     cached_index_tree_json,
+    clear_reduced_index_tree_cache,
+    get_reduced_index_tree,
+    get_reduced_index_tree_cache_timeout,
     reset_tree,
     get_tree_json,
     get_editing_items_in_index,
@@ -147,6 +152,81 @@ def test_reset_tree(app, db, users):
             assert tree==[]
 
 
+# def get_reduced_index_tree(get_tree, pid=0, more_ids=None, ignore_more=False):
+# def clear_reduced_index_tree_cache():
+# .tox/c1/bin/pytest --cov=weko_index_tree tests/test_utils.py::test_get_reduced_index_tree -v -s -vv --cov-branch --cov-report=term --cov-config=tox.ini --basetemp=/code/modules/weko-index-tree/.tox/c1/tmp
+def test_get_reduced_index_tree(app, db, users):
+    def _node():
+        return {"id": "1", "parent": "0", "children": [],
+                "public_state": True, "public_date": None,
+                "browsing_role": "3,-99", "contribute_role": "",
+                "browsing_group": "", "contribute_group": "",
+                "more_check": False, "display_no": 5}
+    calls = []
+    def _get_tree(pid):
+        calls.append(pid)
+        return [_node()]
+
+    # not bound to the legacy flag
+    app.config.update(WEKO_INDEX_TREE_UPDATED=True)
+    with patch("flask_login.utils._get_user", return_value=users[3]['obj']):
+        with app.test_request_context(headers=[("Accept-Language", "en")]):
+            clear_reduced_index_tree_cache()
+            res = get_reduced_index_tree(_get_tree)
+            assert res == [_node()]
+            assert get_reduced_index_tree(_get_tree) == res
+            assert calls == [0]
+
+            # other more_ids
+            get_reduced_index_tree(_get_tree, more_ids=["1"])
+            assert calls == [0, 0]
+
+            # index tree changed
+            clear_reduced_index_tree_cache()
+            get_reduced_index_tree(_get_tree)
+            assert calls == [0, 0, 0]
+
+    # other roles
+    with patch("flask_login.utils._get_user", return_value=users[0]['obj']):
+        with app.test_request_context(headers=[("Accept-Language", "en")]):
+            get_reduced_index_tree(_get_tree)
+            assert calls == [0, 0, 0, 0]
+
+    # disabled, nothing is cached
+    app.config.update(WEKO_INDEX_TREE_REDUCED_CACHE_ENABLED=False)
+    with patch("flask_login.utils._get_user", return_value=users[3]['obj']):
+        with app.test_request_context(headers=[("Accept-Language", "en")]):
+            with patch("weko_index_tree.utils.current_cache") as mock_cache:
+                assert get_reduced_index_tree(_get_tree) == [_node()]
+                mock_cache.get.assert_not_called()
+                mock_cache.set.assert_not_called()
+            assert calls == [0, 0, 0, 0, 0]
+    app.config.update(WEKO_INDEX_TREE_REDUCED_CACHE_ENABLED=True)
+
+
+# def get_reduced_index_tree_cache_timeout(tree):
+# .tox/c1/bin/pytest --cov=weko_index_tree tests/test_utils.py::test_get_reduced_index_tree_cache_timeout -v -s -vv --cov-branch --cov-report=term --cov-config=tox.ini --basetemp=/code/modules/weko-index-tree/.tox/c1/tmp
+def test_get_reduced_index_tree_cache_timeout(app):
+    with app.test_request_context(headers=[("Accept-Language", "en")]):
+        tree = [{"id": "1", "public_date": None, "children": [
+            {"id": "11", "public_date": "2000-01-01T00:00:00", "children": []}]}]
+        assert get_reduced_index_tree_cache_timeout(tree) == 600
+
+        tree[0]["children"].append(
+            {"id": "12", "children": [],
+             "public_date": datetime.utcnow() + timedelta(seconds=60)})
+        assert 0 < get_reduced_index_tree_cache_timeout(tree) <= 60
+
+
+# def get_harvest_state_generation():
+# def clear_harvest_state_cache():
+# .tox/c1/bin/pytest --cov=weko_index_tree tests/test_utils.py::test_harvest_state_generation -v -s -vv --cov-branch --cov-report=term --cov-config=tox.ini --basetemp=/code/modules/weko-index-tree/.tox/c1/tmp
+def test_harvest_state_generation(app):
+    generation = get_harvest_state_generation()
+    clear_harvest_state_cache()
+    assert get_harvest_state_generation() != generation
+
+
 #*** def get_tree_json(index_list, root_id):
 # def test_get_tree_json(i18n_app, db_records, indices, esindex):
 #     assert get_tree_json([indices['index_non_dict']], 0)
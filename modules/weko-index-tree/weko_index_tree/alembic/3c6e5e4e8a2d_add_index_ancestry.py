@@ -0,0 +1,50 @@
+#
+# This file is part of Invenio.
+# Copyright (C) 2016-2018 CERN.
+#
+# Invenio is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""add index_ancestry"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c6e5e4e8a2d'
+down_revision = 'b21aaf04d802'
+branch_labels = ()
+depends_on = None
+
+
+def upgrade():
+    """Upgrade database."""
+    op.create_table('index_ancestry',
+    sa.Column('ancestor', sa.BigInteger(), nullable=False),
+    sa.Column('descendant', sa.BigInteger(), nullable=False),
+    sa.Column('depth', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('ancestor', 'descendant',
+                            name=op.f('pk_index_ancestry'))
+    )
+    op.create_index('ix_index_ancestry_descendant', 'index_ancestry',
+                    ['descendant', 'depth'], unique=False)
+    # Populate the table from the existing index tree.
+    op.execute("""
+        INSERT INTO index_ancestry (ancestor, descendant, depth)
+        WITH RECURSIVE tree (id, ancestors) AS (
+            SELECT id, ARRAY[id] FROM "index" WHERE parent = 0
+            UNION ALL
+            SELECT i.id, t.ancestors || i.id
+            FROM "index" i JOIN tree t ON i.parent = t.id
+        )
+        SELECT a.ancestor, tree.id,
+               array_length(tree.ancestors, 1) - a.pos
+        FROM tree, unnest(tree.ancestors) WITH ORDINALITY AS a(ancestor, pos)
+    """)
+
+
+def downgrade():
+    """Downgrade database."""
+    op.drop_index('ix_index_ancestry_descendant', table_name='index_ancestry')
+    op.drop_table('index_ancestry')
@@ -22,6 +22,7 @@
 
 import pickle
 import os
+from collections import namedtuple
 from copy import deepcopy
 from datetime import date, datetime
 from functools import partial
@@ -42,16 +43,29 @@ from sqlalchemy.sql.expression import case, func, literal_column, and_
 from weko_groups.api import Group
 from weko_redis.redis import RedisConnection
 
-from .models import Index
+from .models import Index, IndexAncestry
 from .utils import cached_index_tree_json, check_doi_in_index, \
-    check_restrict_doi_with_indexes, filter_index_list_by_role, \
-    get_index_id_list, get_publish_index_id_list, get_tree_json, \
+    check_restrict_doi_with_indexes, clear_harvest_state_cache, \
+    clear_reduced_index_tree_cache, \
+    filter_index_list_by_role, get_index_id_list, \
+    get_publish_index_id_list, get_reduced_index_tree, get_tree_json, \
     get_user_roles, is_index_locked, reset_tree, sanitize, save_index_trees_to_redis
 
+IndexPath = namedtuple('IndexPath', [
+    'pid', 'cid', 'path', 'name', 'name_en', 'lev', 'public_state',
+    'public_date', 'comment', 'browsing_role', 'browsing_group',
+    'harvest_public_state'])
+"""Row of :meth:`Indexes.recs_query` built from the index_ancestry table."""
+
 
 class Indexes(object):
     """Define API for index tree creation and update."""
 
+    @classmethod
+    def use_ancestry(cls):
+        """Check whether the index_ancestry table is used."""
+        return current_app.config.get('WEKO_INDEX_TREE_USE_ANCESTRY', True)
+
     @classmethod
     def create(cls, pid=None, indexes=None):
         """Create the indexes. Delete all indexes before creation.
@@ -64,7 +78,11 @@ class Indexes(object):
             with db.session.begin_nested():
                 index = Index(**data)
                 db.session.add(index)
+                if cls.use_ancestry():
+                    IndexAncestry.add_node(int(index.id), int(index.parent))
             db.session.commit()
+            clear_reduced_index_tree_cache()
+            clear_harvest_state_cache()
 
         if not isinstance(indexes, dict):
             return
@@ -185,6 +203,8 @@ class Indexes(object):
                 index = cls.get_index(index_id)
                 if not index:
                     return
+                parent = index.parent
+                harvest_state = cls.get_harvest_state_fields(index)
 
                 data.pop("can_edit", False)
                 for k, v in data.items():
@@ -228,13 +248,24 @@ class Indexes(object):
                         cls.set_online_issn_resc, index_id,
                         getattr(index, "online_issn"))
                 }
+                harvest_recursive = getattr(
+                    index, 'recursive_public_state') or getattr(
+                    index, 'recursive_browsing_role')
                 for recur_key, recur_update_func in recs_group.items():
                     if getattr(index, recur_key):
                         recur_update_func()
                     setattr(index, recur_key, False)
                 index.owner_user_id = current_user.get_id()
                 db.session.merge(index)
+                if cls.use_ancestry() and str(index.parent) != str(parent):
+                    IndexAncestry.move_subtree(index.id, int(index.parent))
+                if harvest_recursive or \
+                        harvest_state != cls.get_harvest_state_fields(index):
+                    harvest_state = None
             db.session.commit()
+            clear_reduced_index_tree_cache()
+            if harvest_state is None:
+                clear_harvest_state_cache()
             cls.update_set_info(index)
             return index
         except Exception as ex:
@@ -242,6 +273,17 @@ class Indexes(object):
             db.session.rollback()
         return
 
+    @classmethod
+    def get_harvest_state_fields(cls, index):
+        """Get the fields of an index deciding its harvest state.
+
+        :param index: the :class:`Index` instance.
+        :return: tuple of the field values.
+        """
+        return (str(index.parent), index.public_state,
+                index.harvest_public_state, index.browsing_role,
+                index.public_date)
+
     @classmethod
     def delete(cls, index_id, del_self=False):
         """
@@ -267,8 +309,12 @@ class Indexes(object):
                     },
                     synchronize_session='fetch')
                 db.session.delete(slf)
+                if cls.use_ancestry():
+                    IndexAncestry.remove_node(index_id)
                 p_lst = [o.id for o in obj_list]
                 cls.delete_set_info('move', index_id, p_lst)
+                clear_reduced_index_tree_cache()
+                clear_harvest_state_cache()
                 return p_lst
         else:
             with db.session.no_autoflush:
@@ -301,7 +347,11 @@ class Indexes(object):
                         dct = db.session.query(Index).filter(
                             Index.id.in_(p_lst[s:e])). \
                             delete(synchronize_session='fetch')
+                        if cls.use_ancestry():
+                            IndexAncestry.remove_nodes(p_lst[s:e])
                 cls.delete_set_info('delete', index_id, p_lst)
+                clear_reduced_index_tree_cache()
+                clear_harvest_state_cache()
                 return p_lst
         return 0
 
@@ -340,6 +390,8 @@ class Indexes(object):
                     index.parent = parent
                     flag_modified(index, 'parent')
                 db.session.merge(index)
+                if parent and cls.use_ancestry():
+                    IndexAncestry.move_subtree(index_id, int(parent))
 
         def _swap_position(i, index_tree, next_index_tree):
             # move the index in position i to temp
@@ -532,6 +584,9 @@ class Indexes(object):
                 ret['is_ok'] = False
                 ret['msg'] = str(ex)
                 current_app.logger.debug(ex)
+            if ret['is_ok']:
+                clear_reduced_index_tree_cache()
+                clear_harvest_state_cache()
         return ret
 
     @classmethod
@@ -556,8 +611,8 @@ class Indexes(object):
         return browsing_info
 
     @classmethod
-    def get_browsing_tree(cls, pid=0):
-        """Get browsing tree."""
+    def get_browsing_index_tree(cls, pid=0):
+        """Get index tree json, from redis for the root tree."""
         if pid == 0:
             try:
                 redis_connection = RedisConnection()
@@ -572,35 +627,24 @@ class Indexes(object):
                 save_index_trees_to_redis(tree)
         else:
             tree = cls.get_index_tree(pid)
-        reset_tree(tree)
         return tree
 
+    @classmethod
+    def get_browsing_tree(cls, pid=0):
+        """Get browsing tree."""
+        return get_reduced_index_tree(cls.get_browsing_index_tree, pid)
+
     @classmethod
     def get_more_browsing_tree(cls, pid=0, more_ids=[]):
         """Get more browsing tree."""
-        tree = cls.get_index_tree(pid)
-        reset_tree(tree, more_ids=more_ids)
-        return tree
+        return get_reduced_index_tree(cls.get_index_tree, pid,
+                                      more_ids=more_ids)
 
     @classmethod
     def get_browsing_tree_ignore_more(cls, pid=0):
         """Get browsing tree ignore more."""
-        if pid == 0:
-            try:
-                redis_connection = RedisConnection()
-                datastore = redis_connection.connection(db=current_app.config['CACHE_REDIS_DB'], kv = True)
-                v = datastore.get("index_tree_view_" + os.environ.get('INVENIO_WEB_HOST_NAME') + "_" + current_i18n.language).decode("UTF-8")
-                tree = json.loads(str(v))
-            except RedisError:
-                tree = cls.get_index_tree(pid)
-                save_index_trees_to_redis(tree)
-            except KeyError:
-                tree = cls.get_index_tree(pid)
-                save_index_trees_to_redis(tree)
-        else:
-            tree = cls.get_index_tree(pid)
-        reset_tree(tree, ignore_more=True)
-        return tree
+        return get_reduced_index_tree(cls.get_browsing_index_tree, pid,
+                                      ignore_more=True)
 
     @classmethod
     def get_browsing_tree_paths(cls, index_id: int = 0):
@@ -826,11 +870,19 @@ class Indexes(object):
         :param node_path: List of the Index Identifiers.
         :return: the list of index.
         """
-        node_paths = [cls.get_full_path(item) for item in index_ids]
-        recursive_t = cls.recs_query()
-        q = db.session.query(recursive_t).filter(
-            recursive_t.c.path.in_(node_paths)). \
-            order_by(recursive_t.c.path).all()
+        q = []
+        if cls.use_ancestry():
+            paths = cls.get_ancestry_paths(index_ids)
+            q = list(paths.values())
+            # The indexes missing from the table use the recursive query.
+            index_ids = [item for item in index_ids
+                         if int(item) not in paths]
+        if index_ids:
+            node_paths = [cls.get_full_path(item) for item in index_ids]
+            recursive_t = cls.recs_query()
+            q += db.session.query(recursive_t).filter(
+                recursive_t.c.path.in_(node_paths)).all()
+        q = sorted(q, key=lambda x: x.path)
         return filter_index_list_by_role(q)
 
     @classmethod
@@ -877,6 +929,10 @@ class Indexes(object):
         :return: the type of Index.
         """
         try:
+            if cls.use_ancestry():
+                path = cls.get_ancestry_paths([node_id]).get(int(node_id))
+                if path:
+                    return path
             recursive_t = cls.recs_query()
             return db.session.query(recursive_t).filter(
                 recursive_t.c.cid == str(node_id)).one_or_none()
@@ -893,6 +949,28 @@ class Indexes(object):
         :param pid: pid of the index.
         :return: the list of index.
         """
+        if cls.use_ancestry():
+            rows = db.session.query(
+                Index.id, Index.parent, IndexAncestry.depth
+            ).join(IndexAncestry, IndexAncestry.descendant == Index.id). \
+                filter(IndexAncestry.ancestor == pid). \
+                order_by(IndexAncestry.depth).all()
+            descendants = db.session.query(IndexAncestry.descendant). \
+                filter(IndexAncestry.ancestor == pid)
+            # The table misses some descendants, use the recursive query.
+            incomplete = db.session.query(Index.id).filter(
+                Index.parent.in_(descendants),
+                ~Index.id.in_(descendants)).first()
+            if rows and incomplete is None:
+                paths = {rows[0].id: cls.get_full_path(pid)}
+                for row in rows[1:]:
+                    if row.parent not in paths:
+                        break
+                    paths[row.id] = '{}/{}'.format(paths[row.parent], row.id)
+                else:
+                    return [str(cid) for cid, _path in
+                            sorted(paths.items(), key=lambda x: x[1])]
+
         def recursive_p():
             recursive_p = db.session.query(
                 Index.parent.label("pid"),
@@ -937,6 +1015,70 @@ class Indexes(object):
         q = query.order_by(recursive_t.c.path).all()
         return [str(item.cid) for item in q]
 
+    @classmethod
+    def get_ancestry_paths(cls, index_ids):
+        """
+        Get the path info of indexes from the index_ancestry table.
+
+        The rows have the columns of :meth:`recs_query`.
+
+        :param index_ids: Identifiers of the indexes.
+        :return: dict of the :class:`IndexPath` by index id.
+        """
+        index_ids = {int(i) for i in index_ids}
+        if not index_ids:
+            return {}
+        rows = db.session.query(
+            IndexAncestry.descendant,
+            Index.id,
+            Index.parent,
+            Index.index_name,
+            Index.index_name_english,
+            Index.public_state,
+            Index.public_date,
+            Index.comment,
+            Index.browsing_role,
+            Index.browsing_group,
+            Index.harvest_public_state
+        ).join(Index, Index.id == IndexAncestry.ancestor).filter(
+            IndexAncestry.descendant.in_(index_ids)
+        ).order_by(IndexAncestry.descendant,
+                   IndexAncestry.depth.desc()).all()
+
+        def _join(*names):
+            return None if None in names else '-/-'.join(names)
+
+        result = {}
+        for row in rows:
+            path = result.get(row.descendant)
+            if path is None:
+                if row.parent != 0:
+                    # Not reachable from the root, as in recs_query.
+                    continue
+                name = row.index_name
+                name_en = row.index_name_english
+                lev = 1
+                ids = str(row.id)
+            else:
+                # Same rules as the name column of recs_query.
+                if path.name and row.index_name == '':
+                    name = _join(path.name, row.index_name_english)
+                elif path.name == '' and row.index_name:
+                    name = _join(path.name_en, row.index_name)
+                elif path.name and row.index_name:
+                    name = _join(path.name, row.index_name)
+                else:
+                    name = _join(path.name_en, row.index_name_english)
+                name_en = _join(path.name_en, row.index_name_english)
+                lev = path.lev + 1
+                ids = '{}/{}'.format(path.path, row.id)
+            result[row.descendant] = IndexPath(
+                row.parent, row.id, ids, name, name_en, lev,
+                row.public_state, row.public_date, row.comment,
+                row.browsing_role, row.browsing_group,
+                row.harvest_public_state)
+        return result
+
     @classmethod
     def recs_reverse_query(cls, pid=0):
         """Init select condition of index.
@@ -1660,6 +1802,14 @@ class Indexes(object):
             [list]: parent indexes list.
 
         """
+        if cls.use_ancestry():
+            # the rows of the index columns, as the recursive query
+            index_list = db.session.query(*Index.__table__.columns).join(
+                IndexAncestry, IndexAncestry.ancestor == Index.id
+            ).filter(IndexAncestry.descendant == index_id). \
+                order_by(Index.id).all()
+            if any(index.parent == 0 for index in index_list):
+                return index_list
         # Define a CTE with recursive=True for the top portion of the query
         topq = Index.query.filter(Index.id == index_id)
         topq = topq.cte('cte', recursive=True)
@@ -1679,6 +1829,14 @@ class Indexes(object):
         :param index_id: Identifier of the index.
         :return: path.
         """
+        if cls.use_ancestry():
+            ancestors = db.session.query(
+                IndexAncestry.ancestor, Index.parent
+            ).join(Index, Index.id == IndexAncestry.ancestor).filter(
+                IndexAncestry.descendant == index_id). \
+                order_by(IndexAncestry.depth).all()
+            if ancestors and ancestors[-1].parent == 0:
+                return '/'.join(str(a.ancestor) for a in ancestors)
         recursive_t = cls.recs_reverse_query(index_id)
         qlst = [recursive_t.c.path]
         obj = db.session.query(*qlst).order_by(recursive_t.c.pid).first()
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of WEKO3.
+# Copyright (C) 2017 National Institute of Informatics.
+#
+# WEKO3 is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# WEKO3 is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WEKO3; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+
+"""Command line interface creation kit."""
+import click
+from flask.cli import with_appcontext
+
+from .models import IndexAncestry
+
+
+@click.group()
+def index_tree():
+    """Index tree commands."""
+
+
+@index_tree.command('check-ancestry')
+@click.option('--verbose', '-v', is_flag=True, default=False,
+              help='Print the inconsistent rows.')
+@with_appcontext
+def check_ancestry(verbose):
+    """Check the index_ancestry table against the index table."""
+    result = IndexAncestry.check()
+    if not result['missing'] and not result['extra']:
+        click.secho('index_ancestry is consistent.', fg='green')
+        return
+    click.secho('index_ancestry is inconsistent: {} missing, {} extra '
+                'rows.'.format(len(result['missing']), len(result['extra'])),
+                fg='red')
+    if verbose:
+        for key in ('missing', 'extra'):
+            for row in result[key]:
+                click.echo('{} ancestor={} descendant={} depth={}'.format(
+                    key, *row))
+    click.get_current_context().exit(1)
+
+
+@index_tree.command('rebuild-ancestry')
+@with_appcontext
+def rebuild_ancestry():
+    """Rebuild the index_ancestry table from the index table."""
+    count = IndexAncestry.rebuild()
+    click.secho('index_ancestry rebuilt with {} rows.'.format(count),
+                fg='green')
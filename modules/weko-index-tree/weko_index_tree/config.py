@@ -66,6 +66,26 @@ WEKO_INDEX_TREE_REST_ENDPOINTS = dict(
 WEKO_INDEX_TREE_UPDATED = True
 """For index tree cache."""
 
+WEKO_INDEX_TREE_REDUCED_CACHE_ENABLED = True
+"""Cache the index trees reduced by role, group and more.
+
+Unlike ``WEKO_INDEX_TREE_UPDATED``, the cached trees are refreshed by the
+changes of the indexes, see
+:func:`weko_index_tree.utils.clear_reduced_index_tree_cache`.
+"""
+
+WEKO_INDEX_TREE_REDUCED_CACHE_PREFIX = 'index_tree_reduced_'
+"""Cache key prefix of the index trees reduced by role, group and more."""
+
+WEKO_INDEX_TREE_REDUCED_CACHE_GENERATION = 'index_tree_reduced_generation'
+"""Cache key of the generation of the reduced index trees."""
+
+WEKO_INDEX_TREE_REDUCED_CACHE_TIMEOUT = 600
+"""Timeout (seconds) of the reduced index trees."""
+
+WEKO_INDEX_TREE_HARVEST_STATE_GENERATION = 'index_harvest_state_generation'
+"""Cache key of the generation of the harvest state of the indexes."""
+
 WEKO_INDEX_TREE_RSS_DEFAULT_INDEX_ID = 0
 """Default number of the index_id in RSS."""
 
@@ -92,3 +112,6 @@ WEKO_INDEX_TREE_STATE_TIME_LIFE_SECONDS = 60
 
 WEKO_INDEX_TREE_INDEX_LOCK_KEY_PREFIX = "lock_index_"
 """Index lock key prefix."""
+
+WEKO_INDEX_TREE_USE_ANCESTRY = True
+"""Use the index_ancestry table for the path lookups of the index tree."""
@@ -20,11 +20,13 @@
 
 """Models for weko-index-tree."""
 
+from collections import defaultdict
 from datetime import datetime
 
 from flask import current_app
 from invenio_db import db
 from invenio_i18n.ext import current_i18n
+from sqlalchemy import and_, or_, select
 from sqlalchemy.dialects import mysql, postgresql
 from sqlalchemy_utils.types import JSONType
 from weko_records.models import Timestamp
@@ -303,5 +305,158 @@ class IndexStyle(db.Model, Timestamp):
         return
 
 
+class IndexAncestry(db.Model):
+    """
+    Closure table of the index tree.
+
+    Hold one row per (ancestor, descendant) pair of the indexes reachable
+    from the root, including the row of every index to itself with
+    ``depth`` 0, so that ancestor, descendant and path lookups do not need
+    a recursive query. The rows are maintained by
+    :class:`weko_index_tree.api.Indexes`.
+    """
+
+    __tablename__ = 'index_ancestry'
+
+    __table_args__ = (
+        db.Index('ix_index_ancestry_descendant', 'descendant', 'depth'),
+    )
+
+    ancestor = db.Column(db.BigInteger, primary_key=True)
+    """Identifier of the ancestor index."""
+
+    descendant = db.Column(db.BigInteger, primary_key=True)
+    """Identifier of the descendant index."""
+
+    depth = db.Column(db.Integer, nullable=False, default=0)
+    """Distance between the ancestor and the descendant."""
+
+    @classmethod
+    def add_node(cls, index_id, parent):
+        """
+        Add the rows of a new index.
+
+        :param index_id: Identifier of the new index.
+        :param parent: Identifier of its parent index, 0 for the root.
+        """
+        table = cls.__table__
+        db.session.execute(table.insert().values(
+            ancestor=index_id, descendant=index_id, depth=0))
+        db.session.execute(table.insert().from_select(
+            ['ancestor', 'descendant', 'depth'],
+            select([table.c.ancestor, db.literal(index_id, db.BigInteger),
+                    table.c.depth + 1]).where(table.c.descendant == parent)))
+
+    @classmethod
+    def move_subtree(cls, index_id, parent):
+        """
+        Move an index and its descendants under another parent.
+
+        :param index_id: Identifier of the moved index.
+        :param parent: Identifier of the new parent index, 0 for the root.
+        """
+        table = cls.__table__
+        sub = table.alias('sub')
+        anc = table.alias('anc')
+        subtree = select([sub.c.descendant]).where(sub.c.ancestor == index_id)
+        db.session.execute(table.delete().where(and_(
+            table.c.descendant.in_(subtree),
+            ~table.c.ancestor.in_(subtree))))
+        db.session.execute(table.insert().from_select(
+            ['ancestor', 'descendant', 'depth'],
+            select([anc.c.ancestor, sub.c.descendant,
+                    anc.c.depth + sub.c.depth + 1]).where(and_(
+                        anc.c.descendant == parent,
+                        sub.c.ancestor == index_id))))
+
+    @classmethod
+    def remove_node(cls, index_id):
+        """
+        Remove an index whose children are moved to its parent.
+
+        :param index_id: Identifier of the removed index.
+        """
+        table = cls.__table__
+        sub = table.alias('sub')
+        anc = table.alias('anc')
+        db.session.execute(table.update().where(and_(
+            table.c.ancestor.in_(select([anc.c.ancestor]).where(and_(
+                anc.c.descendant == index_id, anc.c.depth > 0))),
+            table.c.descendant.in_(select([sub.c.descendant]).where(and_(
+                sub.c.ancestor == index_id, sub.c.depth > 0))))).values(
+                    depth=table.c.depth - 1))
+        db.session.execute(table.delete().where(or_(
+            table.c.ancestor == index_id, table.c.descendant == index_id)))
+
+    @classmethod
+    def remove_nodes(cls, index_ids):
+        """
+        Remove the rows of deleted indexes.
+
+        :param index_ids: Identifiers of the deleted indexes.
+        """
+        cls.query.filter(cls.descendant.in_(index_ids)). \
+            delete(synchronize_session=False)
+
+    @classmethod
+    def compute(cls):
+        """
+        Compute the expected rows from the index table.
+
+        :return: The list of (ancestor, descendant, depth) tuples.
+        """
+        children = defaultdict(list)
+        for index_id, parent in db.session.query(Index.id, Index.parent):
+            children[parent].append(index_id)
+        rows = []
+        stack = [(index_id, ()) for index_id in children.get(0, [])]
+        while stack:
+            index_id, ancestors = stack.pop()
+            ancestors = (index_id,) + ancestors
+            rows.extend((ancestor, index_id, depth)
+                        for depth, ancestor in enumerate(ancestors))
+            stack.extend((child, ancestors)
+                         for child in children.get(index_id, []))
+        return rows
+
+    @classmethod
+    def check(cls):
+        """
+        Compare the table with the index table.
+
+        :return: dict of the ``missing`` and ``extra`` rows.
+        """
+        expected = set(cls.compute())
+        actual = set(db.session.query(
+            cls.ancestor, cls.descendant, cls.depth))
+        return {
+            'missing': sorted(expected - actual),
+            'extra': sorted(actual - expected)
+        }
+
+    @classmethod
+    def rebuild(cls, chunk_size=1000):
+        """
+        Rebuild the table from the index table.
+
+        :param chunk_size: Number of rows inserted per statement.
+        :return: Number of rows.
+        """
+        rows = cls.compute()
+        try:
+            with db.session.begin_nested():
+                cls.query.delete(synchronize_session=False)
+                for i in range(0, len(rows), chunk_size):
+                    db.session.execute(cls.__table__.insert(), [
+                        dict(ancestor=a, descendant=d, depth=depth)
+                        for a, d, depth in rows[i:i + chunk_size]])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return len(rows)
+
+
 __all__ = ('Index',
+           'IndexAncestry',
            'IndexStyle',)
@@ -19,6 +19,8 @@
 # MA 02111-1307, USA.
 
 """Module of weko-index-tree utils."""
+import hashlib
+import math
 import os
 from datetime import date, datetime
 from functools import wraps
@@ -27,7 +29,7 @@ from operator import itemgetter
 from elasticsearch.exceptions import NotFoundError
 from elasticsearch_dsl.query import Bool, Exists, Q, QueryString
 from flask import Markup, current_app, session, json
-from flask_babelex import get_locale
+from flask_babelex import get_locale, get_timezone
 from flask_babelex import gettext as _
 from flask_babelex import to_user_timezone, to_utc
 from flask_login import current_user
@@ -80,6 +82,107 @@ def cached_index_tree_json(timeout=50, key_prefix='index_tree_json'):
     return caching
 
 
+def get_reduced_index_tree_cache_key(pid=0, more_ids=None, ignore_more=False):
+    """Get the cache key of the index tree reduced for the current user.
+
+    Users with the same language, timezone, roles and groups get the same
+    tree from :func:`reset_tree`, so they share the key.
+    """
+    roles = get_user_roles(is_super_role=True)
+    key = json.dumps([
+        pid,
+        current_i18n.language,
+        str(get_timezone()),
+        roles[0],
+        sorted(roles[1]) if roles[1] is not None else None,
+        sorted(get_user_groups()),
+        sorted(str(x) for x in more_ids or []),
+        ignore_more])
+    generation = current_cache.get(
+        current_app.config['WEKO_INDEX_TREE_REDUCED_CACHE_GENERATION']) or 0
+    return '{}{}_{}'.format(
+        current_app.config['WEKO_INDEX_TREE_REDUCED_CACHE_PREFIX'],
+        generation, hashlib.md5(key.encode('utf-8')).hexdigest())
+
+
+def get_reduced_index_tree_cache_timeout(tree):
+    """Get the timeout of a reduced index tree.
+
+    The timeout never exceeds the time left until the next public_date of
+    the tree, since the index becomes visible at that time.
+    """
+    timeout = current_app.config['WEKO_INDEX_TREE_REDUCED_CACHE_TIMEOUT']
+    now = datetime.utcnow()
+    nodes = list(tree or [])
+    while nodes:
+        node = nodes.pop()
+        if not isinstance(node, dict):
+            continue
+        public_date = node.get('public_date')
+        if isinstance(public_date, str):
+            public_date = str_to_datetime(
+                public_date[:19], "%Y-%m-%dT%H:%M:%S")
+        if isinstance(public_date, datetime):
+            left = (to_utc(public_date) - now).total_seconds()
+            if left > 0:
+                timeout = min(timeout, int(math.ceil(left)))
+        nodes.extend(node.get('children') or [])
+    return timeout
+
+
+def get_reduced_index_tree(get_tree, pid=0, more_ids=None,
+                           ignore_more=False):
+    """Get the index tree reduced for the current user.
+
+    With ``WEKO_INDEX_TREE_REDUCED_CACHE_ENABLED``, the result of
+    :func:`reset_tree` is cached per class of user and refreshed by
+    :func:`clear_reduced_index_tree_cache`.
+
+    :param get_tree: Function returning the raw tree of ``pid``.
+    :param pid: Identifier of the root index.
+    :param more_ids: Identifiers of the expanded 'more' indexes.
+    :param ignore_more: Do not reduce the tree by 'more'.
+    :return: The list of index tree.
+    """
+    if not current_app.config['WEKO_INDEX_TREE_REDUCED_CACHE_ENABLED']:
+        tree = get_tree(pid)
+        reset_tree(tree, more_ids=more_ids, ignore_more=ignore_more)
+        return tree
+    key = get_reduced_index_tree_cache_key(pid, more_ids, ignore_more)
+    tree = current_cache.get(key)
+    if tree is not None:
+        return tree
+    tree = get_tree(pid)
+    timeout = get_reduced_index_tree_cache_timeout(tree)
+    reset_tree(tree, more_ids=more_ids, ignore_more=ignore_more)
+    current_cache.set(key, tree, timeout=timeout)
+    return tree
+
+
+def clear_reduced_index_tree_cache():
+    """Invalidate the reduced index trees of all users."""
+    current_cache.set(
+        current_app.config['WEKO_INDEX_TREE_REDUCED_CACHE_GENERATION'],
+        datetime.utcnow().strftime('%Y%m%d%H%M%S%f'), timeout=0)
+
+
+def get_harvest_state_generation():
+    """Get the generation of the harvest state of the indexes.
+
+    It changes whenever the public state, harvest public state, browsing
+    role, public date or parent of an index may have changed.
+    """
+    return current_cache.get(
+        current_app.config['WEKO_INDEX_TREE_HARVEST_STATE_GENERATION']) or 0
+
+
+def clear_harvest_state_cache():
+    """Invalidate the harvest state of the indexes."""
+    current_cache.set(
+        current_app.config['WEKO_INDEX_TREE_HARVEST_STATE_GENERATION'],
+        datetime.utcnow().strftime('%Y%m%d%H%M%S%f'), timeout=0)
+
+
 def reset_tree(tree, path=None, more_ids=None, ignore_more=False):
     """
     Reset the state of checked.
@@ -1046,6 +1149,7 @@ def save_index_trees_to_redis(tree, lang=None):
         redis.put("index_tree_view_" + os.environ.get('INVENIO_WEB_HOST_NAME') + "_" + lang,v)
     except ConnectionError:
         current_app.logger.error("Fail save index_tree to redis")
+    clear_reduced_index_tree_cache()
 
 def delete_index_trees_from_redis(lang):
     """delete index_tree from redis
@@ -1054,6 +1158,7 @@ def delete_index_trees_from_redis(lang):
     key = "index_tree_view_" + os.environ.get('INVENIO_WEB_HOST_NAME') + "_" + lang
     if redis.redis.exists(key):
         redis.delete(key)
+    clear_reduced_index_tree_cache()
 
 def str_to_datetime(str_dt, format):
     try:
@@ -1,7 +1,11 @@
+import os
+import time
+
 import pytest
 from mock import MagicMock, patch
 from six import BytesIO
-from weko_records_ui.pdf import get_east_asian_width_count,make_combined_pdf
+from weko_records_ui.pdf import get_east_asian_width_count,make_combined_pdf, \
+    evict_coverpage_cache, get_coverpage_cache_dir, write_combined_pdf
 from invenio_files_rest.models import Bucket, Location, ObjectVersion
 
 # def get_east_asian_width_count(text):
@@ -60,4 +64,58 @@ def test_make_combined_pdf(app,records,itemtypes,pdfcoverpagesetting):
                 }
                 
                 with patch("weko_records_ui.pdf.tempfile.gettempdir", return_value="tests/data"):
-                    assert make_combined_pdf(record.pid,data1,obj,None).status_code == 200
\ No newline at end of file
+                    assert make_combined_pdf(record.pid,data1,obj,None).status_code == 200
+
+
+# .tox/c1/bin/pytest --cov=weko_records_ui tests/test_pdf.py::test_get_coverpage_cache_dir -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/weko-records-ui/.tox/c1/tmp
+def test_get_coverpage_cache_dir(app,tmp_path):
+    app.config['WEKO_RECORDS_UI_COVERPAGE_CACHE_DIR'] = None
+    with patch("weko_records_ui.pdf.tempfile.gettempdir", return_value="/tmp"):
+        # not the comb_pdfs directories deleted by delete_tmp_dir.py
+        assert get_coverpage_cache_dir() == "/tmp/weko_coverpage_cache"
+    app.config['WEKO_RECORDS_UI_COVERPAGE_CACHE_DIR'] = str(tmp_path)
+    assert get_coverpage_cache_dir() == str(tmp_path)
+
+
+# .tox/c1/bin/pytest --cov=weko_records_ui tests/test_pdf.py::test_make_combined_pdf_cache -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/weko-records-ui/.tox/c1/tmp
+def test_make_combined_pdf_cache(app,records,itemtypes,pdfcoverpagesetting,tmp_path):
+    indexer, results = records
+    record = results[0]["record"]
+    obj = results[0]['obj']
+    app.config['WEKO_RECORDS_UI_COVERPAGE_CACHE_DIR'] = str(tmp_path)
+    with app.test_request_context(headers=[("Accept-Language", "en")]):
+        with patch("weko_records_ui.pdf.write_combined_pdf", wraps=write_combined_pdf) as mock_write:
+            res = make_combined_pdf(record.pid,record['item_1617605131499'],obj,None)
+            assert res.status_code==200
+            etag = res.get_etag()[0]
+            res = make_combined_pdf(record.pid,record['item_1617605131499'],obj,None)
+            assert res.status_code==200
+            assert res.get_etag()[0] == etag
+            assert mock_write.call_count == 1
+        assert len([f for f in os.listdir(str(tmp_path)) if f.endswith(".pdf")]) == 1
+
+    with app.test_request_context(headers=[("Accept-Language", "en"), ("If-None-Match", '"{}"'.format(etag))]):
+        res = make_combined_pdf(record.pid,record['item_1617605131499'],obj,None)
+        assert res.status_code==304
+
+    with app.test_request_context(headers=[("Accept-Language", "ja")]):
+        res = make_combined_pdf(record.pid,record['item_1617605131499'],obj,None)
+        assert res.status_code==200
+        assert res.get_etag()[0] != etag
+    assert len([f for f in os.listdir(str(tmp_path)) if f.endswith(".pdf")]) == 2
+
+
+# def evict_coverpage_cache(cache_dir):
+# .tox/c1/bin/pytest --cov=weko_records_ui tests/test_pdf.py::test_evict_coverpage_cache -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/weko-records-ui/.tox/c1/tmp
+def test_evict_coverpage_cache(app,tmp_path):
+    now = time.time()
+    for name, age in (("old.pdf", 100), ("a.pdf", 30), ("b.pdf", 20), ("c.pdf", 10), ("lock_ab", 100)):
+        path = tmp_path / name
+        path.write_bytes(b"x" * 10)
+        os.utime(str(path), (now - age, now - age))
+    app.config.update(WEKO_RECORDS_UI_COVERPAGE_CACHE_MAX_AGE=50,
+                      WEKO_RECORDS_UI_COVERPAGE_CACHE_MAX_SIZE=20)
+    with app.app_context():
+        evict_coverpage_cache(str(tmp_path))
+    assert sorted(os.listdir(str(tmp_path))) == ["b.pdf", "c.pdf", "lock_ab"]
+
@@ -58,6 +58,15 @@ def test_preview(app,records):
     with app.test_request_context():
         with patch("flask.templating._render", return_value=""):
             assert preview(record.pid,record,template)==""
+
+    # converted in the background
+    with app.test_request_context('/record/{}/file_preview/{}'.format(recid.pid_value,filename)):
+        with patch("weko_records_ui.preview.get_preview_pdf_status", return_value="preparing"):
+            with patch("flask.templating._render", return_value="preparing"):
+                assert preview(record.pid,record,template)==("preparing", 202)
+        with patch("weko_records_ui.preview.get_preview_pdf_status", return_value="failed"):
+            with patch("weko_records_ui.preview.default.preview", return_value="default"):
+                assert preview(record.pid,record,template)=="default"
     
     indexer, results = records
     record = results[2]['record']
@@ -650,3 +650,18 @@ WEKO_RECORDS_UI_DISPLAY_RESOURCE_TYPE = False
 
 WEKO_RECORDS_UI_DISPLAY_ITEM_TYPE = True
 """ Display item type name on item detail. """
+
+WEKO_RECORDS_UI_COVERPAGE_CACHE_DIR = None
+"""Directory of the cached cover-page-combined PDF files.
+
+``None`` for ``weko_coverpage_cache`` in the temporary directory.
+"""
+
+WEKO_RECORDS_UI_COVERPAGE_CACHE_MAX_SIZE = 2 * 1024 * 1024 * 1024
+"""Maximum size (bytes) of the cached cover-page-combined PDF files."""
+
+WEKO_RECORDS_UI_COVERPAGE_CACHE_MAX_AGE = 7 * 24 * 60 * 60
+"""Seconds a cached cover-page-combined PDF file is kept unused."""
+
+WEKO_RECORDS_UI_COVERPAGE_CACHE_LOCK_TIMEOUT = 120
+"""Seconds to wait for the generation of a PDF file by another download."""
@@ -31,6 +31,7 @@ from flask_babelex import gettext as _
 from flask_login import current_user
 from invenio_db import db
 from invenio_files_rest import signals
+from invenio_files_rest.convert import is_convertible_to_pdf
 from invenio_files_rest.models import FileInstance
 from invenio_files_rest.views import ObjectResource
 from invenio_records_files.utils import record_file_factory
@@ -286,12 +287,8 @@ def _download_file(file_obj, is_preview, lang, obj, pid, record):
         can_download_original_pdf = check_original_pdf_download_permission(
             record)
 
-        convert_to_pdf = False
-        if is_preview \
-            and ('msword' in file_obj.mimetype
-                 or 'vnd.ms' in file_obj.mimetype
-                 or 'vnd.openxmlformats' in file_obj.mimetype):
-            convert_to_pdf = True
+        convert_to_pdf = is_preview \
+            and is_convertible_to_pdf(file_obj.mimetype)
 
         # if not pdf or cover page disabled: Download directly
         # if pdf and cover page enabled and has original in query param: check
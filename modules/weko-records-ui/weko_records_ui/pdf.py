@@ -21,16 +21,21 @@
 """Utilities for making the PDF cover page and newly combined PDFs."""
 
 import errno
+import fcntl
+import hashlib
 import io
 import json
 import os
 import tempfile
+import time
 import unicodedata
+from contextlib import contextmanager
 from datetime import datetime
 
-from flask import current_app, flash, redirect, request, send_file
+from flask import current_app, flash, redirect, request
 from flask_babelex import gettext as _
 from fpdf import FPDF
+from invenio_files_rest.helpers import send_stream
 from invenio_files_rest.views import ObjectResource
 from invenio_i18n.ext import current_i18n
 from invenio_pidrelations.contrib.versioning import PIDVersioning
@@ -63,15 +68,186 @@ def get_east_asian_width_count(text):
     return count
 
 
+def get_coverpage_cache_dir():
+    """Get the directory of the cached cover-page-combined PDF files.
+
+    The default directory is kept by ``scripts/delete_tmp_dir.py``, which
+    deletes the ``comb_pdfs`` directories of the former versions.
+    """
+    return current_app.config['WEKO_RECORDS_UI_COVERPAGE_CACHE_DIR'] \
+        or os.path.join(tempfile.gettempdir(), 'weko_coverpage_cache')
+
+
+def get_coverpage_cache_key(pid, obj):
+    """Get the key of a cover-page-combined PDF file in the cache.
+
+    The file depends on the file version, the record revision, the
+    language, the cover page settings and the settings displayed in it.
+
+    :param pid: PID object
+    :param obj: File object
+    :return: the hexadecimal digest of the key
+    """
+    record = WekoRecord.get_record_by_pid(pid.pid_value)
+    settings = PDFCoverPageSettings.find(1)
+    key = [
+        str(obj.version_id),
+        pid.pid_value,
+        record.revision_id,
+        current_i18n.language,
+        str(settings.updated_at) if settings else None,
+        bool(item_setting_show_email()),
+        request.host_url,
+    ]
+    return hashlib.sha256(
+        json.dumps(key, default=str).encode('utf-8')).hexdigest()
+
+
+@contextmanager
+def coverpage_cache_lock(cache_dir, digest):
+    """Lock the generation of a cover-page-combined PDF file.
+
+    The lock is shared by the processes of the host, so that concurrent
+    downloads of a file not cached yet only generate it once. The keys are
+    spread over 256 lock files.
+
+    :param cache_dir: the cache directory
+    :param digest: the key returned by :func:`get_coverpage_cache_key`
+    :return: True if the lock is acquired, False after
+        ``WEKO_RECORDS_UI_COVERPAGE_CACHE_LOCK_TIMEOUT`` seconds.
+    """
+    timeout = current_app.config[
+        'WEKO_RECORDS_UI_COVERPAGE_CACHE_LOCK_TIMEOUT']
+    with open(os.path.join(cache_dir, 'lock_' + digest[:2]), 'a') as f:
+        deadline = time.time() + timeout
+        locked = False
+        while True:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                locked = True
+                break
+            except BlockingIOError:
+                if time.time() >= deadline:
+                    break
+                time.sleep(0.1)
+        try:
+            yield locked
+        finally:
+            if locked:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def evict_coverpage_cache(cache_dir):
+    """Remove the old cover-page-combined PDF files of the cache.
+
+    The files not downloaded for ``WEKO_RECORDS_UI_COVERPAGE_CACHE_MAX_AGE``
+    seconds are removed, then the least recently downloaded ones until the
+    cache is smaller than ``WEKO_RECORDS_UI_COVERPAGE_CACHE_MAX_SIZE``.
+
+    :param cache_dir: the cache directory
+    """
+    max_age = current_app.config['WEKO_RECORDS_UI_COVERPAGE_CACHE_MAX_AGE']
+    max_size = current_app.config['WEKO_RECORDS_UI_COVERPAGE_CACHE_MAX_SIZE']
+    now = time.time()
+    files = []
+    for name in os.listdir(cache_dir):
+        if name.startswith('lock_'):
+            continue
+        path = os.path.join(cache_dir, name)
+        try:
+            stat = os.stat(path)
+            if now - stat.st_atime > max_age:
+                os.remove(path)
+            elif name.endswith('.pdf'):
+                files.append((stat.st_atime, stat.st_size, path))
+        except OSError:
+            # removed by another process
+            continue
+    size = sum(f[1] for f in files)
+    for _atime, file_size, path in sorted(files):
+        if size <= max_size:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        size -= file_size
+
+
 def make_combined_pdf(pid, fileobj, obj, lang_user):
     """Make the cover-page-combined PDF file.
 
+    The files are cached by :func:`get_coverpage_cache_key`, a cached file
+    is sent as is.
+
     :param pid: PID object
     :param fileobj: File metadata
     :param obj: File object
     :param lang_user: LANGUAGE of access user
     :return: cover-page-combined PDF file object
     """
+    try:
+        combined_filename = 'CV_' + datetime.now().strftime('%Y%m%d') + '_' + \
+                            fileobj['filename']
+    except (KeyError, IndexError):
+        record = WekoRecord.get_record_by_pid(pid.pid_value)
+        combined_filename = 'CV_' + record.get('item_title', '') + '.pdf'
+
+    cache_dir = get_coverpage_cache_dir()
+    os.makedirs(cache_dir, exist_ok=True)
+    digest = get_coverpage_cache_key(pid, obj)
+    combined_filepath = os.path.join(cache_dir, digest + '.pdf')
+
+    def open_cached():
+        try:
+            return open(combined_filepath, 'rb')
+        except FileNotFoundError:
+            return None
+
+    fp = open_cached()
+    if fp is None:
+        with coverpage_cache_lock(cache_dir, digest):
+            # generated by another download while waiting for the lock
+            fp = open_cached()
+            if fp is None:
+                fd, tmp_filepath = tempfile.mkstemp(
+                    suffix='.tmp', dir=cache_dir)
+                os.close(fd)
+                try:
+                    res = write_combined_pdf(pid, fileobj, obj, lang_user,
+                                             tmp_filepath)
+                    if res is not None:
+                        return res
+                    os.replace(tmp_filepath, combined_filepath)
+                finally:
+                    if os.path.exists(tmp_filepath):
+                        os.remove(tmp_filepath)
+                fp = open(combined_filepath, 'rb')
+        # the file stays readable if it is evicted
+        evict_coverpage_cache(cache_dir)
+
+    stat = os.fstat(fp.fileno())
+    # the access time orders the eviction
+    try:
+        os.utime(combined_filepath, (time.time(), stat.st_mtime))
+    except OSError:
+        pass
+    return send_stream(
+        fp, combined_filename, stat.st_size, stat.st_mtime,
+        mimetype='application/pdf', as_attachment=True, etag=digest,
+        trusted=True)
+
+
+def write_combined_pdf(pid, fileobj, obj, lang_user, combined_filepath):
+    """Write the cover-page-combined PDF file.
+
+    :param pid: PID object
+    :param fileobj: File metadata
+    :param obj: File object
+    :param lang_user: LANGUAGE of access user
+    :param combined_filepath: path of the file to write
+    :return: None, or the response to send instead of the combined file
+    """
     DPI = 96
     MM_IN_INCH = 25.4
     # tweak these values (in pixels)
@@ -639,19 +815,7 @@ def make_combined_pdf(pid, fileobj, obj, lang_user):
         existing_page = existing_pages.getPage(page_num)
         combined_pages.addPage(existing_page)
 
-    # Download the newly generated combined PDF file
-    try:
-        combined_filename = 'CV_' + datetime.now().strftime('%Y%m%d') + '_' + \
-                            fileobj['filename']
-    except (KeyError, IndexError):
-        combined_filename = 'CV_' + title + '.pdf'
-
-    dir_path = tempfile.gettempdir() + '/comb_pdfs/'
-
-    if not os.path.isdir(dir_path):
-        os.mkdir(dir_path)
-
-    combined_filepath = dir_path + '{}.pdf'.format(combined_filename)
+    dir_path = os.path.dirname(combined_filepath)
 
     with open(combined_filepath, 'wb') as f:
         try:
@@ -706,10 +870,4 @@ def make_combined_pdf(pid, fileobj, obj, lang_user):
                 )
             )
 
-    return send_file(
-        combined_filepath,
-        as_attachment=True,
-        attachment_filename=combined_filename,
-        mimetype='application/pdf',
-        cache_timeout=-1
-    )
+    return None
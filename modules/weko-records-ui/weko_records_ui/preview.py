@@ -22,6 +22,8 @@
 
 import cchardet as chardet
 from flask import abort, current_app, render_template, request
+from invenio_files_rest.convert import PREVIEW_PDF_FAILED, \
+    PREVIEW_PDF_PREPARING, get_preview_pdf_status
 from invenio_previewer.api import PreviewFile
 from invenio_previewer.extensions import default
 from invenio_previewer.extensions.zip import make_tree
@@ -71,6 +73,17 @@ def preview(pid, record, template=None, **kwargs):
 
     if fileobj.has_extensions('.doc', '.docx', '.ppt',
                               '.pptx', '.xls', '.xlsx'):
+        # the files are converted in the background
+        status = get_preview_pdf_status(fileobj.file.file.id)
+        if status == PREVIEW_PDF_PREPARING:
+            return render_template(
+                'invenio_previewer/preparing.html',
+                file=fileobj,
+                retry_after=current_app.config[
+                    'FILES_REST_PDF_PREPARING_RETRY_AFTER'],
+            ), 202
+        if status == PREVIEW_PDF_FAILED:
+            return default.preview(fileobj)
         for plugin in current_previewer.iter_previewers(previewers=['pdfjs']):
             try:
                 return plugin.preview(fileobj)
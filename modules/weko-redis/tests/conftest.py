@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of WEKO3.
+# Copyright (C) 2017 National Institute of Informatics.
+#
+# WEKO3 is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# WEKO3 is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WEKO3; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+
+"""Pytest configuration for weko-redis.
+
+The clients are created without connecting, no Redis server is used.
+"""
+
+import pytest
+from flask import Flask
+
+from weko_redis import redis as weko_redis
+
+
+@pytest.fixture()
+def app():
+    """Flask application using a Redis server."""
+    app_ = Flask('testapp')
+    app_.config.update(
+        TESTING=True,
+        CACHE_TYPE='redis',
+        CACHE_REDIS_HOST='localhost',
+        REDIS_PORT='6379',
+        CACHE_REDIS_SENTINELS=[('localhost', 26379)],
+        CACHE_REDIS_SENTINEL_MASTER='mymaster',
+    )
+    with app_.app_context():
+        yield app_
+
+
+@pytest.fixture(autouse=True)
+def clients():
+    """Reset the pooled clients of the process."""
+    weko_redis._clients.clear()
+    yield weko_redis._clients
+    weko_redis._clients.clear()
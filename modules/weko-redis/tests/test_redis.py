@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of WEKO3.
+# Copyright (C) 2017 National Institute of Informatics.
+#
+# WEKO3 is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# WEKO3 is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WEKO3; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+
+"""Module tests."""
+
+import time
+
+import pytest
+import redis
+from mock import patch
+from redis import sentinel
+from simplekv.memory.redisstore import RedisStore
+
+from weko_redis import RedisConnection, get_pool_metrics
+
+# .tox/c1/bin/pytest --cov=weko_redis tests/test_redis.py -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/weko-redis/.tox/c1/tmp
+
+
+# def connection(self, db, kv = False):
+# .tox/c1/bin/pytest --cov=weko_redis tests/test_redis.py::test_connection -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/weko-redis/.tox/c1/tmp
+def test_connection(app, clients):
+    client = RedisConnection().connection(db=0)
+    assert isinstance(client, redis.StrictRedis)
+    pool = client.connection_pool
+    assert isinstance(pool, redis.BlockingConnectionPool)
+    assert pool.max_connections == app.config.get(
+        'WEKO_REDIS_MAX_CONNECTIONS', 50)
+
+    # reused by (type, location, db)
+    assert RedisConnection().connection(db=0) is client
+    store = RedisConnection().connection(db=0, kv=True)
+    assert isinstance(store, RedisStore)
+    assert store.redis is client
+    assert RedisConnection().connection(db=0, kv=True) is store
+    assert RedisConnection().connection(db=1) is not client
+    app.config['CACHE_REDIS_HOST'] = 'otherhost'
+    assert RedisConnection().connection(db=0) is not client
+    assert len(clients) == 3
+
+    app.config['CACHE_TYPE'] = 'redissentinel'
+    client = RedisConnection().connection(db=0)
+    assert isinstance(client.connection_pool,
+                      sentinel.SentinelConnectionPool)
+    assert client.connection_pool.check_connection
+    assert RedisConnection().connection(db=0) is client
+    assert len(clients) == 4
+
+    app.config['CACHE_TYPE'] = 'simple'
+    with pytest.raises(ValueError):
+        RedisConnection().connection(db=0)
+
+
+# def check(self):
+# .tox/c1/bin/pytest --cov=weko_redis tests/test_redis.py::test_check -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/weko-redis/.tox/c1/tmp
+def test_check(app, clients):
+    app.config['WEKO_REDIS_HEALTH_CHECK_INTERVAL'] = 30
+    client = RedisConnection().connection(db=0)
+    pooled = list(clients.values())[0]
+
+    # at most once per interval
+    with patch.object(client, 'ping') as mock_ping:
+        RedisConnection().connection(db=0)
+        mock_ping.assert_not_called()
+        pooled.checked_at = time.time() - 31
+        RedisConnection().connection(db=0)
+        mock_ping.assert_called_once()
+    assert pooled.health_check_failures == 0
+
+    # the pool failing the check is disconnected
+    pooled.checked_at = time.time() - 31
+    with patch.object(client, 'ping',
+                      side_effect=redis.ConnectionError('test_error')):
+        with patch.object(client.connection_pool, 'disconnect') \
+                as mock_disconnect:
+            assert RedisConnection().connection(db=0) is client
+            mock_disconnect.assert_called_once()
+    assert pooled.health_check_failures == 1
+
+    # disabled
+    app.config['WEKO_REDIS_HEALTH_CHECK_INTERVAL'] = 0
+    pooled.checked_at = 0
+    with patch.object(client, 'ping') as mock_ping:
+        RedisConnection().connection(db=0)
+        mock_ping.assert_not_called()
+
+
+# def check(self):
+# .tox/c1/bin/pytest --cov=weko_redis tests/test_redis.py::test_check_sentinel -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/weko-redis/.tox/c1/tmp
+def test_check_sentinel(app, clients):
+    app.config.update(CACHE_TYPE='redissentinel',
+                      WEKO_REDIS_HEALTH_CHECK_INTERVAL=30)
+    client = RedisConnection().connection(db=0)
+    pooled = list(clients.values())[0]
+    pool = client.connection_pool
+
+    # the master is discovered again
+    pooled.checked_at = time.time() - 31
+    with patch.object(pool, 'get_master_address',
+                      return_value=('localhost', 6379)) as mock_master, \
+            patch.object(client, 'ping') as mock_ping:
+        RedisConnection().connection(db=0)
+        mock_master.assert_called_once()
+        mock_ping.assert_not_called()
+    assert pooled.health_check_failures == 0
+
+    pooled.checked_at = time.time() - 31
+    with patch.object(pool, 'get_master_address',
+                      side_effect=sentinel.MasterNotFoundError('test_error')):
+        with patch.object(pool, 'disconnect') as mock_disconnect:
+            RedisConnection().connection(db=0)
+            mock_disconnect.assert_called_once()
+    assert pooled.health_check_failures == 1
+
+
+# def get_pool_metrics():
+# .tox/c1/bin/pytest --cov=weko_redis tests/test_redis.py::test_get_pool_metrics -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/weko-redis/.tox/c1/tmp
+def test_get_pool_metrics(app, clients):
+    assert get_pool_metrics() == []
+    app.config['WEKO_REDIS_MAX_CONNECTIONS'] = 3
+    client = RedisConnection().connection(db=0)
+    RedisConnection().connection(db=0)
+    pool = client.connection_pool
+    with patch.object(redis.Connection, 'connect'):
+        conn1 = pool.get_connection('GET')
+        conn2 = pool.get_connection('GET')
+        pool.release(conn2)
+        assert get_pool_metrics() == [{
+            'type': 'redis',
+            'location': ('localhost', '6379'),
+            'db': 0,
+            'created_connections': 2,
+            'in_use_connections': 1,
+            'available_connections': 1,
+            'max_connections': 3,
+            'hits': 2,
+            'health_check_failures': 0,
+        }]
+        pool.release(conn1)
+
+    app.config['CACHE_TYPE'] = 'redissentinel'
+    client = RedisConnection().connection(db=1)
+    pool = client.connection_pool
+    with patch.object(pool, 'get_master_address',
+                      return_value=('localhost', 6379)), \
+            patch.object(redis.Connection, 'connect'):
+        conn = pool.get_connection('GET')
+        metrics = [m for m in get_pool_metrics() if m['db'] == 1]
+        assert metrics == [{
+            'type': 'redissentinel',
+            'location': ((('localhost', 26379),), 'mymaster'),
+            'db': 1,
+            'created_connections': 1,
+            'in_use_connections': 1,
+            'available_connections': 0,
+            'max_connections': 3,
+            'hits': 1,
+            'health_check_failures': 0,
+        }]
+        pool.release(conn)
@@ -20,7 +20,7 @@
 
 """Redis Connection."""
 
-from .redis import RedisConnection
+from .redis import RedisConnection, get_pool_metrics
 from .version import __version__
 
-__all__ = ('__version__')
\ No newline at end of file
+__all__ = ('__version__', 'RedisConnection', 'get_pool_metrics')
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of WEKO3.
+# Copyright (C) 2017 National Institute of Informatics.
+#
+# WEKO3 is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# WEKO3 is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WEKO3; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+
+"""Default configuration of the Redis connections.
+
+The values can be overridden in the application configuration.
+"""
+
+WEKO_REDIS_MAX_CONNECTIONS = 50
+"""Maximum number of connections of the pool of each database."""
+
+WEKO_REDIS_POOL_TIMEOUT = 20
+"""Seconds to wait for a free connection when the pool is full.
+
+Only without Sentinel: a full Sentinel pool raises a ConnectionError.
+"""
+
+WEKO_REDIS_SOCKET_CONNECT_TIMEOUT = 5
+"""Seconds to wait for a new connection to be established."""
+
+WEKO_REDIS_HEALTH_CHECK_INTERVAL = 30
+"""Minimum seconds between two health checks of a pool, 0 to disable."""
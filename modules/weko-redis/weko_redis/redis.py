@@ -1,23 +1,129 @@
 # -*- coding: utf-8 -*-
 
+import threading
+import time
+
 import redis
 from redis import sentinel
 from flask import current_app
 from simplekv.memory.redisstore import RedisStore
 
+from . import config
+
+_clients = {}
+"""Pooled clients of the process, by connection settings and database."""
+
+_clients_lock = threading.Lock()
+
+
+def _config(key):
+    """Get a setting of the application, or its default."""
+    return current_app.config.get(key, getattr(config, key))
+
+
+class PooledClient:
+    """
+    Redis client shared by the process.
+
+    Attributes:
+        client (StrictRedis): The client, with its connection pool.
+        hits (int): The number of times the client was reused.
+        health_check_failures (int): The number of failed health checks.
+    """
+    def __init__(self, client):
+        self.client = client
+        self.hits = 0
+        self.health_check_failures = 0
+        self.checked_at = time.time()
+        self._store = None
+
+    @property
+    def store(self):
+        """The client wrapped in a RedisStore."""
+        if self._store is None:
+            self._store = RedisStore(self.client)
+        return self._store
+
+    def check(self):
+        """
+        Checks the health of the pool, at most once per interval.
+
+        A pool failing the check is disconnected, so that its next
+        commands reconnect. Under Sentinel, the master is discovered again
+        and the pool is disconnected if it changed.
+        """
+        interval = _config('WEKO_REDIS_HEALTH_CHECK_INTERVAL')
+        now = time.time()
+        if not interval or now - self.checked_at < interval:
+            return
+        self.checked_at = now
+        pool = self.client.connection_pool
+        try:
+            if isinstance(pool, sentinel.SentinelConnectionPool):
+                pool.get_master_address()
+            else:
+                self.client.ping()
+        except redis.RedisError as ex:
+            self.health_check_failures += 1
+            current_app.logger.warning(
+                'Redis health check failed: {}'.format(ex))
+            pool.disconnect()
+
+    def metrics(self):
+        """
+        Gets the metrics of the pool.
+
+        Returns:
+            dict: The created, in use and available connections, the pool
+            size, the reuses and the failed health checks.
+        """
+        pool = self.client.connection_pool
+        if isinstance(pool, redis.BlockingConnectionPool):
+            created = len(pool._connections)
+            available = len([c for c in list(pool.pool.queue)
+                             if c is not None])
+        else:
+            created = pool._created_connections
+            available = len(pool._available_connections)
+        return {
+            'created_connections': created,
+            'in_use_connections': created - available,
+            'available_connections': available,
+            'max_connections': pool.max_connections,
+            'hits': self.hits,
+            'health_check_failures': self.health_check_failures,
+        }
+
+
+def get_pool_metrics():
+    """
+    Gets the metrics of the pooled clients of the process.
+
+    Returns:
+        list: The metrics of each pool, with its type, location and db.
+    """
+    metrics = []
+    for (redis_type, location, db), client in list(_clients.items()):
+        data = client.metrics()
+        data.update(type=redis_type, location=location, db=db)
+        metrics.append(data)
+    return metrics
+
+
 class RedisConnection:
     """
     Redis Connection for app.
 
     This class provides methods to establish connections with Redis servers based on the configuration of the Flask app.
+    The clients are pooled: the calls with the same settings and database share one client and its connection pool in the process.
 
     Attributes:
         redis_type (str): The type of Redis connection (e.g., 'redis' or 'redissentinel').
 
     Methods:
-        connection(db, kv=False): Establishes a Redis connection and returns the datastore object.
-        redis_connection(db): Establishes a direct Redis connection and returns the Redis store object.
-        sentinel_connection(db): Establishes a Redis Sentinel connection and returns the Redis store object.
+        connection(db, kv=False): Returns the pooled datastore object.
+        redis_connection(db): Creates a direct Redis client with a connection pool.
+        sentinel_connection(db): Creates a Redis Sentinel client with a connection pool.
     """
     def __init__(self):
         self.redis_type = current_app.config['CACHE_TYPE']
@@ -25,7 +131,7 @@ class RedisConnection:
 
     def connection(self, db, kv = False):
         """
-        Establishes a Redis connection and returns the datastore object.
+        Returns the pooled datastore object.
 
         Args:
             db (int): The Redis database index to connect to.
@@ -34,25 +140,46 @@ class RedisConnection:
         Returns:
             object: The Redis datastore object.
         """
-        datastore = None
-        try:
-            if self.redis_type == 'redis':
-                store = self.redis_connection(db)
-            elif self.redis_type == 'redissentinel':
-                store = self.sentinel_connection(db)
-        except Exception as ex:
-            raise ex
+        if self.redis_type == 'redis':
+            location = (current_app.config['CACHE_REDIS_HOST'],
+                        str(current_app.config['REDIS_PORT']))
+        elif self.redis_type == 'redissentinel':
+            location = (
+                tuple(tuple(s) for s in
+                      current_app.config['CACHE_REDIS_SENTINELS']),
+                current_app.config['CACHE_REDIS_SENTINEL_MASTER'])
+        else:
+            raise ValueError(
+                'Unsupported CACHE_TYPE: {}'.format(self.redis_type))
+
+        key = (self.redis_type, location, db)
+        client = _clients.get(key)
+        if client is None:
+            with _clients_lock:
+                client = _clients.get(key)
+                if client is None:
+                    if self.redis_type == 'redis':
+                        store = self.redis_connection(db)
+                    else:
+                        store = self.sentinel_connection(db)
+                    client = _clients[key] = PooledClient(store)
+        client.hits += 1
+        client.check()
 
         if kv == True:
-            datastore = RedisStore(store)
+            datastore = client.store
         else:
-            datastore = store
+            datastore = client.client
 
         return datastore
 
     def redis_connection(self, db):
         """
-        Establishes a direct Redis connection and returns the Redis store object.
+        Creates a direct Redis client with a connection pool.
+
+        The connections are limited to ``WEKO_REDIS_MAX_CONNECTIONS``, a
+        command waits ``WEKO_REDIS_POOL_TIMEOUT`` seconds at most for a free
+        connection.
 
         Args:
             db (int): The Redis database index to connect to.
@@ -60,18 +187,22 @@ class RedisConnection:
         Returns:
             object: The Redis store object.
         """
-        store = None
-        try:
-            redis_url = 'redis://' + current_app.config['CACHE_REDIS_HOST'] + ':' + current_app.config['REDIS_PORT'] + '/' + str(db)
-            store = redis.StrictRedis.from_url(redis_url)
-        except Exception as ex:
-            raise ex
-
-        return store
+        redis_url = 'redis://' + current_app.config['CACHE_REDIS_HOST'] + ':' + str(current_app.config['REDIS_PORT']) + '/' + str(db)
+        pool = redis.BlockingConnectionPool.from_url(
+            redis_url,
+            max_connections=_config('WEKO_REDIS_MAX_CONNECTIONS'),
+            timeout=_config('WEKO_REDIS_POOL_TIMEOUT'),
+            socket_connect_timeout=_config(
+                'WEKO_REDIS_SOCKET_CONNECT_TIMEOUT'))
+        return redis.StrictRedis(connection_pool=pool)
 
     def sentinel_connection(self, db):
         """
-        Establishes a Redis Sentinel connection and returns the Redis store object.
+        Creates a Redis Sentinel client with a connection pool.
+
+        The master is discovered when a connection is established, new
+        connections are checked with a PING and the pool is disconnected
+        when the master changes.
 
         Args:
             db (int): The Redis database index to connect to.
@@ -79,15 +210,15 @@ class RedisConnection:
         Returns:
             object: The Redis store object.
         """
-        store = None
-        try:
-            sentinels = sentinel.Sentinel(current_app.config['CACHE_REDIS_SENTINELS'], decode_responses=False)
-            store = sentinels.master_for(
-                current_app.config['CACHE_REDIS_SENTINEL_MASTER'], db= db)
-        except Exception as ex:
-            raise ex
-            
-        return store
+        timeout = _config('WEKO_REDIS_SOCKET_CONNECT_TIMEOUT')
+        sentinels = sentinel.Sentinel(
+            current_app.config['CACHE_REDIS_SENTINELS'],
+            sentinel_kwargs={'socket_timeout': timeout},
+            decode_responses=False)
+        return sentinels.master_for(
+            current_app.config['CACHE_REDIS_SENTINEL_MASTER'], db=db,
+            max_connections=_config('WEKO_REDIS_MAX_CONNECTIONS'),
+            check_connection=True, socket_connect_timeout=timeout)
 
 class RedisConnectionExtension:
     """
@@ -6,6 +6,8 @@ from weko_schema_ui.schema import (
     delete_schema,
     delete_schema_cache,
     get_oai_metadata_formats,
+    get_schema_plan,
+    clear_schema_plans,
 )
 import pytest
 from lxml import etree
@@ -18,7 +20,9 @@ from collections import Iterable, OrderedDict
 from werkzeug.exceptions import BadRequest
 from redis.exceptions import RedisError
 from unittest.mock import patch,Mock
+from weko_records.api import Mapping
 from weko_records.utils import get_options_and_order_list
+from invenio_records.signals import after_record_update
 
 # class SchemaConverter:
 #     def __init__(self, schemafile, rootname):
@@ -501,6 +505,95 @@ def test_delete_schema_cache(app,db_oaischema):
     delete_schema_cache("jpcoar_mapping")
 
 
+# def get_schema_plan(schema_name, item_type_id):
+# .tox/c1/bin/pytest --cov=weko_schema_ui tests/test_schema.py::test_get_schema_plan -v --cov-branch --cov-report=term --basetemp=/code/modules/weko-schema-ui/.tox/c1/tmp
+def test_get_schema_plan(app, db, db_oaischema, db_itemtype):
+    clear_schema_plans()
+    app.config.update(WEKO_SCHEMA_PLAN_REVISION_CHECK_INTERVAL=10)
+    with patch("weko_schema_ui.schema.Mapping.get_record",
+               wraps=Mapping.get_record) as mock_mapping:
+        plan = get_schema_plan("jpcoar_mapping", 1)
+        assert plan.root_name == "jpcoar"
+        assert get_schema_plan("jpcoar_mapping", 1) is plan
+        assert get_schema_plan("jpcoar_mapping", "1") is plan
+        assert mock_mapping.call_count == 1
+
+        # schema not exist
+        assert get_schema_plan("not_exist_mapping", 1) is None
+
+        # the plan is shared and is not changed by the records
+        record1 = {"metadata": {"item_type_id": "1"}}
+        record2 = {"metadata": {"item_type_id": "1"}}
+        tree1 = SchemaTree(record=record1, schema_name="jpcoar_mapping")
+        tree2 = SchemaTree(record=record2, schema_name="jpcoar_mapping")
+        assert tree1._plan is plan
+        assert tree2._plan is plan
+        assert tree1._ns is not plan.namespaces
+        assert tree1._ns == plan.namespaces
+        assert "item_type_id" not in record1["metadata"]
+        assert tree1._item_type_id == "1"
+        for k, v in plan.mapping.items():
+            assert record1["metadata"][k]["jpcoar_mapping"] == v
+            if isinstance(v, dict):
+                assert record1["metadata"][k]["jpcoar_mapping"] is not \
+                    record2["metadata"][k]["jpcoar_mapping"]
+        assert mock_mapping.call_count == 1
+
+        # key list is compiled once
+        assert tree1.to_list() is plan.key_list
+        tree3 = SchemaTree(record={"metadata": {"item_type_id": "1"}},
+                           schema_name="jpcoar_mapping")
+        assert tree3.to_list() is plan.key_list
+
+        # revision is checked after the interval
+        plan.checked = 0
+        assert get_schema_plan("jpcoar_mapping", 1) is plan
+        assert plan.checked > 0
+        with patch("weko_schema_ui.schema.get_schema_plan_revision",
+                   return_value=((1, 2), 2, 1)):
+            plan.checked = 0
+            new_plan = get_schema_plan("jpcoar_mapping", 1)
+            assert new_plan is not plan
+            assert new_plan.revision == ((1, 2), 2, 1)
+        assert mock_mapping.call_count == 2
+
+        # dropped with the schema cache
+        delete_schema_cache("jpcoar_mapping")
+        plan = get_schema_plan("jpcoar_mapping", 1)
+        assert plan is not new_plan
+        assert mock_mapping.call_count == 3
+
+        # not cached
+        app.config.update(WEKO_SCHEMA_PLAN_REVISION_CHECK_INTERVAL=0)
+        assert get_schema_plan("jpcoar_mapping", 1) is not plan
+        record = {"metadata": {"item_type_id": "1"}}
+        tree = SchemaTree(record=record, schema_name="jpcoar_mapping")
+        assert tree._plan is None
+        assert tree._root_name == "jpcoar"
+    clear_schema_plans()
+
+
+# def clear_schema_plans(schema_name=None, item_type_id=None):
+# .tox/c1/bin/pytest --cov=weko_schema_ui tests/test_schema.py::test_clear_schema_plans -v --cov-branch --cov-report=term --basetemp=/code/modules/weko-schema-ui/.tox/c1/tmp
+def test_clear_schema_plans(app, db, db_oaischema, db_itemtype):
+    app.config.update(WEKO_SCHEMA_PLAN_REVISION_CHECK_INTERVAL=10)
+    plan = get_schema_plan("jpcoar_mapping", 1)
+    clear_schema_plans(item_type_id=2)
+    assert get_schema_plan("jpcoar_mapping", 1) is plan
+    clear_schema_plans(schema_name="ddi_mapping")
+    assert get_schema_plan("jpcoar_mapping", 1) is plan
+    clear_schema_plans(item_type_id=1)
+    assert get_schema_plan("jpcoar_mapping", 1) is not plan
+
+    # item type mapping updated
+    plan = get_schema_plan("jpcoar_mapping", 1)
+    mapping = Mapping.get_record(1)
+    after_record_update.send(current_app._get_current_object(),
+                             record=mapping)
+    assert get_schema_plan("jpcoar_mapping", 1) is not plan
+    clear_schema_plans()
+
+
 # def schema_list_render(pid=None, **kwargs):
 # .tox/c1/bin/pytest --cov=weko_schema_ui tests/test_schema.py::test_schema_list_render -v --cov-branch --cov-report=term --basetemp=/code/modules/weko-schema-ui/.tox/c1/tmp
 def test_schema_list_render(app, db_oaischema):
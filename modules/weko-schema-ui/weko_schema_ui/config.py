@@ -178,3 +178,9 @@ WEKO_SCHEMA_RELATION_TYPE = [
     'isSupplementTo','isIdenticalTo','isDerivedFrom','isSourceOf'
 ]
 """jpcoar:relation relationType Controlled Vocabularies"""
+
+WEKO_SCHEMA_PLAN_REVISION_CHECK_INTERVAL = 10
+"""Seconds a compiled schema plan is reused before its revision is checked.
+
+Set 0 to disable the plan cache.
+"""
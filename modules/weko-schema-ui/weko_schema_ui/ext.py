@@ -45,6 +45,13 @@ class WekoSchemaUI(object):
         app.register_blueprint(blueprint)
         app.extensions['weko-schema-ui'] = self
 
+        from invenio_records.signals import after_record_insert, \
+            after_record_update
+
+        from .schema import clear_schema_plans_on_change
+        after_record_insert.connect(clear_schema_plans_on_change, weak=False)
+        after_record_update.connect(clear_schema_plans_on_change, weak=False)
+
     def init_config(self, app):
         """Initialize configuration.
 
@@ -22,6 +22,8 @@
 
 import copy
 import json
+import threading
+import time
 from collections import Iterable, OrderedDict
 from functools import partial
 
@@ -29,10 +31,13 @@ import redis
 from redis import sentinel
 import xmlschema
 from flask import abort, current_app, request, url_for
+from invenio_db import db
 from lxml import etree
 from lxml.builder import ElementMaker
 from simplekv.memory.redisstore import RedisStore
-from weko_records.api import ItemLink, Mapping
+from sqlalchemy import desc
+from weko_records.api import ItemLink, ItemTypes, Mapping
+from weko_records.models import ItemType, ItemTypeMapping
 from weko_redis import RedisConnection
 from xmlschema.validators import XsdAnyAttribute, XsdAnyElement, \
     XsdAtomicBuiltin, XsdAtomicRestriction, XsdEnumerationFacet, XsdGroup, \
@@ -215,6 +220,169 @@ class SchemaConverter:
         return schema, schema_data.namespaces, nsp
 
 
+class SchemaPlan:
+    """Compiled part of a :class:`SchemaTree` for a schema and item type.
+
+    Hold everything a :class:`SchemaTree` needs that does not depend on the
+    record, so that the records of the same item type share it.
+    """
+
+    def __init__(self, schema_name, item_type_id, revision=None):
+        """
+        Init.
+
+        :param schema_name: schema name
+        :param item_type_id: item type id
+        :param revision: revision returned by
+            :func:`get_schema_plan_revision`
+
+        """
+        self.schema_name = schema_name
+        self.item_type_id = item_type_id
+        self.revision = revision
+        self.checked = time.time()
+        self.key_list = None
+        rec = cache_schema(schema_name)
+        self.root_name = rec.get('root_name')
+        self.namespaces = rec.get('namespaces')
+        self.schema = rec.get('schema')
+
+        self.item_type_mapping = Mapping.get_record(item_type_id)
+        self.mapping = dict()
+        if isinstance(self.item_type_mapping, Mapping):
+            self.mapping = {
+                k: v.get(schema_name)
+                for k, v in self.item_type_mapping.items()
+                if isinstance(v, dict)}
+
+        self.ignore_list_all, self.ignore_list = {}, []
+        if item_type_id:
+            self.ignore_list_all, self.ignore_list = \
+                get_ignore_item_from_option(item_type_id)
+
+        self.location = ''
+        self.target_namespace = ''
+        schemas = WekoSchema.get_all()
+        if isinstance(schemas, list):
+            for schema in schemas:
+                if isinstance(schema, OAIServerSchema) and \
+                        schema_name == schema.schema_name:
+                    self.location = schema.schema_location
+                    self.target_namespace = schema.target_namespace
+
+    def inject_mapping(self, record):
+        """Inject the mapping of the item type to the record metadata."""
+        for k, v in self.mapping.items():
+            v = {self.schema_name: copy.deepcopy(v)}
+            if k in record:
+                record[k].update(v)
+            else:
+                record[k] = v
+
+
+_schema_plans = dict()
+_schema_plans_lock = threading.Lock()
+
+
+def get_schema_plan_revision(schema_name, item_type_id):
+    """Get the revision of the data compiled in a :class:`SchemaPlan`.
+
+    :param schema_name: schema name
+    :param item_type_id: item type id
+    :return: tuple of the versions of the mapping, item type and schema
+
+    """
+    mapping = db.session.query(
+        ItemTypeMapping.id, ItemTypeMapping.version_id).filter(
+        ItemTypeMapping.item_type_id == item_type_id,
+        ItemTypeMapping.mapping != None  # noqa
+    ).order_by(desc(ItemTypeMapping.created)).first()
+    item_type = db.session.query(ItemType.version_id).filter(
+        ItemType.id == item_type_id).scalar()
+    schema = db.session.query(OAIServerSchema.version_id).filter(
+        OAIServerSchema.schema_name == schema_name).scalar()
+    return tuple(mapping) if mapping else None, item_type, schema
+
+
+def get_schema_plan(schema_name, item_type_id):
+    """Get the :class:`SchemaPlan` of a schema and an item type.
+
+    The plans are cached in the process. Local updates of item types,
+    mappings and schemas drop them with :func:`clear_schema_plans`, and
+    the revision is checked again every
+    ``WEKO_SCHEMA_PLAN_REVISION_CHECK_INTERVAL`` seconds for the updates
+    made by other processes.
+
+    :param schema_name: schema name
+    :param item_type_id: item type id
+    :return: the plan or None if the schema does not exist
+
+    """
+    key = (schema_name, str(item_type_id))
+    interval = current_app.config.get(
+        'WEKO_SCHEMA_PLAN_REVISION_CHECK_INTERVAL', 0)
+    plan = _schema_plans.get(key)
+    now = time.time()
+    if plan and interval and now - plan.checked < interval:
+        return plan
+
+    revision = get_schema_plan_revision(schema_name, item_type_id)
+    if plan and plan.revision == revision:
+        plan.checked = now
+        return plan
+    if revision[2] is None or not cache_schema(schema_name):
+        return None
+    plan = SchemaPlan(schema_name, item_type_id, revision)
+    if interval:
+        with _schema_plans_lock:
+            _schema_plans[key] = plan
+    return plan
+
+
+def clear_schema_plans(schema_name=None, item_type_id=None):
+    """Drop the cached :class:`SchemaPlan` of a schema or an item type.
+
+    :param schema_name: schema name, all the schemas if None
+    :param item_type_id: item type id, all the item types if None
+
+    """
+    with _schema_plans_lock:
+        for key in list(_schema_plans.keys()):
+            if (schema_name is None or key[0] == schema_name) and \
+                    (item_type_id is None or key[1] == str(item_type_id)):
+                _schema_plans.pop(key, None)
+
+
+def clear_schema_plans_on_change(sender, record=None, **kwargs):
+    """Drop the plans of an updated item type or mapping."""
+    if isinstance(record, Mapping):
+        item_type_id = getattr(record.model, 'item_type_id', None)
+        clear_schema_plans(item_type_id=item_type_id)
+    elif isinstance(record, ItemTypes):
+        clear_schema_plans(item_type_id=getattr(record.model, 'id', None))
+
+
+def get_ignore_item_from_option(item_type_id):
+    """Get all keys of properties that is enable Hide option in metadata."""
+    ignore_list_parents = []
+    ignore_list_all = []
+    ignore_dict_all = {}
+    from weko_records.utils import get_options_and_order_list
+    ignore_list_all, meta_options = \
+        get_options_and_order_list(item_type_id)
+    if isinstance(meta_options, dict):
+        for key, val in meta_options.items():
+            hidden = val.get('option', {}).get('hidden', False)
+            if hidden:
+                ignore_list_parents.append(key)
+    for element_info in ignore_list_all:
+        if len(element_info) >= 4:
+            element_info[0] = element_info[0].replace("[]", "")
+            # only get hide option
+            ignore_dict_all[element_info[0]] = element_info[3].get("hide", False)
+    return ignore_dict_all, ignore_list_parents
+
+
 class SchemaTree:
     """Schematree."""
 
@@ -234,6 +402,8 @@ class SchemaTree:
         self._record = record["metadata"] \
             if record and record.get("metadata") else None
         self._schema_name = schema_name if schema_name else None
+        self._plan = None
+        self._key_list = None
         if self._record:
             self._root_name, self._ns, self._schema_obj, self._item_type_id = \
                 self.get_mapping_data()
@@ -247,6 +417,13 @@ class SchemaTree:
         self._separate_nodes = None
         self._location = ''
         self._target_namespace = ''
+        if self._plan:
+            self._location = self._plan.location
+            self._target_namespace = self._plan.target_namespace
+            self._ignore_list_all = self._plan.ignore_list_all
+            self._ignore_list = self._plan.ignore_list
+            self._key_list = self._plan.key_list
+            return
         schemas = WekoSchema.get_all()
         if self._record and self._item_type_id:
             self._ignore_list_all, self._ignore_list = \
@@ -259,23 +436,7 @@ class SchemaTree:
 
     def get_ignore_item_from_option(self):
         """Get all keys of properties that is enable Hide option in metadata."""
-        ignore_list_parents = []
-        ignore_list_all = []
-        ignore_dict_all = {}
-        from weko_records.utils import get_options_and_order_list
-        ignore_list_all, meta_options = \
-            get_options_and_order_list(self._item_type_id)
-        if isinstance(meta_options, dict):
-            for key, val in meta_options.items():
-                hidden = val.get('option', {}).get('hidden', False)
-                if hidden:
-                    ignore_list_parents.append(key)
-        for element_info in ignore_list_all:
-            if len(element_info) >= 4:
-                element_info[0] = element_info[0].replace("[]", "")
-                # only get hide option
-                ignore_dict_all[element_info[0]] = element_info[3].get("hide", False)
-        return ignore_dict_all, ignore_list_parents
+        return get_ignore_item_from_option(self._item_type_id)
 
     def get_mapping_data(self):
         """
@@ -284,6 +445,20 @@ class SchemaTree:
         :return: root name, namespace and schema
 
         """
+        if isinstance(self._record, dict) and current_app.config.get(
+                'WEKO_SCHEMA_PLAN_REVISION_CHECK_INTERVAL'):
+            plan = get_schema_plan(self._schema_name,
+                                   self._record.get("item_type_id"))
+            if not plan:
+                return None, None, None, None
+            self._plan = plan
+            _id = self._record.pop("item_type_id")
+            self._record.pop("_buckets", {})
+            self._record.pop("_deposit", {})
+            self.item_type_mapping = plan.item_type_mapping
+            plan.inject_mapping(self._record)
+            return plan.root_name, copy.copy(plan.namespaces), plan.schema, _id
+
         # Get Schema info
         rec = cache_schema(self._schema_name)
 
@@ -1746,6 +1921,8 @@ class SchemaTree:
 
     def to_list(self):
         """Get a elementName List."""
+        if self._key_list is not None:
+            return self._key_list
         elst = []
         klst = []
 
@@ -1773,6 +1950,9 @@ class SchemaTree:
 
         get_key_list(self._schema_obj)
 
+        self._key_list = elst
+        if self._plan:
+            self._plan.key_list = elst
         return elst
 
     # def get_node(self, dc, key=None):
@@ -1959,6 +2139,7 @@ def delete_schema_cache(schema_name):
         datastore.delete(cache_key)
     except BaseException:
         pass
+    clear_schema_plans(schema_name=schema_name)
 
 
 def schema_list_render(pid=None, **kwargs):
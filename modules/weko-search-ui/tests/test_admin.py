@@ -308,6 +308,7 @@ class TestItemBulkExport:
                 'celery_is_run': True, 
                 'error_message': None, 
                 'export_run_msg': None, 
+                'export_progress': {}, 
                 'export_status': False, 
                 'status': 'SUCCESS', 
                 'uri_status': False}}
@@ -3,6 +3,7 @@
 import copy
 import json
 import os
+import tempfile
 import unittest
 from datetime import datetime
 import uuid
@@ -206,27 +207,12 @@ def test_get_tree_items(i18n_app, indices, users, mocker):
 
 # def delete_records(index_tree_id, ignore_items):
 def test_delete_records(i18n_app, db_activity):
-    with open("tests/data/search_result_2.json", "r") as json_file:
-        search_result = json.load(json_file)
-
-        with patch("weko_search_ui.utils.get_tree_items", return_value=[search_result]):
-            with patch(
-                "invenio_records.api.Record.get_record",
-                return_value=db_activity["record"],
-            ):
-                with patch(
-                    "weko_deposit.api.WekoIndexer.update_es_data",
-                    return_value=db_activity["record"],
-                ):
-                    with patch(
-                        "weko_deposit.api.WekoDeposit.delete_by_index_tree_id",
-                        return_value="",
-                    ):
-                        with patch(
-                            "invenio_records.api.Record.delete", return_value=""
-                        ):
-                            assert delete_records(33, ignore_items=[])
-                            assert delete_records(1, ignore_items=[])
+    with patch(
+        "weko_deposit.api.WekoDeposit.delete_by_index_tree_id",
+        return_value=["1"],
+    ) as mock_delete:
+        assert delete_records(33, ignore_items=["2"]) == ["1"]
+        mock_delete.assert_called_once_with(33, ["2"])
 
 
 # def get_journal_info(index_id=0):
@@ -2308,6 +2294,74 @@ def test_export_all(db_activity, i18n_app, users, item_type, db_records2):
     assert not export_all(root_url, user_id, data3)
 
 
+# .tox/c1/bin/pytest --cov=weko_search_ui tests/test_utils.py::test_export_all_cleanup -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/weko-search-ui/.tox/c1/tmp
+def test_export_all_cleanup(i18n_app, users, item_type, redis_connect, tmp_path):
+    user_id = users[3]["obj"].id
+    data = {"item_type_id": "1", "item_id_range": "1"}
+    checkpoint_key = i18n_app.config["WEKO_ADMIN_CACHE_PREFIX"].format(
+        name="CHECKPOINT_EXPORT_ALL", user_id=user_id
+    )
+    # the checkpoint of other data is deleted with its files
+    old_root = tmp_path / "weko_export_old"
+    (old_root / "20220101000000").mkdir(parents=True)
+    redis_connect.put(checkpoint_key, json.dumps(
+        {"data": {"item_type_id": "2"},
+         "export_path": str(old_root / "20220101000000")}).encode("utf-8"))
+    temp_root = tmp_path / "weko_export_new"
+    temp_root.mkdir()
+    with patch("weko_search_ui.utils.tempfile.mkdtemp", return_value=str(temp_root)):
+        with patch("weko_search_ui.utils._count_export_record_ids",
+                   side_effect=Exception("test_error")):
+            assert export_all("/", user_id, data, "UTC") == ""
+    assert not old_root.exists()
+    # the files of the failed export are deleted
+    assert not temp_root.exists()
+    assert not redis_connect.redis.exists(checkpoint_key)
+
+    # the export interrupted by the shutdown of the worker keeps the files
+    # of its checkpoint
+    resumed_root = tmp_path / "weko_export_resumed"
+    (resumed_root / "20220101000000").mkdir(parents=True)
+    redis_connect.put(checkpoint_key, json.dumps(
+        {"data": data, "export_path": str(resumed_root / "20220101000000"),
+         "retry_info": {}, "done": [], "records": 0, "parts": 0}).encode("utf-8"))
+    with patch("weko_search_ui.utils._count_export_record_ids",
+               side_effect=SystemExit()):
+        with pytest.raises(SystemExit):
+            export_all("/", user_id, data, "UTC")
+    assert resumed_root.exists()
+    assert redis_connect.redis.exists(checkpoint_key)
+
+    # no checkpoint yet, nothing to resume
+    redis_connect.delete(checkpoint_key)
+    temp_root.mkdir()
+    with patch("weko_search_ui.utils.tempfile.mkdtemp", return_value=str(temp_root)):
+        with patch("weko_search_ui.utils._count_export_record_ids",
+                   side_effect=SystemExit()):
+            with pytest.raises(SystemExit):
+                export_all("/", user_id, data, "UTC")
+    assert not temp_root.exists()
+
+
+# def _iter_export_record_ids(item_type_id, from_pid, to_pid=""):
+# .tox/c1/bin/pytest --cov=weko_search_ui tests/test_utils.py::test_iter_export_record_ids -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/weko-search-ui/.tox/c1/tmp
+def test_iter_export_record_ids(i18n_app, db, item_type, db_records2):
+    from weko_search_ui.utils import _iter_export_record_ids
+
+    i18n_app.config["WEKO_SEARCH_UI_BULK_EXPORT_FETCH_SIZE"] = 1
+    chunks = list(_iter_export_record_ids("1", "1"))
+    assert all(len(chunk) == 1 for chunk in chunks)
+    pids = [int(pid) for chunk in chunks for pid, _ in chunk]
+    assert pids == sorted(pids)
+
+    i18n_app.config["WEKO_SEARCH_UI_BULK_EXPORT_FETCH_SIZE"] = 1000
+    all_pids = [pid for chunk in _iter_export_record_ids("1", "1")
+                for pid, _ in chunk]
+    assert [int(pid) for pid in all_pids] == pids
+    assert [pid for chunk in _iter_export_record_ids("1", "1", "1")
+            for pid, _ in chunk] == [pid for pid in all_pids if pid == "1"]
+
+
 # def delete_exported(uri, cache_key):
 def test_delete_exported(i18n_app, file_instance_mock):
     file_path = os.path.join(
@@ -2356,6 +2410,40 @@ def test_cancel_export_all(i18n_app, users, redis_connect, mocker):
             assert result == False
 
 
+# def get_export_progress():
+# def delete_export_checkpoint(user_id):
+# .tox/c1/bin/pytest --cov=weko_search_ui tests/test_utils.py::test_get_export_progress -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/weko-search-ui/.tox/c1/tmp
+def test_get_export_progress(i18n_app, users, redis_connect):
+    from weko_search_ui.utils import delete_export_checkpoint, get_export_progress
+
+    with patch("flask_login.utils._get_user", return_value=users[3]["obj"]):
+        assert get_export_progress() == {}
+        progress_key = i18n_app.config["WEKO_ADMIN_CACHE_PREFIX"].format(
+            name="PROGRESS_EXPORT_ALL", user_id=current_user.get_id()
+        )
+        checkpoint_key = i18n_app.config["WEKO_ADMIN_CACHE_PREFIX"].format(
+            name="CHECKPOINT_EXPORT_ALL", user_id=current_user.get_id()
+        )
+        progress = {"records": 1000, "total": 3000, "parts": 1,
+                    "records_per_sec": 100.0, "eta": 20}
+        redis_connect.put(progress_key, json.dumps(progress).encode("utf-8"))
+        temp_root = tempfile.mkdtemp(
+            prefix=i18n_app.config["WEKO_ITEMS_UI_EXPORT_TMP_PREFIX"])
+        export_path = os.path.join(temp_root, "20220101000000")
+        os.makedirs(export_path)
+        redis_connect.put(checkpoint_key, json.dumps(
+            {"export_path": export_path}).encode("utf-8"))
+        assert get_export_progress() == progress
+
+        redis_connect.put(progress_key, b"broken")
+        assert get_export_progress() == {}
+
+        delete_export_checkpoint(current_user.get_id())
+        assert not redis_connect.redis.exists(progress_key)
+        assert not redis_connect.redis.exists(checkpoint_key)
+        assert not os.path.exists(temp_root)
+
+
 # def get_export_status():
 # .tox/c1/bin/pytest --cov=weko_search_ui tests/test_utils.py::test_get_export_status -vv -s --cov-branch --cov-report=term --basetemp=/code/modules/weko-search-ui/.tox/c1/tmp
 def test_get_export_status(i18n_app, users, redis_connect,mocker):
@@ -79,6 +79,7 @@ from .utils import (
     delete_records,
     get_change_identifier_mode_content,
     get_content_workflow,
+    get_export_progress,
     get_export_status,
     get_lifetime,
     get_root_item_option,
@@ -774,6 +775,7 @@ class ItemBulkExport(BaseView):
                 "celery_is_run": check,
                 "error_message": message,
                 "export_run_msg": run_message,
+                "export_progress": get_export_progress(),
                 "status": status
             }
         )
@@ -790,6 +792,7 @@ class ItemBulkExport(BaseView):
                 "celery_is_run": check,
                 "error_message": message,
                 "export_run_msg": run_message,
+                "export_progress": get_export_progress(),
                 "status": status
             }
         )
@@ -716,9 +716,24 @@ WEKO_SEARCH_UI_BULK_EXPORT_TASKID_EXPIRED_TIME = 1
 WEKO_SEARCH_UI_BULK_EXPORT_LIMIT = 1000
 """The number of items exported to tsv/csv file each once."""
 
+WEKO_SEARCH_UI_BULK_EXPORT_FETCH_SIZE = 500
+"""The number of record ids read and records loaded per query during export."""
+
 WEKO_SEARCH_UI_BULK_EXPORT_RETRY = 5
 """Number of export retries."""
 
+WEKO_SEARCH_UI_BULK_EXPORT_RETRY_WAIT = 5
+"""Seconds to wait before retrying the export after a database error."""
+
+WEKO_SEARCH_UI_BULK_EXPORT_CHECKPOINT = "CHECKPOINT_EXPORT_ALL"
+"""Cache key of the bulk export checkpoint used to resume an export."""
+
+WEKO_SEARCH_UI_BULK_EXPORT_CHECKPOINT_TTL = 60 * 60 * 24
+"""Seconds during which an interrupted bulk export can be resumed."""
+
+WEKO_SEARCH_UI_BULK_EXPORT_PROGRESS = "PROGRESS_EXPORT_ALL"
+"""Cache key of the bulk export progress (JSON)."""
+
 WEKO_SEARCH_UI_IMPORT_TMP_PREFIX = "weko_import_"
 """Import tmp prefix."""
 
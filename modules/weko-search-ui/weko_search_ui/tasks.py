@@ -103,9 +103,15 @@ def delete_task_id_cache(task_id, cache_key):
             datastore = redis_connection.connection(db=current_app.config['CACHE_REDIS_DB'], kv = True)
             datastore.delete(cache_key)
 
-@shared_task
+@shared_task(acks_late=True)
 def export_all_task(root_url, user_id, data, timezone):
-    """Export all items."""
+    """Export all items.
+
+    The task is redelivered if the worker is shut down before its end and
+    resumes the export from its last checkpoint. It is not redelivered
+    when its process is killed (e.g. out of memory or revoked), so an
+    export killing its process does not run again and again.
+    """
     from weko_admin.utils import reset_redis_cache
 
     _task_config = current_app.config["WEKO_SEARCH_UI_BULK_EXPORT_URI"]
@@ -37,7 +37,7 @@ from functools import partial, reduce, wraps
 import io
 from io import StringIO
 from operator import getitem
-from time import sleep
+from time import sleep, time
 import pickle
 
 import bagit
@@ -58,7 +58,6 @@ from invenio_i18n.ext import current_i18n
 from invenio_pidrelations.contrib.versioning import PIDVersioning
 from invenio_pidstore.errors import PIDDoesNotExistError
 from invenio_pidstore.models import PersistentIdentifier, PIDStatus
-from invenio_records.api import Record
 from invenio_records.models import RecordMetadata
 from invenio_records_rest.errors import InvalidQueryRESTError
 from invenio_search import RecordsSearch
@@ -208,49 +207,13 @@ def get_tree_items(index_tree_id):
 
 
 def delete_records(index_tree_id, ignore_items):
-    """Bulk delete records."""
-    hits = get_tree_items(index_tree_id)
-    result = []
-
-    for hit in hits:
-        recid = hit.get("_id")
-        record = Record.get_record(recid)
-        pid = hit.get("_source", {}).get("control_number", 0)
-
-        if record and record["path"] and pid not in ignore_items:
-            paths = record["path"]
-            del_flag = False
-            if len(paths) > 0:
-                # Remove the element which matches the index_tree_id
-                removed_path = None
-                for index_id in paths:
-                    if index_id == str(index_tree_id):
-                        removed_path = index_id
-                        if len(paths) == 1:
-                            del_flag = True
-                            pass
-                        else:
-                            paths.remove(index_id)
-                        break
-
-                
-                indexer = WekoIndexer()
-
-                if not del_flag:
-                    # Do update the path on record
-                    record.update({"path": paths})
-                    # Update to ES
-                    indexer.update_es_data(record, update_revision=False)
-                    record.commit()
-                elif del_flag and removed_path is not None:
-                    from weko_records_ui.utils import soft_delete
-                    soft_delete(pid)
-                else:
-                    pass
+    """Bulk delete records.
 
-                result.append(pid)
-
-    return result
+    :param index_tree_id: the index to remove from the records.
+    :param ignore_items: the item ids not to delete.
+    :return: the recids of the records detached from the index or deleted.
+    """
+    return WekoDeposit.delete_by_index_tree_id(index_tree_id, ignore_items)
 
 
 def get_journal_info(index_id=0):
@@ -3306,6 +3269,83 @@ def handle_check_duplication_item_id(ids: list):
     return list(set(result))
 
 
+def _export_record_ids_query(item_type_id, to_pid=""):
+    """Build the query of the exportable record ids of an item type.
+
+    :param item_type_id: item type id.
+    :param to_pid: last pid value (inclusive), no limit if empty.
+    :return: tuple of the query and the numeric pid value expression.
+    """
+    pid_number = _func.to_number(
+        PersistentIdentifier.pid_value,
+        current_app.config["WEKO_SEARCH_UI_TO_NUMBER_FORMAT"]
+    )
+    query = db.session.query(
+        PersistentIdentifier.pid_value,
+        PersistentIdentifier.object_uuid,
+        pid_number.label("pid_number")
+    ).join(
+        ItemMetadata,
+        PersistentIdentifier.object_uuid == ItemMetadata.id,
+    ).join(
+        RecordMetadata,
+        PersistentIdentifier.object_uuid == RecordMetadata.id,
+    ).filter(
+        PersistentIdentifier.pid_type == "recid",
+        PersistentIdentifier.status == PIDStatus.REGISTERED,
+        PersistentIdentifier.pid_value.notlike("%.%"),
+        RecordMetadata.json.op("->>")("publish_status").in_(
+            [PublishStatus.PUBLIC.value, PublishStatus.PRIVATE.value]),
+        ItemMetadata.item_type_id == item_type_id
+    )
+    if to_pid:
+        query = query.filter(pid_number <= to_pid)
+    return query, pid_number
+
+
+def _iter_export_record_ids(item_type_id, from_pid, to_pid=""):
+    """Iterate over the exportable record ids of an item type.
+
+    The ids are read with keyset pagination on the numeric pid value, so
+    only ``WEKO_SEARCH_UI_BULK_EXPORT_FETCH_SIZE`` rows are held at a time
+    whatever the size of the repository.
+
+    :param item_type_id: item type id.
+    :param from_pid: first pid value (inclusive).
+    :param to_pid: last pid value (inclusive), no limit if empty.
+    :return: generator of lists of (pid_value, object_uuid).
+    """
+    fetch_size = current_app.config.get(
+        "WEKO_SEARCH_UI_BULK_EXPORT_FETCH_SIZE", 500)
+    query, pid_number = _export_record_ids_query(item_type_id, to_pid)
+
+    last_number = None
+    while True:
+        if last_number is None:
+            page = query.filter(pid_number >= from_pid)
+        else:
+            page = query.filter(pid_number > last_number)
+        rows = page.order_by(pid_number).limit(fetch_size).all()
+        if not rows:
+            break
+        yield [(row.pid_value, row.object_uuid) for row in rows]
+        if len(rows) < fetch_size:
+            break
+        last_number = rows[-1].pid_number
+
+
+def _count_export_record_ids(item_type_id, from_pid, to_pid=""):
+    """Count the exportable records of an item type.
+
+    :param item_type_id: item type id.
+    :param from_pid: first pid value (inclusive).
+    :param to_pid: last pid value (inclusive), no limit if empty.
+    :return: number of records.
+    """
+    query, pid_number = _export_record_ids_query(item_type_id, to_pid)
+    return query.filter(pid_number >= from_pid).count()
+
+
 def export_all(root_url, user_id, data, timezone):
     """Gather all the item data and export and return as a JSON or BIBTEX.
 
@@ -3386,87 +3426,79 @@ def export_all(root_url, user_id, data, timezone):
             current_app.logger.error(ex)
         return item_types
 
-    def _get_export_data(export_path, item_types, retrys, fromid="", toid="", retry_info={}):
+    def _save_checkpoint(checkpoint):
+        """Persist the export checkpoint so a restarted task can resume."""
+        reset_redis_cache(
+            _checkpoint_key,
+            json.dumps(checkpoint),
+            current_app.config["WEKO_SEARCH_UI_BULK_EXPORT_CHECKPOINT_TTL"]
+        )
+
+    def _load_checkpoint():
+        """Get the checkpoint of an interrupted export of the same data."""
         try:
-            for it in item_types.copy():
-                item_type_id = it[0]
-                item_type_name = it[1]
-                item_datas = {}
-                if item_type_id in retry_info:
-                    counter = retry_info[item_type_id]["counter"]
-                    file_part = retry_info[item_type_id]["part"]
-                    from_pid = retry_info[item_type_id]["max"]
-                else:
-                    counter = 0
-                    file_part = 1
-                    from_pid = fromid if fromid else "1"
-                current_app.logger.info(
-                    "Start processing item type {}({}).".format(
-                        item_type_name, item_type_id
-                    )
-                )
-                # get all record id
-                if toid:
-                    recids = db.session.query(
-                        PersistentIdentifier.pid_value,
-                        PersistentIdentifier.object_uuid,
-                        RecordMetadata.json
-                    ).join(
-                        ItemMetadata,
-                        PersistentIdentifier.object_uuid == ItemMetadata.id,
-                    ).join(
-                        RecordMetadata,
-                        PersistentIdentifier.object_uuid == RecordMetadata.id,
-                    ).filter(
-                        PersistentIdentifier.pid_type == "recid",
-                        PersistentIdentifier.status == PIDStatus.REGISTERED,
-                        PersistentIdentifier.pid_value.notlike("%.%"),
-                        _func.to_number(
-                            PersistentIdentifier.pid_value,
-                            current_app.config["WEKO_SEARCH_UI_TO_NUMBER_FORMAT"]
-                        ) >= from_pid,
-                        _func.to_number(
-                            PersistentIdentifier.pid_value,
-                            current_app.config["WEKO_SEARCH_UI_TO_NUMBER_FORMAT"]
-                        ) <= toid,
-                        ItemMetadata.item_type_id == item_type_id
-                    ).order_by(_func.to_number(
-                        PersistentIdentifier.pid_value,
-                        current_app.config["WEKO_SEARCH_UI_TO_NUMBER_FORMAT"]
-                    )).all()
-                else:
-                    recids = db.session.query(
-                        PersistentIdentifier.pid_value,
-                        PersistentIdentifier.object_uuid,
-                        RecordMetadata.json
-                    ).join(
-                        ItemMetadata,
-                        PersistentIdentifier.object_uuid == ItemMetadata.id,
-                    ).join(
-                        RecordMetadata,
-                        PersistentIdentifier.object_uuid == RecordMetadata.id,
-                    ).filter(
-                        PersistentIdentifier.pid_type == "recid",
-                        PersistentIdentifier.status == PIDStatus.REGISTERED,
-                        PersistentIdentifier.pid_value.notlike("%.%"),
-                        _func.to_number(
-                            PersistentIdentifier.pid_value,
-                            current_app.config["WEKO_SEARCH_UI_TO_NUMBER_FORMAT"]
-                        ) >= from_pid,
-                        ItemMetadata.item_type_id == item_type_id
-                    ).order_by(_func.to_number(
-                        PersistentIdentifier.pid_value,
-                        current_app.config["WEKO_SEARCH_UI_TO_NUMBER_FORMAT"]
-                    )).all()
-
-                if len(recids) == 0:
-                    item_types.remove(it)
-                    continue
+            checkpoint = json.loads(get_redis_cache(_checkpoint_key) or "{}")
+        except ValueError:
+            return None
+        if checkpoint.get("data") == data \
+                and os.path.isdir(checkpoint.get("export_path", "")):
+            return checkpoint
+        return None
 
-                record_ids = [(recid.pid_value, recid.object_uuid) 
-                    for recid in recids if 'publish_status' in recid.json 
-                    and recid.json['publish_status'] in [PublishStatus.PUBLIC.value, PublishStatus.PRIVATE.value]]
-                for recid, uuid in record_ids:
+    def _publish_progress(checkpoint, progress, item_type_name=""):
+        """Publish the export progress as JSON."""
+        elapsed = time() - progress["start"]
+        run_records = checkpoint["records"] - progress["start_records"]
+        rate = run_records / elapsed if elapsed > 0 else 0
+        remaining = max(progress["total"] - checkpoint["records"], 0)
+        reset_redis_cache(_progress_key, json.dumps(dict(
+            item_type=item_type_name,
+            records=checkpoint["records"],
+            total=progress["total"],
+            parts=checkpoint["parts"],
+            records_per_sec=round(rate, 2),
+            eta=int(remaining / rate) if rate > 0 else None,
+            retries=progress["retries"],
+            updated=datetime.now(pytz.timezone(timezone)).strftime(
+                "%Y/%m/%d %H:%M:%S")
+        )))
+
+    def _get_export_data(export_path, item_types, checkpoint, progress,
+                         fromid="", toid=""):
+        retry_info = checkpoint["retry_info"]
+        for it in item_types.copy():
+            item_type_id = it[0]
+            item_type_name = it[1]
+            if item_type_id in checkpoint["done"]:
+                item_types.remove(it)
+                continue
+            item_datas = {}
+            if item_type_id in retry_info:
+                counter = retry_info[item_type_id]["counter"]
+                file_part = retry_info[item_type_id]["part"]
+                from_pid = retry_info[item_type_id]["max"]
+            else:
+                counter = 0
+                file_part = 1
+                from_pid = fromid if fromid else "1"
+            current_app.logger.info(
+                "Start processing item type {}({}).".format(
+                    item_type_name, item_type_id
+                )
+            )
+            exported = False
+            for chunk in _iter_export_record_ids(
+                item_type_id, from_pid, toid
+            ):
+                # load the records of the chunk in one query
+                records = {
+                    record.id: record for record in
+                    WekoRecord.get_records([uuid for _, uuid in chunk])
+                }
+                for recid, uuid in chunk:
+                    record = records.get(uuid)
+                    if record is None:
+                        continue
                     if counter % WEKO_SEARCH_UI_BULK_EXPORT_LIMIT == 0 and item_datas:
                         # Create export info file
                         item_datas["name"] = "{}.part{}".format(
@@ -3478,11 +3510,13 @@ def export_all(root_url, user_id, data, timezone):
                             "The latest {} file was created on {}.".format(
                                 _file_format,
                                 datetime.now(pytz.timezone(timezone)).strftime("%Y/%m/%d %H:%M:%S"))
-                            + " Number of retries: {} times.".format(retrys)
+                            + " Number of retries: {} times.".format(progress["retries"])
                         )
                         current_app.logger.info(
                             "{}.{} has been created.".format(item_datas["name"], _file_format)
                         )
+                        checkpoint["records"] += len(item_datas["recids"])
+                        checkpoint["parts"] += 1
                         item_datas = {}
                         file_part += 1
                         retry_info[item_type_id] = {
@@ -3490,8 +3524,8 @@ def export_all(root_url, user_id, data, timezone):
                             "counter": counter,
                             "max": recid,
                         }
-
-                    record = WekoRecord.get_record_by_uuid(uuid)
+                        _save_checkpoint(checkpoint)
+                        _publish_progress(checkpoint, progress, item_type_name)
 
                     if not item_datas:
                         item_datas = {
@@ -3508,7 +3542,9 @@ def export_all(root_url, user_id, data, timezone):
                     item_datas["recids"].append(recid)
                     item_datas["data"][recid] = record
                     counter += 1
+                    exported = True
 
+            if exported:
                 if file_part != 1:
                     item_datas["name"] = "{}.part{}".format(
                         item_datas["name"], file_part
@@ -3520,9 +3556,8 @@ def export_all(root_url, user_id, data, timezone):
                     "The latest {} file was created on {}.".format(
                         _file_format,
                         datetime.now(pytz.timezone(timezone)).strftime("%Y/%m/%d %H:%M:%S"))
-                    + " Number of retries: {} times.".format(retrys)
+                    + " Number of retries: {} times.".format(progress["retries"])
                 )
-                item_types.remove(it)
                 current_app.logger.info(
                     "{}.{} has been created.".format(item_datas["name"], _file_format)
                 )
@@ -3531,27 +3566,27 @@ def export_all(root_url, user_id, data, timezone):
                         counter, item_type_name
                     )
                 )
-            return True
-        except SQLAlchemyError as ex:
-            current_app.logger.error(ex)
-            _num_retry = current_app.config["WEKO_SEARCH_UI_BULK_EXPORT_RETRY"]
-            if retrys < _num_retry:
-                retrys += 1
-                current_app.logger.info("retry count: {}".format(retrys))
-                db.session.rollback()
-                sleep(5)
-                result = _get_export_data(
-                    export_path, item_types, retrys, fromid, toid, retry_info
-                )
-                return result
-            else:
-                return False
+                checkpoint["records"] += len(item_datas["recids"])
+                checkpoint["parts"] += 1
+            item_types.remove(it)
+            checkpoint["done"].append(item_type_id)
+            retry_info.pop(item_type_id, None)
+            _save_checkpoint(checkpoint)
+            _publish_progress(checkpoint, progress, item_type_name)
+        return True
 
+    _checkpoint_key = _cache_prefix.format(
+        name=current_app.config["WEKO_SEARCH_UI_BULK_EXPORT_CHECKPOINT"],
+        user_id=user_id
+    )
+    _progress_key = _cache_prefix.format(
+        name=current_app.config["WEKO_SEARCH_UI_BULK_EXPORT_PROGRESS"],
+        user_id=user_id
+    )
     reset_redis_cache(_msg_key, "")
     reset_redis_cache(_run_msg_key, "")
-    temp_path = tempfile.TemporaryDirectory(
-        prefix=current_app.config["WEKO_ITEMS_UI_EXPORT_TMP_PREFIX"]
-    )
+    reset_redis_cache(_progress_key, "")
+    temp_root = None
     try:
         # Delete old file
         _task_config = current_app.config["WEKO_SEARCH_UI_BULK_EXPORT_URI"]
@@ -3563,8 +3598,24 @@ def export_all(root_url, user_id, data, timezone):
         if prev_uri:
             delete_exported(prev_uri, _uri_key)
 
-        export_path = temp_path.name + "/" + datetime.utcnow().strftime("%Y%m%d%H%M%S")
-        os.makedirs(export_path, exist_ok=True)
+        checkpoint = _load_checkpoint()
+        if checkpoint:
+            export_path = checkpoint["export_path"]
+            current_app.logger.info(
+                "Resume export from checkpoint: {} parts, {} records.".format(
+                    checkpoint["parts"], checkpoint["records"]
+                )
+            )
+        else:
+            # the export of other data is not resumed any more
+            delete_export_checkpoint(user_id)
+            export_path = tempfile.mkdtemp(
+                prefix=current_app.config["WEKO_ITEMS_UI_EXPORT_TMP_PREFIX"]
+            ) + "/" + datetime.utcnow().strftime("%Y%m%d%H%M%S")
+            os.makedirs(export_path, exist_ok=True)
+            checkpoint = dict(data=data, export_path=export_path,
+                              retry_info={}, done=[], records=0, parts=0)
+        temp_root = os.path.dirname(export_path)
 
         item_type_id = data.get('item_type_id', "-1")
         item_types = _get_item_type_list(item_type_id)
@@ -3582,7 +3633,34 @@ def export_all(root_url, user_id, data, timezone):
         
         result = None
         if not fromid or not toid or (fromid and toid and int(fromid) <= int(toid)):
-            result = _get_export_data(export_path, item_types, 0, fromid, toid)
+            progress = dict(
+                start=time(),
+                start_records=checkpoint["records"],
+                total=sum(
+                    _count_export_record_ids(it[0], fromid or "1", toid)
+                    for it in item_types
+                ),
+                retries=0
+            )
+            _num_retry = current_app.config["WEKO_SEARCH_UI_BULK_EXPORT_RETRY"]
+            while True:
+                try:
+                    result = _get_export_data(
+                        export_path, item_types, checkpoint, progress,
+                        fromid, toid
+                    )
+                    break
+                except SQLAlchemyError as ex:
+                    current_app.logger.error(ex)
+                    db.session.rollback()
+                    if progress["retries"] >= _num_retry:
+                        result = False
+                        break
+                    progress["retries"] += 1
+                    current_app.logger.info(
+                        "retry count: {}".format(progress["retries"]))
+                    sleep(current_app.config[
+                        "WEKO_SEARCH_UI_BULK_EXPORT_RETRY_WAIT"])
 
             if result:
                 # Create bag
@@ -3596,6 +3674,7 @@ def export_all(root_url, user_id, data, timezone):
                 reset_redis_cache(_msg_key, "Export failed.")
         else:
             reset_redis_cache(_msg_key, "Export failed. Please check item id range.")
+        delete_export_checkpoint(user_id)
         reset_redis_cache(_run_msg_key, "")
         return src.uri if result and src else ""
     except Exception as ex:
@@ -3603,7 +3682,70 @@ def export_all(root_url, user_id, data, timezone):
         current_app.logger.error(ex)
         reset_redis_cache(_msg_key, "Export failed.")
         reset_redis_cache(_run_msg_key, "")
+        delete_export_checkpoint(user_id)
         return ""
+    except BaseException:
+        # the worker is shut down, the task is redelivered and resumes the
+        # export from the checkpoint
+        if _load_checkpoint():
+            temp_root = None
+        raise
+    finally:
+        # The failed exports are not resumed, their files are deleted. Only
+        # the export interrupted by the shutdown or the death of the worker
+        # keeps its files, to be resumed from the checkpoint.
+        if temp_root:
+            shutil.rmtree(temp_root, ignore_errors=True)
+
+
+def delete_export_checkpoint(user_id):
+    """Delete the checkpoint and the progress of the bulk export of a user.
+
+    The files exported until the checkpoint are deleted too.
+
+    :param user_id: user id.
+    """
+    _cache_prefix = current_app.config["WEKO_ADMIN_CACHE_PREFIX"]
+    checkpoint_key = _cache_prefix.format(
+        name=current_app.config["WEKO_SEARCH_UI_BULK_EXPORT_CHECKPOINT"],
+        user_id=user_id
+    )
+    try:
+        export_path = json.loads(
+            get_redis_cache(checkpoint_key) or "{}").get("export_path")
+    except ValueError:
+        export_path = None
+    if export_path:
+        temp_root = os.path.dirname(os.path.normpath(export_path))
+        # only the directories created by export_all
+        if os.path.basename(temp_root).startswith(
+                current_app.config["WEKO_ITEMS_UI_EXPORT_TMP_PREFIX"]):
+            shutil.rmtree(temp_root, ignore_errors=True)
+    redis_connection = RedisConnection()
+    datastore = redis_connection.connection(db=current_app.config['CACHE_REDIS_DB'], kv = True)
+    for name in (
+        current_app.config["WEKO_SEARCH_UI_BULK_EXPORT_CHECKPOINT"],
+        current_app.config["WEKO_SEARCH_UI_BULK_EXPORT_PROGRESS"],
+    ):
+        cache_key = _cache_prefix.format(name=name, user_id=user_id)
+        if datastore.redis.exists(cache_key):
+            datastore.delete(cache_key)
+
+
+def get_export_progress():
+    """Get the progress of the bulk export of the current user.
+
+    :return: dict of records, total, parts, records_per_sec, eta (seconds),
+        retries and updated, empty if no export is running.
+    """
+    cache_key = current_app.config["WEKO_ADMIN_CACHE_PREFIX"].format(
+        name=current_app.config["WEKO_SEARCH_UI_BULK_EXPORT_PROGRESS"],
+        user_id=current_user.get_id()
+    )
+    try:
+        return json.loads(get_redis_cache(cache_key) or "{}")
+    except ValueError:
+        return {}
 
 
 def delete_exported(uri, cache_key):
@@ -3636,6 +3778,7 @@ def cancel_export_all():
 
         if export_status:
             revoke(task_id, terminate=True)
+            delete_export_checkpoint(current_user.get_id())
             delete_task_id_cache.apply_async(
                 args=(
                     task_id,
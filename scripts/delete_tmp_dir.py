@@ -4,6 +4,7 @@ import shutil
 from datetime import datetime
 import traceback
 import ast
+import json
 import glob, re
 import redis
 from celery import Celery
@@ -62,18 +63,39 @@ def get_temp_dir_info():
     return result
 
 
-def get_exporting_dir(tasks, dir_list):
+def get_checkpoint_dirs():
+    """エクスポートのチェックポイントから再開されるディレクトリを取得
+    """
+    redis_url = 'redis://' + os.environ.get("INVENIO_REDIS_HOST") + ':6379' + '/' + os.environ.get("CACHE_REDIS_DB", "0")
+    store = redis.StrictRedis.from_url(redis_url)
+
+    result = []
+    for key in store.scan_iter("admin_cache_CHECKPOINT_EXPORT_ALL_*"):
+        try:
+            export_path = json.loads((store.get(key) or b"{}").decode("UTF-8")).get("export_path")
+        except ValueError:
+            continue
+        if export_path:
+            result.append(os.path.dirname(os.path.normpath(export_path)))
+    return result
+
+
+def get_exporting_dir(tasks, dir_list, checkpoint_dirs):
     """現在実行中のエクスポートタスクによって生成されたディレクトリを取得
     """
+    # the checkpointed directories are kept until the export is resumed
+    exporting_dir = {os.path.normpath(d): "checkpoint" for d in checkpoint_dirs}
     export_tasks = [task for task in tasks if task["name"] == "weko_search_ui.tasks.export_all_task"]
-    export_dir = [dir for dir in dir_list if re.search(r"weko_export_.*", dir.split("/")[-1])]
-    exporting_dir = {}
+    export_dir = [dir for dir in dir_list if re.search(r"weko_export_.*", dir.split("/")[-1]) and os.path.normpath(dir) not in exporting_dir]
     if export_tasks and export_dir:
         for task in export_tasks:
             start_time = datetime.fromtimestamp(task["time_start"])
             filtered_dirs = [d for d in export_dir if datetime.fromtimestamp(os.path.getctime(d)) > start_time]
+            if not filtered_dirs:
+                # resumed from a checkpoint, or no directory created yet
+                continue
             newest_dir = min(filtered_dirs, key=lambda d: datetime.fromtimestamp(os.path.getctime(d)) - start_time)
-            exporting_dir[newest_dir] = task["id"]
+            exporting_dir[os.path.normpath(newest_dir)] = task["id"]
     return exporting_dir
     
 if __name__ == "__main__":
@@ -81,12 +103,18 @@ if __name__ == "__main__":
     dir_list = glob.glob(tempdir+"/**")
     tasks, actives, reserveds = get_tasks()
     tmp_dir_info = get_temp_dir_info()
-    exporting_dir = get_exporting_dir(actives, dir_list)
+    try:
+        exporting_dir = get_exporting_dir(actives, dir_list, get_checkpoint_dirs())
+    except Exception:
+        # the exporting directories are unknown, none is deleted
+        print("failed get exporting dir")
+        traceback.print_exc()
+        exporting_dir = None
     for dir  in dir_list:
         try:
             # delete weko_export_{uuid}
             if re.search(r"weko_export_.*",dir):
-                if dir not in exporting_dir:
+                if exporting_dir is not None and os.path.normpath(dir) not in exporting_dir:
                     shutil.rmtree(dir)
 
             # delete weko_import_{%Y%m%d%H%M%S%h}
@@ -117,6 +145,10 @@ if __name__ == "__main__":
                 if len(_dir)==0 or (len(_dir)==1 and re.search(r"\.nfs.*",_dir[0].split("/")[-1])):
                     shutil.rmtree(dir)
 
+            # keep weko_coverpage_cache, evicted by weko_records_ui
+            elif "weko_coverpage_cache" in dir:
+                continue
+
             # delete comb_pdfs
             elif "comb_pdfs" in dir:
                 shutil.rmtree(dir)
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+#
+# Load test of the OAI-PMH resumption tokens.
+#
+# Runs many concurrent simulated harvesters following the resumptionToken
+# of ListIdentifiers; a part of them abandons the harvest at a random page.
+# Each resumption token mode (scroll, search_after) is run in turn and
+# the pages/s, the records harvested and the scroll contexts left open on
+# the Elasticsearch cluster are reported.
+#
+# usage: invenio shell tools/bench_oai_harvest.py [harvesters] [abandon]
+#        [page_size] [metadataPrefix]
+#
+
+import random
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from invenio_search import current_search_client
+
+TOKEN = re.compile(r'<resumptionToken[^>]*>([^<]+)</resumptionToken>')
+IDENTIFIER = re.compile(r'<identifier>([^<]+)</identifier>')
+
+
+def open_contexts():
+    """Count the search contexts open on the cluster."""
+    stats = current_search_client.nodes.stats(
+        metric='indices', index_metric='search')
+    return sum(node['indices']['search']['open_contexts']
+               for node in stats['nodes'].values())
+
+
+def harvest(prefix, abandon):
+    """Harvest with ListIdentifiers, maybe abandoning the harvest."""
+    pages = 0
+    identifiers = set()
+    stop = random.randint(1, 5) if random.random() < abandon else None
+    params = dict(verb='ListIdentifiers', metadataPrefix=prefix)
+    with current_app.test_client() as client:
+        while True:
+            body = client.get('/oai', query_string=params).get_data(
+                as_text=True)
+            pages += 1
+            identifiers.update(IDENTIFIER.findall(body))
+            token = TOKEN.search(body)
+            if not token or pages == stop:
+                return pages, identifiers
+            params = dict(verb='ListIdentifiers',
+                          resumptionToken=token.group(1))
+
+
+def run(mode, harvesters, abandon, prefix):
+    """Run the harvesters in one resumption token mode."""
+    app = current_app._get_current_object()
+    app.config['OAISERVER_RESUMPTION_TOKEN_MODE'] = mode
+
+    def _harvest(_):
+        with app.app_context():
+            return harvest(prefix, abandon)
+
+    before = open_contexts()
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=harvesters) as pool:
+        results = list(pool.map(_harvest, range(harvesters)))
+    elapsed = time.time() - start
+    pages = sum(r[0] for r in results)
+    complete = max(len(r[1]) for r in results)
+    print('{:<13} pages={:<6} {:.2f} pages/s records={:<7} '
+          'open_contexts={:+d}'.format(
+              mode, pages, pages / elapsed if elapsed else 0, complete,
+              open_contexts() - before))
+
+
+def main():
+    harvesters = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    abandon = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+    page_size = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+    prefix = sys.argv[4] if len(sys.argv) > 4 else 'jpcoar_1.0'
+    current_app.config['OAISERVER_PAGE_SIZE'] = page_size
+    print('{} harvesters, {:.0%} abandoning'.format(harvesters, abandon))
+    for mode in ('scroll', 'search_after'):
+        run(mode, harvesters, abandon, prefix)
+
+
+main()
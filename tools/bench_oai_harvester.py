@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+#
+# Benchmark of the OAI-PMH harvester pipeline.
+#
+# Serves synthetic oai_dc or jpcoar_1.0 ListRecords pages from a local HTTP
+# stub with a configurable latency, then harvests them sequentially (fetch,
+# look up, map, index and commit each record in turn, as before) and with
+# the pipeline of invenio_oaiharvester.tasks (records streamed from the
+# responses, mapping pool, one lookup query and one Elasticsearch bulk per
+# commit). Each mode harvests the records twice, to measure the creation
+# and the update of the items. The harvested items are created in the
+# database and the search index, so run it against a disposable instance.
+#
+# usage: invenio shell tools/bench_oai_harvester.py [records] [page_size]
+#        [latency_ms] [index_id] [metadataPrefix]
+#
+
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from flask import current_app
+from invenio_db import db
+from invenio_oaiharvester.harvester import DCMapper, ListRecordsReader
+from invenio_oaiharvester.models import HarvestSettings
+from invenio_oaiharvester.tasks import harvest_pages, process_item, \
+    process_page
+
+RECORDS = {}
+RECORDS['oai_dc'] = '''<record><header><identifier>oai:bench:{run}:{i}</identifier>
+<datestamp>2023-01-01T00:00:00Z</datestamp></header><metadata>
+<oai_dc:dc xmlns:oai_dc="http://www.openarchives.org/OAI/2.0/oai_dc/"
+ xmlns:dc="http://purl.org/dc/elements/1.1/">
+<dc:title>Bench record {i}</dc:title><dc:creator>Creator {i}</dc:creator>
+<dc:type>article</dc:type><dc:language>eng</dc:language>
+<dc:description>Synthetic record {i} of run {run}.</dc:description>
+</oai_dc:dc></metadata></record>'''
+RECORDS['jpcoar_1.0'] = '''<record><header>
+<identifier>oai:bench:{run}:{i}</identifier>
+<datestamp>2023-01-01T00:00:00Z</datestamp></header><metadata>
+<jpcoar:jpcoar xmlns:jpcoar="https://github.com/JPCOAR/schema/blob/master/1.0/"
+ xmlns:dc="http://purl.org/dc/elements/1.1/"
+ xmlns:datacite="https://schema.datacite.org/meta/kernel-4/"
+ xmlns:dcterms="http://purl.org/dc/terms/"
+ xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">
+<dc:title xml:lang="en">Bench record {i}</dc:title>
+<jpcoar:creator><jpcoar:creatorName xml:lang="en">Creator, {i}
+</jpcoar:creatorName></jpcoar:creator>
+<dc:language>eng</dc:language>
+<dc:type rdf:resource="http://purl.org/coar/resource_type/c_6501">
+journal article</dc:type>
+<datacite:description xml:lang="en" descriptionType="Abstract">
+Synthetic record {i} of run {run}.</datacite:description>
+<datacite:date dateType="Issued">2023-01-01</datacite:date>
+<jpcoar:identifier identifierType="URI">https://bench.example.org/{i}
+</jpcoar:identifier>
+</jpcoar:jpcoar></metadata></record>'''
+
+
+class StubOAI(BaseHTTPRequestHandler):
+    """Serve the ListRecords pages of a synthetic repository."""
+
+    records = 0
+    page_size = 0
+    prefix = 'oai_dc'
+    latency = 0
+    run = ''
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        token = query.get('resumptionToken', ['0'])[0]
+        start = int(token)
+        end = min(start + self.page_size, self.records)
+        time.sleep(self.latency)
+        body = ''.join(RECORDS[self.prefix].format(run=self.run, i=i)
+                       for i in range(start, end))
+        if end < self.records:
+            body += '<resumptionToken>{}</resumptionToken>'.format(end)
+        body = '<OAI-PMH><ListRecords>{}</ListRecords></OAI-PMH>'.format(body)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/xml')
+        self.end_headers()
+        self.wfile.write(body.encode('utf-8'))
+
+    def log_message(self, *args):
+        pass
+
+
+def sequential(harvesting, counter):
+    """Harvest as before: one record, its queries and commit at a time."""
+    rtoken = None
+    while True:
+        reader = ListRecordsReader(
+            harvesting.base_url, None, None, harvesting.metadata_prefix,
+            harvesting.set_spec, rtoken)
+        for record in reader:
+            try:
+                process_item(record, harvesting, counter, {})
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+        rtoken = reader.resumption_token
+        if not rtoken:
+            break
+
+
+def pipelined(harvesting, counter):
+    """Harvest with the pipeline of run_harvesting."""
+    with ThreadPoolExecutor(max_workers=current_app.config[
+            'OAIHARVESTER_MAPPING_WORKERS']) as pool:
+        for page in harvest_pages(harvesting, None):
+            process_page(pool, page, harvesting, counter, {})
+
+
+def main():
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    page_size = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    latency = int(sys.argv[3]) if len(sys.argv) > 3 else 500
+    index_id = int(sys.argv[4]) if len(sys.argv) > 4 else 1
+    prefix = sys.argv[5] if len(sys.argv) > 5 else 'jpcoar_1.0'
+
+    server = HTTPServer(('127.0.0.1', 0), StubOAI)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    StubOAI.records = records
+    StubOAI.page_size = page_size
+    StubOAI.latency = latency / 1000.0
+    StubOAI.prefix = prefix
+    DCMapper.update_itemtype_map()
+    print('{} {} records, {} per page, {} ms per page'.format(
+        records, prefix, page_size, latency))
+    try:
+        for label, func in (('sequential', sequential),
+                            ('pipelined', pipelined)):
+            StubOAI.run = '{}-{}'.format(label, int(time.time()))
+            harvesting = HarvestSettings(
+                base_url='http://127.0.0.1:{}/oai'.format(
+                    server.server_address[1]),
+                metadata_prefix=prefix, set_spec='*', index_id=index_id,
+                update_style='0', auto_distribution='0', item_processed=0)
+            for step in ('create', 'update'):
+                counter = {}
+                start = time.time()
+                func(harvesting, counter)
+                elapsed = time.time() - start
+                print('{:<10} {:<6} {:.2f}s {:.1f} items/s {}'.format(
+                    label, step, elapsed,
+                    records / elapsed if elapsed else 0, counter))
+    finally:
+        server.shutdown()
+
+
+main()
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+#
+# Benchmark of the OAI-PMH ListRecords/ListIdentifiers record hydration.
+#
+# Takes one page of the harvestable records and compares the previous
+# per-hit hydration (OAIIDProvider.get + get_record_by_uuid + pickled deep
+# copy) with the batched prefetch_records + copy_record_for_serialization,
+# then measures the requests/sec of the whole verbs.
+#
+# usage: invenio shell tools/bench_oai_listrecords.py [page_size] [repeat]
+#        [metadataPrefix]
+#
+
+import pickle
+import sys
+import time
+
+from flask import current_app
+from invenio_db import db
+from invenio_oaiserver.fetchers import oaiid_fetcher
+from invenio_oaiserver.provider import OAIIDProvider
+from invenio_oaiserver.query import get_records
+from invenio_oaiserver.response import listidentifiers, listrecords, \
+    prefetch_records
+from invenio_oaiserver.utils import copy_record_for_serialization
+from weko_deposit.api import WekoRecord
+
+
+def per_hit(items):
+    """Hydrate the page as before, one hit at a time."""
+    for r in items:
+        pid = oaiid_fetcher(r['id'], r['json']['_source'])
+        pid_object = OAIIDProvider.get(pid_value=pid.pid_value).pid
+        record = WekoRecord.get_record_by_uuid(pid_object.object_uuid)
+        pickle.loads(pickle.dumps(record, -1))
+
+
+def batched(items):
+    """Hydrate the page with two set-based queries."""
+    for pid_object, record in prefetch_records(items).values():
+        if record is not None:
+            copy_record_for_serialization(record)
+
+
+def rate(func, repeat):
+    """Run ``func`` on a clean session and return the calls per second."""
+    start = time.time()
+    for _ in range(repeat):
+        db.session.expunge_all()
+        func()
+    elapsed = time.time() - start
+    return repeat / elapsed if elapsed else 0
+
+
+def main():
+    page_size = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    prefix = sys.argv[3] if len(sys.argv) > 3 else 'jpcoar_1.0'
+    current_app.config['OAISERVER_PAGE_SIZE'] = page_size
+    kwargs = dict(metadataPrefix=prefix)
+
+    with current_app.test_request_context():
+        items = list(get_records(**kwargs).items)
+        print('{} hits in the page, {} repetitions'.format(len(items), repeat))
+        for label, func in (
+                ('per-hit hydration', lambda: per_hit(items)),
+                ('batched hydration', lambda: batched(items)),
+                ('ListIdentifiers', lambda: listidentifiers(
+                    verb='ListIdentifiers', **kwargs)),
+                ('ListRecords', lambda: listrecords(
+                    verb='ListRecords', **kwargs))):
+            print('{:<18} {:.2f} pages/s'.format(label, rate(func, repeat)))
+
+
+main()
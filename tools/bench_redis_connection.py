@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+#
+# Benchmark of the Redis connections of weko_redis.RedisConnection.
+#
+# Runs GET commands against a local Redis from several threads, first with
+# a new client per call (StrictRedis.from_url, as RedisConnection did
+# before) and then with the pooled clients of RedisConnection, and reports
+# the commands/s and the TCP connections accepted by the server.
+#
+# usage: python tools/bench_redis_connection.py [host] [port] [commands]
+#        [threads]
+#
+
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import redis
+from flask import Flask
+from weko_redis import RedisConnection, get_pool_metrics
+
+DB = 0
+KEY = 'bench_redis_connection'
+
+
+def per_call(url):
+    """Run a command with a new client, as before."""
+    redis.StrictRedis.from_url(url).get(KEY)
+
+
+def pooled(url):
+    """Run a command with the pooled client of the process."""
+    RedisConnection().connection(db=DB).get(KEY)
+
+
+def run(app, func, url, commands, threads):
+    """Run the commands and return the commands/s and new connections."""
+    server = redis.StrictRedis.from_url(url)
+    before = server.info('stats')['total_connections_received']
+
+    def _run(_):
+        with app.app_context():
+            func(url)
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(_run, range(commands)))
+    elapsed = time.time() - start
+    after = server.info('stats')['total_connections_received']
+    # the 'info' client itself counts for one connection
+    return commands / elapsed if elapsed else 0, after - before - 1
+
+
+def main():
+    host = sys.argv[1] if len(sys.argv) > 1 else 'localhost'
+    port = sys.argv[2] if len(sys.argv) > 2 else '6379'
+    commands = int(sys.argv[3]) if len(sys.argv) > 3 else 20000
+    threads = int(sys.argv[4]) if len(sys.argv) > 4 else 8
+    url = 'redis://{}:{}/{}'.format(host, port, DB)
+
+    app = Flask(__name__)
+    app.config.update(CACHE_TYPE='redis', CACHE_REDIS_HOST=host,
+                      REDIS_PORT=port)
+    redis.StrictRedis.from_url(url).set(KEY, 'x' * 100)
+    print('{} GET commands, {} threads'.format(commands, threads))
+    for label, func in (('per-call', per_call), ('pooled', pooled)):
+        rate, connections = run(app, func, url, commands, threads)
+        print('{:<9} {:.0f} commands/s {} new connections'.format(
+            label, rate, connections))
+    with app.app_context():
+        for metrics in get_pool_metrics():
+            print(metrics)
+
+
+main()
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+#
+# Benchmark of StatAggregator.agg_iter.
+#
+# Compares the single date_histogram/terms request with the composite
+# aggregation paging on a synthetic event index.
+#
+# usage: invenio shell tools/bench_stats_aggregation.py [events] [files] [page]
+#
+
+import datetime
+import random
+import resource
+import sys
+import time
+from multiprocessing import Pipe, Process
+
+from elasticsearch import helpers
+from flask import current_app
+from invenio_search import current_search_client
+from invenio_stats.aggregations import StatAggregator
+
+EVENT = 'bench-file-download'
+DAYS = 7
+START = datetime.datetime(2020, 1, 1)
+
+
+def _event_index():
+    prefix = current_app.config['SEARCH_INDEX_PREFIX'].strip('-')
+    return '{0}-events-stats-{1}'.format(prefix, EVENT)
+
+
+def create_events(events, files):
+    """Create the synthetic event index."""
+    index = _event_index()
+    client = current_search_client
+    if client.indices.exists(index=index):
+        client.indices.delete(index=index)
+    client.indices.create(index=index, body={
+        'mappings': {
+            'stats-' + EVENT: {
+                'properties': {
+                    'timestamp': {'type': 'date'},
+                    'file_id': {'type': 'keyword'},
+                    'file_key': {'type': 'keyword'},
+                    'unique_session_id': {'type': 'keyword'},
+                    'is_robot': {'type': 'boolean'},
+                }
+            }
+        }
+    })
+
+    def _actions():
+        for i in range(events):
+            file_id = 'file-{}'.format(random.randrange(files))
+            ts = START + datetime.timedelta(
+                seconds=random.randrange(DAYS * 24 * 3600))
+            yield {
+                '_index': index,
+                '_type': 'stats-' + EVENT,
+                '_source': {
+                    'timestamp': ts.isoformat(),
+                    'file_id': file_id,
+                    'file_key': file_id + '.pdf',
+                    'unique_session_id': str(i % 1000),
+                    'is_robot': False,
+                }
+            }
+    helpers.bulk(client, _actions(), chunk_size=5000)
+    client.indices.refresh(index=index)
+
+
+def _run(page_size, conn):
+    """Consume agg_iter in a child process and report time and RSS."""
+    current_app.config.update(
+        STATS_AGGREGATION_COMPOSITE_SIZE=page_size,
+        STATS_WEKO_DB_BACKUP_AGGREGATION=False)
+    aggregator = StatAggregator(
+        name='bench-agg',
+        event=EVENT,
+        aggregation_field='file_id',
+        copy_fields={'file_key': 'file_key'},
+        aggregation_interval='day',
+        query_modifiers=[])
+    start = time.time()
+    count = 0
+    for _ in aggregator.agg_iter(START, START + datetime.timedelta(DAYS)):
+        count += 1
+    conn.send((count, time.time() - start,
+               resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+    conn.close()
+
+
+def bench(page_size):
+    """Run one mode in a fresh process so peak RSS is not shared."""
+    parent, child = Pipe()
+    proc = Process(target=_run, args=(page_size, child))
+    proc.start()
+    result = parent.recv()
+    proc.join()
+    return result
+
+
+def main():
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    files = int(sys.argv[2]) if len(sys.argv) > 2 else 50000
+    page = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+
+    print('indexing {} events on {} files...'.format(events, files))
+    create_events(events, files)
+    try:
+        for label, page_size in (('single request', 0),
+                                 ('composite paging', page)):
+            count, elapsed, rss = bench(page_size)
+            print('{:<18} buckets={:<8} time={:.2f}s peak_rss={:.1f}MB'.format(
+                label, count, elapsed, rss / 1024.0))
+    finally:
+        current_search_client.indices.delete(index=_event_index())
+
+
+main()
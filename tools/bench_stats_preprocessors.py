@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+#
+# Micro-benchmark of the stats event preprocessor caches.
+#
+# Replays the client IPs and user agents of an access log (nginx/apache
+# "combined" format) through the GeoIP and robot/machine detection, first
+# without cache (one GeoLite2 reader per lookup, as before) and then with
+# the worker-local LRU caches.
+#
+# usage: python tools/bench_stats_preprocessors.py access.log [repeat]
+#
+
+import re
+import sys
+import time
+
+from counter_robots import is_machine, is_robot
+from geolite2 import geolite2
+from invenio_stats.processors import flag_machines, flag_robots
+from invenio_stats.utils import get_geoip, get_preprocessor_cache_info
+
+LOG_LINE = re.compile(
+    r'^(?P<ip>\S+) \S+ \S+ \[[^\]]+\] "[^"]*" \d+ \S+ "[^"]*" "(?P<ua>[^"]*)"')
+
+
+def read_log(path):
+    """Read the (ip, user agent) pairs of an access log."""
+    entries = []
+    with open(path, encoding='utf-8', errors='replace') as f:
+        for line in f:
+            match = LOG_LINE.match(line)
+            if match:
+                entries.append((match.group('ip'), match.group('ua')))
+    return entries
+
+
+def uncached(entries):
+    for ip, ua in entries:
+        match = geolite2.reader().get(ip)
+        match.get('country', {}).get('iso_code') if match else None
+        is_robot(ua)
+        is_machine(ua)
+
+
+def cached(entries):
+    for ip, ua in entries:
+        get_geoip(ip)
+        flag_robots({'user_agent': ua})
+        flag_machines({'user_agent': ua})
+
+
+def main():
+    entries = read_log(sys.argv[1])
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    entries = entries * repeat
+    print('{} events, {} distinct IPs, {} distinct user agents'.format(
+        len(entries), len({e[0] for e in entries}),
+        len({e[1] for e in entries})))
+    for label, func in (('uncached', uncached), ('cached', cached)):
+        start = time.time()
+        func(entries)
+        elapsed = time.time() - start
+        print('{:<9} {:.2f}s {:.0f} events/s'.format(
+            label, elapsed, len(entries) / elapsed if elapsed else 0))
+    for name, info in sorted(get_preprocessor_cache_info().items()):
+        print('{:<8} hits={hits} misses={misses} size={size}/{maxsize}'
+              .format(name, **info))
+
+
+main()